@@ -0,0 +1,318 @@
+import os
+import json
+import shutil
+from array import array
+from bisect import bisect_left
+from typing import Union
+import numpy as np
+from numpy import ndarray
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+    # without ijson the annotations file is parsed in one go while building the store
+
+
+def baseName(fileName: str) -> str:
+    """
+    Gets the file name from a path written with either / or \\ separators
+    """
+    return fileName.replace('\\', '/').rsplit('/', 1)[-1]
+
+
+def normalizedPath(fileName: str) -> str:
+    """
+    Gets a path written with either / or \\ separators with / separators and without leading ./
+    """
+    normalized = fileName.replace('\\', '/')
+    while normalized.startswith('./'):
+        normalized = normalized[2:]
+
+    return normalized
+
+
+def blobOffsets(items: list[bytes]) -> ndarray:
+    """
+    Gets the offsets of every item in the concatenation of the items, item i spans offsets[i]:offsets[i + 1]
+    """
+    offsets = np.zeros(len(items) + 1, np.int64)
+    np.cumsum([len(x) for x in items], out=offsets[1:])
+    return offsets
+
+
+class AnnotationStore:
+    """
+    Columnar, read only copy of a COCO annotations file
+
+    The store is a folder of .npy columns (image ids, file names, dimensions, an N x 4 bbox array, category ids and per image offsets into the boxes) which are memory mapped, so every worker process shares the same pages and no worker pays a JSON parse.
+    Image ids may be integers or strings, e.g. the ids of augmented outputs, so they are kept json encoded in a blob like the file names. Category ids are kept as indices into the category ids listed in the meta data.
+    """
+
+    VERSION = 3
+
+    def __init__(self, storePath: str) -> None:
+        """
+        Opens an existing store
+
+        Keyword arguments:
+
+        storePath (str) -- Path to the folder of the store
+
+        Return: None
+        """
+
+        self.storePath = storePath
+
+        with open(os.path.join(storePath, 'meta.json'), 'r') as f:
+            self.meta = json.load(f)
+
+        def load(name: str) -> ndarray:
+            return np.load(os.path.join(storePath, f"{name}.npy"), mmap_mode='r')
+
+        self.imageIdBlob = load('imageIdBlob')
+        self.imageIdOffsets = load('imageIdOffsets')
+        self.widths = load('widths')
+        self.heights = load('heights')
+        self.nameBlob = load('nameBlob')
+        self.nameOffsets = load('nameOffsets')
+        self.nameOrder = load('nameOrder')
+        self.pathOrder = load('pathOrder')
+        self.bboxes = load('bboxes')
+        self.categoryRows = load('categoryRows')
+        self.boxOffsets = load('boxOffsets')
+        self.categoryIds: list[Union[int, str]] = self.meta['categoryIds']
+
+    @classmethod
+    def open(cls, annotationsJsonPath: str, storePath: Union[str, None] = None) -> "AnnotationStore":
+        """
+        Opens the store of an annotations file, building it first if it is missing or older than the file
+
+        Keyword arguments:
+
+        annotationsJsonPath (str) -- Path to the COCO annotations file
+
+        storePath (str) -- Path to the folder of the store, defaults to the annotations path with a .store suffix
+
+        Return: The opened store
+        """
+
+        storePath = storePath or f"{annotationsJsonPath}.store"
+        stat = os.stat(annotationsJsonPath)
+        metaPath = os.path.join(storePath, 'meta.json')
+
+        if os.path.isfile(metaPath):
+            with open(metaPath, 'r') as f:
+                meta = json.load(f)
+            if meta.get('version') == cls.VERSION and meta.get('sourceSize') == stat.st_size and meta.get('sourceMtimeNs') == stat.st_mtime_ns:
+                return cls(storePath)
+
+        return cls.build(annotationsJsonPath, storePath)
+
+    @staticmethod
+    def iterateItems(annotationsJsonPath: str, key: str, data: Union[dict, None] = None):
+        """
+        Iterates over the items of a top level list of the annotations file
+
+        Keyword arguments:
+
+        annotationsJsonPath (str) -- Path to the COCO annotations file
+
+        key (str) -- Name of the list, 'images', 'annotations' or 'categories'
+
+        data (dict) -- The annotations file when it is already parsed, the file is streamed with ijson otherwise
+
+        Return: Generator of the items
+        """
+
+        if data is not None:
+            yield from data.get(key, [])
+            return
+
+        with open(annotationsJsonPath, 'rb') as f:
+            yield from ijson.items(f, f"{key}.item", use_float=True)
+
+    @classmethod
+    def build(cls, annotationsJsonPath: str, storePath: str) -> "AnnotationStore":
+        """
+        Converts an annotations file into a store, streaming the file when ijson is installed
+
+        The store is written to a temporary folder and moved into place, so concurrent builders never see a half written store
+
+        Keyword arguments:
+
+        annotationsJsonPath (str) -- Path to the COCO annotations file
+
+        storePath (str) -- Path to the folder of the store
+
+        Return: The opened store
+        """
+
+        stat = os.stat(annotationsJsonPath)
+
+        data = None
+        if ijson is None:
+            with open(annotationsJsonPath, 'rb') as f:
+                data = json.load(f)
+        # without ijson the file is parsed once and every list is read from it
+
+        imageIds: list[bytes] = []
+        widths = array('l')
+        heights = array('l')
+        names: list[bytes] = []
+        rowOfId: dict[Union[int, str], int] = {}
+
+        for image in cls.iterateItems(annotationsJsonPath, 'images', data):
+            rowOfId[image['id']] = len(names)
+            imageIds.append(json.dumps(image['id']).encode('utf-8'))
+            widths.append(int(image.get('width', 0)))
+            heights.append(int(image.get('height', 0)))
+            names.append(image['file_name'].encode('utf-8'))
+
+        categories = list(cls.iterateItems(annotationsJsonPath, 'categories', data))
+        categoryIds: list[Union[int, str]] = [x['id'] for x in categories]
+        indexOfCategory = {categoryId: i for i, categoryId in enumerate(categoryIds)}
+
+        rows = array('q')
+        boxes = array('d')
+        categoryRows = array('q')
+
+        for annotation in cls.iterateItems(annotationsJsonPath, 'annotations', data):
+            row = rowOfId.get(annotation['image_id'])
+            if row is None:
+                continue
+                # annotations of unknown images are dropped
+            rows.append(row)
+            boxes.extend(float(x) for x in annotation['bbox'])
+
+            categoryId = annotation['category_id']
+            if categoryId not in indexOfCategory:
+                indexOfCategory[categoryId] = len(categoryIds)
+                categoryIds.append(categoryId)
+                # ids missing from the categories are kept as they are
+            categoryRows.append(indexOfCategory[categoryId])
+
+        rowsArray = np.frombuffer(rows, np.int64) if len(rows) else np.zeros(0, np.int64)
+        order = np.argsort(rowsArray, kind='stable')
+        # grouping the boxes by image while keeping the file order
+
+        baseNames = [baseName(x.decode('utf-8')) for x in names]
+        paths = [normalizedPath(x.decode('utf-8')) for x in names]
+
+        columns = {
+            'imageIdBlob': np.frombuffer(b''.join(imageIds), np.uint8),
+            'imageIdOffsets': blobOffsets(imageIds),
+            'widths': np.array(widths, np.int32),
+            'heights': np.array(heights, np.int32),
+            'nameBlob': np.frombuffer(b''.join(names), np.uint8),
+            'nameOffsets': blobOffsets(names),
+            'nameOrder': np.array(sorted(range(len(names)), key=baseNames.__getitem__), np.int64),
+            'pathOrder': np.array(sorted(range(len(names)), key=paths.__getitem__), np.int64),
+            'bboxes': (np.frombuffer(boxes, np.float64) if len(boxes) else np.zeros(0)).reshape(-1, 4)[order],
+            'categoryRows': (np.frombuffer(categoryRows, np.int64) if len(categoryRows) else np.zeros(0, np.int64))[order],
+            'boxOffsets': np.searchsorted(rowsArray[order], np.arange(len(names) + 1)).astype(np.int64),
+        }
+
+        temp = f"{storePath}.tmp-{os.getpid()}"
+        shutil.rmtree(temp, ignore_errors=True)
+        os.makedirs(temp)
+
+        for name, column in columns.items():
+            np.save(os.path.join(temp, f"{name}.npy"), column)
+
+        with open(os.path.join(temp, 'meta.json'), 'w') as f:
+            json.dump({"version": cls.VERSION, "sourceSize": stat.st_size, "sourceMtimeNs": stat.st_mtime_ns, "categories": categories, "categoryIds": categoryIds}, f)
+
+        shutil.rmtree(storePath, ignore_errors=True)
+        os.replace(temp, storePath)
+
+        return cls(storePath)
+
+    @property
+    def categories(self) -> list[dict]:
+        """
+        Categories of the annotations file
+        """
+        return self.meta['categories']
+
+    def __len__(self) -> int:
+        return len(self.nameOffsets) - 1
+
+    def fileName(self, row: int) -> str:
+        """
+        Gets the file name of an image as written in the annotations file
+
+        Keyword arguments:
+
+        row (int) -- Row of the image
+
+        Return: The file name
+        """
+        return bytes(self.nameBlob[self.nameOffsets[row]:self.nameOffsets[row + 1]]).decode('utf-8')
+
+    @property
+    def fileNames(self) -> list[str]:
+        """
+        File names of all the images
+        """
+        return [self.fileName(row) for row in range(len(self))]
+
+    def findRow(self, imageName: str) -> int:
+        """
+        Finds the row of an image by its file_name with a binary search over the sorted file names. A path that matches no file_name as written, e.g. an absolute path to a relative file_name, is matched by its base name when only one image has it
+
+        Keyword arguments:
+
+        imageName (str) -- Path or name of the image
+
+        Return: Row of the image
+        """
+
+        class SortedNames:
+            def __init__(_, order: ndarray, key) -> None:
+                _.order = order
+                _.key = key
+
+            def __len__(_) -> int:
+                return len(_.order)
+
+            def __getitem__(_, i: int) -> str:
+                return _.key(self.fileName(_.order[i]))
+
+        path = normalizedPath(imageName)
+        paths = SortedNames(self.pathOrder, normalizedPath)
+        i = bisect_left(paths, path)
+        if i < len(paths) and paths[i] == path:
+            return int(self.pathOrder[i])
+
+        name = baseName(imageName)
+        names = SortedNames(self.nameOrder, baseName)
+        i = bisect_left(names, name)
+
+        if i == len(names) or names[i] != name:
+            raise KeyError(f"{imageName} is not in the annotations")
+
+        if i + 1 < len(names) and names[i + 1] == name:
+            raise KeyError(f"{imageName} matches several images named {name} in the annotations, use its file_name as written in the annotations")
+            # images of different folders would get each other's boxes
+
+        return int(self.nameOrder[i])
+
+    def imageId(self, row: int) -> Union[int, str]:
+        """
+        Gets the id of the image at a row, as written in the annotations file
+        """
+        return json.loads(bytes(self.imageIdBlob[self.imageIdOffsets[row]:self.imageIdOffsets[row + 1]]))
+
+    def boxes(self, row: int) -> tuple[ndarray, list[Union[int, str]]]:
+        """
+        Gets the bounding boxes of the image at a row
+
+        Keyword arguments:
+
+        row (int) -- Row of the image
+
+        Return: Read only view of the (N, 4) COCO boxes and the list of their N category ids
+        """
+        start, end = self.boxOffsets[row], self.boxOffsets[row + 1]
+        return self.bboxes[start:end], [self.categoryIds[x] for x in self.categoryRows[start:end].tolist()]
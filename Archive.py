@@ -0,0 +1,200 @@
+import tarfile
+import threading
+import zipfile
+from typing import Iterable, Union
+import numpy as np
+from numpy import ndarray
+from AnnotationStore import baseName, normalizedPath
+from Catalog import IMAGE_EXTENSIONS
+from LazyImport import LazyModule
+
+cv2 = LazyModule("cv2")
+
+
+class Archive:
+    """
+    Image source backed by a zip or tar archive, members are decoded from memory with cv2.imdecode so nothing is extracted to disk
+
+    The members are indexed once in archive order. Every thread reads through its own handle, members of an uncompressed tar are read with a single seek and read at their data offset. Reading the members of a range in archive order keeps the reads sequential, which compressed tars need as they can only seek by decompressing.
+    """
+
+    def __init__(self, path: str, extensions: Union[Iterable[str], None] = IMAGE_EXTENSIONS) -> None:
+        """
+        Opens and indexes the archive
+
+        Keyword arguments:
+
+        path (str) -- Path to the zip or tar archive, tars may be compressed
+
+        extensions (Iterable[str]) -- Extensions of the members treated as images, None treats every member as an image
+
+        Return: None
+        """
+
+        self.path = path
+        self.extensions = tuple(x.lower() for x in extensions) if extensions is not None else None
+        self.local = threading.local()
+
+        if zipfile.is_zipfile(path):
+            self.kind = 'zip'
+            with zipfile.ZipFile(path) as archive:
+                infos = sorted((x for x in archive.infolist() if not x.is_dir()), key=lambda x: x.header_offset)
+        elif tarfile.is_tarfile(path):
+            self.kind = 'tar'
+            with tarfile.open(path) as archive:
+                infos = [x for x in archive if x.isfile()]
+            self.compressed = self.isCompressed()
+        else:
+            raise ValueError(f"{path} is neither a zip nor a tar archive")
+
+        self.infos = {self.memberName(x): x for x in infos if self.accepts(self.memberName(x))}
+        self.members = list(self.infos)
+        # members in archive order
+
+        self.positions = {name: i for i, name in enumerate(self.members)}
+        self.byBaseName: dict[str, str] = {}
+        for name in self.members:
+            self.byBaseName.setdefault(baseName(name), name)
+
+    def isCompressed(self) -> bool:
+        """
+        Checks if a tar is compressed, the members of an uncompressed tar can be read straight from the file
+        """
+
+        with open(self.path, 'rb') as f:
+            head = f.read(6)
+
+        return head[:2] == b'\x1f\x8b' or head[:3] == b'BZh' or head == b'\xfd7zXZ\x00'
+
+    def memberName(self, info: Union[zipfile.ZipInfo, tarfile.TarInfo]) -> str:
+        return info.filename if self.kind == 'zip' else info.name
+
+    def accepts(self, name: str) -> bool:
+        """
+        Checks if a member name passes the extension filter
+        """
+        return self.extensions is None or name.lower().endswith(self.extensions)
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.infos
+
+    def handle(self):
+        """
+        Gets the handle of the current thread, opening it on first use
+        """
+
+        handle = getattr(self.local, 'handle', None)
+        if handle is None:
+            if self.kind == 'zip':
+                handle = zipfile.ZipFile(self.path)
+            elif self.compressed:
+                handle = tarfile.open(self.path)
+            else:
+                handle = open(self.path, 'rb')
+            self.local.handle = handle
+
+        return handle
+
+    def close(self) -> None:
+        """
+        Closes the handle of the current thread
+        """
+
+        handle = getattr(self.local, 'handle', None)
+        if handle is not None:
+            handle.close()
+            self.local.handle = None
+
+    def position(self, name: str) -> int:
+        """
+        Gets the position of a member in archive order, sorting by it makes the reads sequential
+        """
+
+        return self.positions[name]
+
+    def read(self, name: str) -> bytes:
+        """
+        Reads the bytes of a member
+
+        Keyword arguments:
+
+        name (str) -- Name of the member
+
+        Return: The bytes of the member
+        """
+
+        info = self.infos[name]
+        handle = self.handle()
+
+        if self.kind == 'zip':
+            return handle.read(info)
+
+        if self.compressed:
+            return handle.extractfile(info).read()
+
+        handle.seek(info.offset_data)
+        return handle.read(info.size)
+
+    def load(self, name: str) -> Union[ndarray, None]:
+        """
+        Decodes a member, the archive counterpart of cv2.imread
+
+        Keyword arguments:
+
+        name (str) -- Name of the member
+
+        Return: The image or None if the member is missing or can't be decoded
+        """
+
+        try:
+            data = self.read(name)
+        except (KeyError, OSError, zipfile.BadZipFile, tarfile.TarError):
+            return None
+
+        return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+    def resolve(self, fileName: str) -> Union[str, None]:
+        """
+        Finds the member a COCO file_name refers to, by its path inside the archive and then by its file name alone
+
+        Keyword arguments:
+
+        fileName (str) -- The file_name of the image
+
+        Return: Name of the member or None if no member matches
+        """
+
+        normalized = normalizedPath(fileName)
+
+        if normalized in self.infos:
+            return normalized
+
+        return self.byBaseName.get(baseName(normalized))
+
+    def ranges(self, parts: int, members: Union[list[str], None] = None) -> list[list[str]]:
+        """
+        Splits members into contiguous ranges in archive order, one per worker, so every worker reads sequentially
+
+        Keyword arguments:
+
+        parts (int) -- Number of ranges
+
+        members (list[str]) -- Members to split, defaults to every member
+
+        Return: List of ranges, their sizes differ by at most one
+        """
+
+        members = sorted(self.members if members is None else members, key=self.position)
+        size, extra = divmod(len(members), parts)
+
+        ranges = []
+        start = 0
+        for i in range(parts):
+            end = start + size + (1 if i < extra else 0)
+            ranges.append(members[start:end])
+            start = end
+
+        return ranges
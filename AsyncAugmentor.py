@@ -0,0 +1,222 @@
+import asyncio
+import os
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterable, Union
+from LazyImport import LazyModule
+from numpy import ndarray
+from COCO import COCO
+from Composite import Composite
+from Batch import Batch, BoundingBoxBatch
+
+cv2 = LazyModule("cv2")
+
+
+class AsyncAugmentor:
+    """
+    asyncio entry points for augmentation
+
+    Decoding, filtering and encoding run on an executor so the event loop never blocks. The number of jobs running at once is limited by maxConcurrency across every call made through the same object, and cancelling a call cancels every job of it that has not started yet.
+    """
+
+    def __init__(self, transforms: Union[Composite, None] = None, maxConcurrency: Union[int, None] = None, executor: Union[Executor, None] = None) -> None:
+        """
+        Initializes the async augmentor
+
+        Keyword arguments:
+
+        transforms (Composite) -- Composition of filters used by transform() and samples()
+
+        maxConcurrency (int) -- Maximum number of jobs running at once, defaults to the number of cpus
+
+        executor (Executor) -- Executor to run the jobs on, defaults to a thread pool owned by this object. cv2 releases the GIL so threads scale across cores, a process pool needs picklable transforms
+
+        Return: None
+        """
+
+        self.transforms = transforms
+        self.maxConcurrency = maxConcurrency or os.cpu_count() or 1
+        self.ownsExecutor = executor is None
+        self.executor = executor or ThreadPoolExecutor(self.maxConcurrency, thread_name_prefix="augment")
+        self.semaphore = asyncio.Semaphore(self.maxConcurrency)
+
+    async def __aenter__(self) -> "AsyncAugmentor":
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Shuts the executor down if it is owned by this object, jobs that have not started are cancelled
+        """
+
+        if self.ownsExecutor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, function: Callable, *args) -> Any:
+        """
+        Runs a blocking function on the executor once a concurrency slot is free
+
+        Keyword arguments:
+
+        function (Callable) -- The function to run
+
+        args -- Arguments of the function
+
+        Return: The result of the function
+        """
+
+        async with self.semaphore:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def load(self, path: str) -> Union[ndarray, None]:
+        """
+        Reads and decodes an image without blocking the event loop
+
+        Keyword arguments:
+
+        path (str) -- Path to the image
+
+        Return: The image or None if it can't be loaded
+        """
+
+        return await self.run(cv2.imread, path)
+
+    async def transform(self, image: ndarray, bBoxes: Union[list[COCO], None] = None) -> dict[str, Any]:
+        """
+        Awaitable version of Composite.transform
+
+        Keyword arguments:
+
+        image (ndarray) -- Ndarray of the image
+
+        bBoxes (list[COCO]) -- Bounding boxes of the image when the transforms have bounding boxes enabled
+
+        Return: dictionary of the values returned by the filter
+        """
+
+        return await self.run(self.transforms.transform, image, bBoxes)
+
+    async def gatherLimited(self, items: Iterable, worker: Callable) -> None:
+        """
+        Runs an async worker over the items with at most maxConcurrency of them in flight, cancelling all of them if one fails or the caller is cancelled
+
+        Keyword arguments:
+
+        items (Iterable) -- Items to process
+
+        worker (Callable) -- Coroutine function taking one item
+        """
+
+        iterator = iter(items)
+
+        async def consume():
+            for item in iterator:
+                await worker(item)
+        # every consumer pulls the next item from the shared iterator
+
+        tasks = [asyncio.create_task(consume()) for _ in range(self.maxConcurrency)]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def samples(self, paths: Iterable[str], variations: int = 15, getBBoxes: Union[Callable[[str], list[COCO]], None] = None, log: Callable[[str], None] = print) -> AsyncIterator[tuple[str, dict[str, Any]]]:
+        """
+        Asynchronously iterates over the augmented samples of the images, in the order they finish
+
+        Keyword arguments:
+
+        paths (Iterable[str]) -- Paths to the images
+
+        variations (int) -- The Number of variations of every image
+
+        getBBoxes (Callable[[str], list[COCO]]) -- Gets the bounding boxes of an image from its path, needed when the transforms have bounding boxes enabled
+
+        log (Callable) -- A Function which takes in a string, this is used to log errors
+
+        Return: Async iterator of (path, transformed) where transformed is the dictionary returned by Composite.transform
+        """
+
+        queue: asyncio.Queue = asyncio.Queue(self.maxConcurrency)
+        done = object()
+
+        async def augmentPath(path: str):
+            image = await self.load(path)
+            if image is None:
+                log(f"[NOT OPENABLE] {path} can't be loaded, image may be corrupted or the path is invalid")
+                return
+
+            bBoxes = getBBoxes(path) if getBBoxes is not None else None
+            for _ in range(variations):
+                await queue.put((path, await self.transform(image, bBoxes)))
+            # the bounded queue stops the workers from running ahead of the consumer
+
+        async def produce():
+            try:
+                await self.gatherLimited(paths, augmentPath)
+            finally:
+                await queue.put(done)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                yield item
+            await producer
+            # raising any error of the workers
+        finally:
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+
+    async def augmentBatch(self, batch: Batch, variations: Union[int, dict[str, int]] = 15, log: Callable[[str], None] = print) -> None:
+        """
+        Awaitable version of Batch.augment, images are augmented concurrently and every variation is a separate job
+
+        Keyword arguments:
+
+        batch (Batch) -- The batch to augment, bounding box batches are supported
+
+        variations (Union[int, dict[str, int]]) -- The Number of variations of images, or the number of variations of every image keyed by its path
+
+        log (Callable) -- A Function which takes in a string, this is used to log errors
+
+        Return: None
+        """
+
+        hasBBoxes = isinstance(batch, BoundingBoxBatch)
+
+        async def augmentPath(path: str):
+            if batch.oversized(path, log):
+                return
+
+            image = await self.run(batch.loadImage, path)
+            if image is None:
+                log(f"[NOT OPENABLE] {path} can't be loaded, image may be corrupted or the path is invalid")
+                return
+
+            bBoxes = batch.getBBoxes(path) if hasBBoxes else None
+            count = variations if isinstance(variations, int) else variations.get(path, 0)
+
+            for sample, halo, window in batch.samples(image):
+                args = (sample, batch.tileBBoxes(bBoxes, window, halo), halo) if hasBBoxes else (sample, halo)
+                key = batch.sampleKey(path, window)
+
+                for variation in range(count):
+                    try:
+                        await self.run(batch.augmentImage, *args, f"{key}#{variation}")
+                    except Exception as e:
+                        log(f"[AUGMENT ERROR] Cannot augment {path} due to [ [ {e} ] ]")
+
+                try:
+                    await self.run(batch.originalImage, *args, key)
+                except Exception as e:
+                    log(f"[ORIGINAL IMAGE ERROR] Cannot save {path} due to [ [ {e} ] ]")
+
+        await self.gatherLimited(batch.targetImages, augmentPath)
+        await self.run(batch.flush, log)
+        # annotations and uploads are written once the batch is done
@@ -4,8 +4,23 @@ from Composite import Composite
 from typing import Union, Any
 from random import Random
 from Batch import BoundingBoxBatch
+from AnnotationStore import AnnotationStore
+from Tiling import Tiler
+from OutputLayout import OutputLayout
+from MemoryBudget import MemoryBudget
+from AutoTune import AutoTuner, DEFAULT_CACHE_PATH
+from VirtualDataset import writeRecords
+from Archive import Archive
+from Split import HashSplitter
+from Scheduler import Scheduler
+from DryRun import CostEstimator
+from Guardrails import Guardrails
+from Storage import Storage
+from COCO import COCO
+from Watcher import AnnotationWatcher
 import os
 from uuid import uuid1
+from functools import cached_property
 
 
 class BoundingBoxAugmentor:
@@ -13,7 +28,7 @@ class BoundingBoxAugmentor:
     Augments images in bounding box (COCO) format by taking a single json file as a parameter
     """
 
-    def __init__(self, annotationsJsonPath: str, targetFolder: str, targetJsonPath: str, transforms: Composite, batchSize: int = 32, split: bool = True, ratio: tuple[float] = (0.75, 0.1, 0.15), seed: Union[None, Any] = None, imageDim: tuple[int, int] = (256, 256)) -> None:
+    def __init__(self, annotationsJsonPath: str, targetFolder: str, targetJsonPath: str, transforms: Composite, batchSize: int = 32, split: bool = True, ratio: tuple[float] = (0.75, 0.1, 0.15), seed: Union[None, Any] = None, imageDim: tuple[int, int] = (256, 256), tiler: Union[Tiler, None] = None, layout: Union[OutputLayout, None] = None, memoryBudget: Union[int, MemoryBudget, None] = None, archivePath: Union[str, None] = None, hashSplit: bool = False, guardrails: Union[Guardrails, None] = None, storage: Union[Storage, None] = None, dedupe: bool = False) -> None:
         """
         Initializes the bounding box augmentor
 
@@ -35,6 +50,22 @@ class BoundingBoxAugmentor:
 
         imageDim -- Dimension of the final image
 
+        tiler (Tiler) -- Augments fixed size tiles of every image as separate samples, boxes are clipped to every tile
+
+        layout (OutputLayout) -- Names the outputs deterministically and fans them out into hashed sub folders
+
+        memoryBudget (Union[int, MemoryBudget]) -- Memory in bytes, or a budget, every image is admitted against before it is decoded so the batches running at once can't run out of memory
+
+        archivePath (str) -- Path to a zip or tar archive the images are read from without extracting it, the file_name of every image is resolved to a member by its path and then by its file name
+
+        hashSplit (bool) -- Assigns every image to its partition from a stable hash of its file_name instead of shuffling the whole list, the split stays the same as images are added and partitioning streams. The seed salts the hash
+
+        guardrails (Guardrails) -- Pixel cap and per image deadline, images breaking them are quarantined and skipped. guardrails.summary() has the quarantined images once the run is over
+
+        storage (Storage) -- Storage the outputs are written to instead of the disk, the output paths and targetJsonPath are its keys. Outputs are encoded in memory and uploaded while the next images are computed
+
+        dedupe (bool) -- Re-samples variations which would repeat the filter and parameters of an earlier variation of the same image, for filters with a parameter space such as flips and rotations. Variations with no new parameters left are dropped and logged
+
         Return: None
         """
 
@@ -45,6 +76,15 @@ class BoundingBoxAugmentor:
         self.split = split
         self.imageDim = imageDim
         self.targetJsonPath = targetJsonPath
+        self.tiler = tiler
+        self.layout = layout
+        self.archivePath = archivePath
+        self.hashSplit = hashSplit
+        self.guardrails = guardrails
+        self.storage = storage
+        self.dedupe = dedupe
+        self.seed = seed
+        self.memoryBudget = MemoryBudget(memoryBudget) if isinstance(memoryBudget, int) else memoryBudget
 
         if split:
             if not (isinstance(ratio, tuple) or isinstance(ratio, list)):
@@ -66,6 +106,7 @@ class BoundingBoxAugmentor:
                 self.validate = True
                 self.validRatio = ratio[2]
 
+            self.ratio = tuple(ratio)
             self.trainRatio = ratio[0]
             self.testRatio = ratio[1]
 
@@ -74,19 +115,50 @@ class BoundingBoxAugmentor:
         else:
             self.rand = Random()
 
-    @property
-    def data(self):
-        with open(self.annotationsJsonPath, 'r') as f:
-            return json.load(f)
+    @cached_property
+    def annotationStore(self) -> AnnotationStore:
+        """
+        Columnar copy of the annotations file, built once and memory mapped by every batch
+        """
+        return AnnotationStore.open(self.annotationsJsonPath)
+
+    @cached_property
+    def archive(self) -> Union[Archive, None]:
+        """
+        Archive the images are read from, None when they are read from the disk
+        """
+        return Archive(self.archivePath) if self.archivePath is not None else None
 
     @property
     def targetImages(self):
-        return [x['file_name'] for x in self.data['images']]
+        if self.archive is None:
+            return self.annotationStore.fileNames
+
+        members = [self.archive.resolve(x) for x in self.annotationStore.fileNames]
+        return [x for x in members if x is not None]
+        # images missing from the archive are left out
+
+    @cached_property
+    def splitter(self) -> HashSplitter:
+        """
+        Hash based splitter used when hashSplit is set
+        """
+        return HashSplitter(self.ratio, self.seed)
+
+    @staticmethod
+    def splitKey(image: str) -> str:
+        """
+        Identity an image is split by
+        """
+        return image.replace('\\', '/')
 
     def partition(self) -> dict[str, list[str]]:
         """
         Partitions the folders content into train, test, valid, if split set to true
         """
+        if self.hashSplit:
+            return self.splitter.partition(self.targetImages, self.splitKey)
+
         images = self.targetImages
 
         self.rand.shuffle(images)
@@ -123,18 +195,18 @@ class BoundingBoxAugmentor:
         """
 
         def groupBatches(imgs: list[str], partition: str):
-            self.rand.shuffle(imgs)
+            if self.archive is not None:
+                imgs.sort(key=self.archive.position)
+                # every batch reads a contiguous range of the archive
+            else:
+                self.rand.shuffle(imgs)
             for i in range(0, len(imgs), self.batchSize):
-                bottom = i
-                top = i + self.batchSize
-                if top > len(imgs) - 1:
-                    top = len(imgs) - 1
-                batch = imgs[bottom:top]
+                batch = imgs[i:i + self.batchSize]
 
                 if multiThreaded:
-                    yield BoundingBoxBatch(batch, os.path.join(self.targetFolder, partition), self.annotationsJsonPath, os.path.join(os.path.dirname(self.targetJsonPath), f"temp-{str(uuid1())}.json"), self.transforms, self.imageDim, f"#{i/self.batchSize}")
+                    yield BoundingBoxBatch(batch, os.path.join(self.targetFolder, partition), self.annotationStore, os.path.join(os.path.dirname(self.targetJsonPath), f"temp-{str(uuid1())}.json"), self.transforms, self.imageDim, f"#{i/self.batchSize}", self.tiler, self.layout, self.memoryBudget, archive=self.archive, guardrails=self.guardrails, storage=self.storage, dedupe=self.dedupe)
                 else:
-                    yield BoundingBoxBatch(batch, os.path.join(self.targetFolder, partition), self.annotationsJsonPath, self.targetJsonPath, self.transforms, self.imageDim, f"#{i/self.batchSize}")
+                    yield BoundingBoxBatch(batch, os.path.join(self.targetFolder, partition), self.annotationStore, self.targetJsonPath, self.transforms, self.imageDim, f"#{i/self.batchSize}", self.tiler, self.layout, self.memoryBudget, archive=self.archive, guardrails=self.guardrails, storage=self.storage, dedupe=self.dedupe)
 
         if isinstance(images, dict):
             for partition in images:
@@ -142,11 +214,104 @@ class BoundingBoxAugmentor:
         else:
             yield groupBatches(images, "")
 
+    def streamBatches(self, multiThreaded: bool = False):
+        """
+        Assigns images to their partitions with the hash splitter and yields the batches as they fill, without holding the partitions in memory
+
+        Keyword arguments:
+
+        multiThreaded (bool) -- Takes measure to avoid file write issues when doing multi threading
+
+        Return: Generator of batches
+        """
+        counts: dict[str, int] = {}
+        for partition, group in self.splitter.groups(self.targetImages, self.batchSize, self.splitKey):
+            i = counts.get(partition, 0)
+            counts[partition] = i + 1
+
+            jsonPath = os.path.join(os.path.dirname(self.targetJsonPath), f"temp-{str(uuid1())}.json") if multiThreaded else self.targetJsonPath
+            yield BoundingBoxBatch(group, os.path.join(self.targetFolder, partition), self.annotationStore, jsonPath, self.transforms, self.imageDim, f"{partition} #{i}", self.tiler, self.layout, self.memoryBudget, archive=self.archive, guardrails=self.guardrails, storage=self.storage, dedupe=self.dedupe)
+
+    def dryRun(self, variations: int = 15, fraction: float = 0.01, workers: Union[int, None] = None, seed: Any = 0, reportPath: Union[str, None] = None) -> dict[str, Any]:
+        """
+        Forecasts the run without running it, a sample of the images goes through the real transforms and encoder into a temporary folder and the totals are extrapolated. The output bytes leave out the annotations json
+
+        Keyword arguments:
+
+        variations (int) -- Total Variations to the image
+
+        fraction (float) -- Fraction of the images sampled, at least 16 and at most 1000 images are
+
+        workers (int) -- Number of workers the wall time and the peak memory are forecast for, defaults to the number of cpus
+
+        seed (Any) -- Seed used to pick the sample
+
+        reportPath (str) -- Path to write the report to as json
+
+        Return: The report, see CostEstimator.estimate
+        """
+
+        def makeBatch(folder: str, images: list[str]) -> BoundingBoxBatch:
+            return BoundingBoxBatch(images, folder, self.annotationStore, f"{folder}.json", self.transforms, self.imageDim, "dry run", self.tiler, self.layout, archive=self.archive, dedupe=self.dedupe)
+
+        estimator = CostEstimator(fraction, seed=seed)
+        report = estimator.estimate(self.targetImages, makeBatch, variations, workers, memoryBudget=self.memoryBudget)
+        if reportPath is not None:
+            estimator.save(report, reportPath)
+
+        return report
+
+    def autoTune(self, sampleSize: int = 16, cachePath: Union[str, None] = DEFAULT_CACHE_PATH, force: bool = False) -> dict[str, Any]:
+        """
+        Benchmarks a sample of the images with the transforms and applies the fastest batch size and cv2 thread count, results are reused on later runs on the same host
+
+        Keyword arguments:
+
+        sampleSize (int) -- Number of images benchmarked
+
+        cachePath (str) -- Path of the json file the results are persisted to, None disables persisting
+
+        force (bool) -- Benchmarks again even if a persisted result exists
+
+        Return: The chosen configuration, see AutoTuner.tune
+        """
+
+        tuner = AutoTuner(self.transforms, self.imageDim, cachePath=cachePath)
+        result = tuner.tune(self.targetImages, sampleSize, force=force, load=self.archive.load if self.archive is not None else None)
+        tuner.apply(self, result)
+
+        return result
+
+    def virtualAugment(self, recordsPath: str, variations: int = 15) -> int:
+        """
+        Records the sampled filters, parameters and transformed boxes of every variation instead of saving their pixels, VirtualDataset renders them on access
+
+        Keyword arguments:
+
+        recordsPath (str) -- Path of the records file
+
+        variations (int) -- Total Variations to the image
+
+        Return: Number of records written
+        """
+
+        store = self.annotationStore
+
+        def getBBoxes(path: str) -> list[tuple[COCO, Union[int, str]]]:
+            boxes, categoryIDs = store.boxes(store.findRow(path))
+            return [(COCO.fromIterable(box), categoryID) for box, categoryID in zip(boxes.tolist(), categoryIDs)]
+
+        return writeRecords(recordsPath, self.targetImages, self.transforms, variations, getBBoxes)
+
     def createTargetFolder(self):
         """
         Creates target folder if it doesnt exist
         """
 
+        if self.storage is not None:
+            return
+            # outputs written to a storage need no folders
+
         if not os.path.exists(self.targetFolder):
             os.mkdir(self.targetFolder)
 
@@ -169,7 +334,9 @@ class BoundingBoxAugmentor:
 
         self.createTargetFolder()
 
-        if self.split:
+        if self.split and self.hashSplit:
+            batches = [self.streamBatches()]
+        elif self.split:
             batches = self.batch(self.partition())
         else:
             batches = self.batch(self.targetImages)
@@ -178,6 +345,71 @@ class BoundingBoxAugmentor:
             for batch in _:
                 batch.augment()
 
+    def scheduledAugment(self, variations: int = 15, workers: Union[int, None] = None, variationsPerItem: Union[int, None] = None) -> dict[str, Union[int, float]]:
+        """
+        Augments every image with workers taking images, largest first, from a shared queue, so a batch of large images can't hold up the run. The annotations are written to temporary files, run unifyTemps afterwards
+
+        Keyword arguments:
+
+        variations (int) -- Total Variations to the image
+
+        workers (int) -- Number of worker threads, defaults to the number of cpus
+
+        variationsPerItem (int) -- Spreads the variations of an image over several workers in runs of this size, None keeps every image on one worker
+
+        Return: Statistics of the run, see Scheduler.run, with the summary of the guardrails under 'quarantine'
+        """
+
+        self.createTargetFolder()
+
+        partitions = self.partition() if self.split else {"": self.targetImages}
+        batches = [BoundingBoxBatch(images, os.path.join(self.targetFolder, partition), self.annotationStore, os.path.join(os.path.dirname(self.targetJsonPath), f"temp-{str(uuid1())}.json"), self.transforms, self.imageDim, partition, self.tiler, self.layout, self.memoryBudget, archive=self.archive, guardrails=self.guardrails, storage=self.storage, dedupe=self.dedupe) for partition, images in partitions.items()]
+        # every batch keeps its annotations in memory and writes its own temporary file once, when the scheduler flushes it
+
+        stats = Scheduler(workers, variationsPerItem).run(batches, variations)
+        if self.guardrails is not None:
+            stats['quarantine'] = self.guardrails.summary()
+
+        return stats
+
+    def batchesFor(self, images: list[str]) -> list[BoundingBoxBatch]:
+        """
+        Gets one batch per partition holding the given images, their annotations are appended to targetJsonPath. The hash splitter assigns them, so images added later land where a full run would put them. Run the batches one after the other, they share the annotations file
+
+        Keyword arguments:
+
+        images (list[str]) -- Images listed in the annotations file
+
+        Return: List of batches
+        """
+
+        partitions = self.splitter.partition(images, self.splitKey) if self.split else {"": list(images)}
+
+        return [BoundingBoxBatch(group, os.path.join(self.targetFolder, partition), self.annotationStore, self.targetJsonPath, self.transforms, self.imageDim, partition, self.tiler, self.layout, self.memoryBudget, archive=self.archive, guardrails=self.guardrails, storage=self.storage, dedupe=self.dedupe) for partition, group in partitions.items() if group]
+
+    def watch(self, variations: int = 15, interval: float = 1.0, settle: float = 1.0, microBatch: int = 32, workers: Union[int, None] = None, processExisting: bool = False) -> AnnotationWatcher:
+        """
+        Watches the annotations file and augments the images added to it, see AnnotationWatcher
+
+        Keyword arguments:
+
+        variations (int) -- Total Variations to every new image
+
+        interval (float) -- Seconds between two polls while nothing changes
+
+        settle (float) -- Seconds the annotations file has to stay unmodified before it is read
+
+        microBatch (int) -- Largest number of images augmented together
+
+        workers (int) -- Number of worker threads, defaults to the number of cpus
+
+        processExisting (bool) -- Also augments the images the annotations file lists now
+
+        Return: The watcher, run() blocks until stop() is called, start() runs it in a background thread
+        """
+
+        return AnnotationWatcher(self, processExisting, variations=variations, interval=interval, settle=settle, microBatch=microBatch, workers=workers)
+
     def threadAugment(self, variations: int = 15):
         """
         Augments every image by dividing them into batches in parallel
@@ -186,12 +418,14 @@ class BoundingBoxAugmentor:
 
         variations (int) -- Total Variations to the image
 
-        Return: None        
+        Return: The started threads, join them to wait for the run. memoryBudget.report() then has the peak memory against the budget
         """
 
         self.createTargetFolder()
 
-        if self.split:
+        if self.split and self.hashSplit:
+            batches = [self.streamBatches(True)]
+        elif self.split:
             batches = self.batch(self.partition(), True)
         else:
             batches = self.batch(self.targetImages, True)
@@ -207,6 +441,8 @@ class BoundingBoxAugmentor:
         for thread in threads:
             thread.start()
 
+        return threads
+
     def unifyTemps(self):
         """
         Unifies temporary json files. This method is meant to ran only after threadAugment is **finished running**
@@ -217,6 +453,19 @@ class BoundingBoxAugmentor:
             "annotations": []
         }
         basePath = os.path.dirname(self.targetJsonPath)
+
+        if self.storage is not None:
+            prefix = f"{basePath}/" if basePath else ""
+            for key in self.storage.keys(prefix):
+                if "/" not in key[len(prefix):] and key.endswith(".json"):
+                    data = json.loads(self.storage.read(key))
+                    for d in currentData:
+                        currentData[d] += data[d]
+                    self.storage.delete(key)
+
+            self.storage.write(self.targetJsonPath, json.dumps(currentData).encode('utf-8'))
+            return
+
         for fileName in os.listdir(basePath):
             filePath = os.path.join(basePath, fileName)
             if os.path.isfile(filePath) and fileName.endswith(".json"):
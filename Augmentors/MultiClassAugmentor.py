@@ -1,81 +1,347 @@
-# from typing import Any, Union
-# from Augmentors.SimpleAugmentor import SimpleAugmentor
-# from Composite import Composite
-# from Batch import Batch
-# import os
-
-
-# class MultiClassAugmentor(SimpleAugmentor):
-#     """
-#     Simple Augmentor:
-
-#     - Scans the target folder
-#     - Treats the folders inside as induvidual classes
-#     - Gets all the images in the classes
-#     - Augments them together
-#     - Train, Valid, Test set partition if needed
-#     """
-
-#     def __init__(self, imagesDirectory: str, targetFolder: str, transforms: Composite, batchSize: int = 32, split: bool = True, ratio: tuple[float] = (0.75, 0.1, 0.15), seed: Union[None, Any] = None, imageDim: tuple[int, int] = (256, 256)) -> None:
-#         """
-#         Initializes Multi Class augmentor
-
-#         Keyword arguments:
-
-#         imagesDirectory (str) -- Path to the folder containing all the images
-
-#         targetFolder (str) -- Path to the folder to store all the augmented images
-
-#         transforms (Composite) -- Composition of filters
-
-#         batchSize (int) -- Size of 1 batch. Each batch will be ran in a seperate batch. Choose your batch size wisely.
-
-#         split (bool) -- Partitions the dataset of image into (Train, Test) or (Train, Test, Valid)
-
-#         ratio (tuple[float]) -- Size of each partitions (in terms of batches) each value should be in range [0, 1] sum of all of the float should be 1
-
-#         seed -- Seed for random generator
-
-#         imageDim -- Dimension of the final image
-
-#         Return: None
-#         """
-#         super().__init__(imagesDirectory, targetFolder,
-#                          transforms, batchSize, split, ratio, seed, imageDim)
-#         self.classes = [x for x in os.listdir(self.imagesDirectory) if os.path.isdir(os.path.join(self.imagesDirectory, x))]
-
-#     @property
-#     def targetImages(self) -> list[tuple[str, str]]:
-#         """
-#         List of all the images with their classes
-#         """
-#         images = []
-#         for _cls in self.classes:
-#             path = os.path.join(self.imagesDirectory, _cls)
-#             subImgs = [(os.path.join(path, x), _cls) for x in os.listdir(path)]
-#             images+= subImgs
-
-#         return images
-    
-#     def partition(self) -> dict[str, list[tuple[str, str]]]:
-#         return super().partition()
-    
-#     def batch(self, images: dict[str, list[str]] | list[str]):
-#         def groupBatches(imgs:list[str], partition:str):
-#             self.rand.shuffle(imgs)
-#             for i in range(0, len(imgs), self.batchSize):
-#                 bottom = i
-#                 top = i + self.batchSize
-#                 if top > len(imgs) - 1:
-#                     top = len(imgs) - 1
-#                 batch =  [x[0] for x in imgs[bottom:top]]
-#                 print(batch)
-
-#                 yield Batch(batch, os.path.join(self.targetFolder, partition), self.transforms, self.imageDim, f"{partition} #{i/self.batchSize}")
-
-        
-#         if isinstance(images, dict):
-#             for partition in images:
-#                 yield groupBatches(images[partition], partition)
-#         else:
-#             yield groupBatches(images, "")
\ No newline at end of file
+from typing import Any, Union
+from Augmentors.SimpleAugmentor import SimpleAugmentor
+from Composite import Composite
+from Batch import Batch
+from Catalog import IMAGE_EXTENSIONS
+from Tiling import Tiler
+from OutputLayout import OutputLayout
+from MemoryBudget import MemoryBudget
+from Scheduler import Scheduler
+from Guardrails import Guardrails
+from Storage import Storage
+from typing import Iterable
+import os
+import threading
+
+
+class MultiClassAugmentor(SimpleAugmentor):
+    """
+    Multi Class Augmentor:
+
+    - Scans the target folder
+    - Treats the folders inside as induvidual classes
+    - Gets all the images in the classes
+    - Assigns variations per image so that the classes end up balanced
+    - Augments the classes in parallel
+    - Train, Valid, Test set partition if needed (every class is partitioned separately)
+    """
+
+    def __init__(self, imagesDirectory: str, targetFolder: str, transforms: Composite, batchSize: int = 32, split: bool = True, ratio: tuple[float] = (0.75, 0.1, 0.15), seed: Union[None, Any] = None, imageDim: tuple[int, int] = (256, 256), targetPerClass: Union[int, None] = None, budget: Union[int, None] = None, maxVariations: Union[int, None] = None, extensions: Union[Iterable[str], None] = IMAGE_EXTENSIONS, catalogPath: Union[str, None] = None, tiler: Union[Tiler, None] = None, layout: Union[OutputLayout, None] = None, memoryBudget: Union[int, MemoryBudget, None] = None, hashSplit: bool = False, guardrails: Union[Guardrails, None] = None, storage: Union[Storage, None] = None, dedupe: bool = False) -> None:
+        """
+        Initializes Multi Class augmentor
+
+        Keyword arguments:
+
+        imagesDirectory (str) -- Path to the folder containing a sub folder of images for every class
+
+        targetFolder (str) -- Path to the folder to store all the augmented images
+
+        transforms (Composite) -- Composition of filters
+
+        batchSize (int) -- Size of 1 batch. Each batch will be ran in a seperate batch. Choose your batch size wisely.
+
+        split (bool) -- Partitions the dataset of image into (Train, Test) or (Train, Test, Valid)
+
+        ratio (tuple[float]) -- Size of each partitions (in terms of batches) each value should be in range [0, 1] sum of all of the float should be 1
+
+        seed -- Seed for random generator
+
+        imageDim -- Dimension of the final image
+
+        targetPerClass (int) -- Number of samples (originals included) every class should end up with
+
+        budget (int) -- Total number of variations to generate, they are given to the smallest classes first. When targetPerClass is also set, no class is pushed past it
+
+        maxVariations (int) -- Upper bound of the variations of a single image
+
+        extensions (Iterable[str]) -- Extensions of the files treated as images, None treats every file as an image
+
+        catalogPath (str) -- Path to persist the image catalog to, later runs only probe new or changed files
+
+        tiler (Tiler) -- Augments fixed size tiles of every image as separate samples, meant for very large images
+
+        layout (OutputLayout) -- Names the outputs deterministically and fans them out into hashed sub folders
+
+        memoryBudget (Union[int, MemoryBudget]) -- Memory in bytes, or a budget, every image is admitted against before it is decoded so the batches running at once can't run out of memory
+
+        hashSplit (bool) -- Assigns every image to its partition from a stable hash of its path inside its class folder instead of shuffling the class, the split stays the same as images are added. The seed salts the hash
+
+        guardrails (Guardrails) -- Pixel cap and per image deadline, images breaking them are quarantined and skipped. guardrails.summary() has the quarantined images once the run is over
+
+        storage (Storage) -- Storage the outputs are written to instead of the disk, the output paths are its keys. Outputs are encoded in memory and uploaded while the next images are computed
+
+        dedupe (bool) -- Re-samples variations which would repeat the filter and parameters of an earlier variation of the same image, for filters with a parameter space such as flips and rotations. Variations with no new parameters left are dropped and logged
+
+        Return: None
+        """
+        super().__init__(imagesDirectory, targetFolder,
+                         transforms, batchSize, split, ratio, seed, imageDim, extensions, True, catalogPath, tiler, layout, memoryBudget, hashSplit=hashSplit, guardrails=guardrails, storage=storage, dedupe=dedupe)
+
+        if targetPerClass is not None and targetPerClass < 0:
+            raise ValueError("targetPerClass should not be negative")
+
+        if budget is not None and budget < 0:
+            raise ValueError("budget should not be negative")
+
+        self.targetPerClass = targetPerClass
+        self.budget = budget
+        self.maxVariations = maxVariations
+        self.classes = sorted(x for x in os.listdir(self.imagesDirectory) if os.path.isdir(os.path.join(self.imagesDirectory, x)))
+
+    @property
+    def classImages(self) -> dict[str, list[str]]:
+        """
+        Paths of all the images of every class
+        """
+        images = {_cls: [] for _cls in self.classes}
+        for path in self.catalog.images:
+            _cls = path.split(os.sep, 1)[0]
+            if _cls in images and _cls != path:
+                images[_cls].append(os.path.join(self.imagesDirectory, path))
+        # the catalog is scanned recursively, the first folder of every path is its class
+
+        return images
+
+    def splitKey(self, image: str) -> str:
+        """
+        Identity an image is split by, its path relative to the images directory so moving the dataset keeps the split
+        """
+        return os.path.relpath(image, self.imagesDirectory).replace('\\', '/')
+
+    def classDeficits(self, counts: dict[str, int]) -> dict[str, int]:
+        """
+        Calculates how many variations every class needs
+
+        Keyword arguments:
+
+        counts (dict[str, int]) -- Number of images in every class
+
+        Return: Number of variations to generate for every class
+        """
+
+        if self.budget is None:
+            return {c: max(0, self.targetPerClass - n) for c, n in counts.items()}
+
+        def deficits(level: int) -> dict[str, int]:
+            return {c: max(0, level - n) for c, n in counts.items()}
+
+        low = 0
+        high = self.targetPerClass if self.targetPerClass is not None else max(counts.values()) + self.budget
+        while low < high:
+            mid = (low + high + 1) // 2
+            if sum(deficits(mid).values()) <= self.budget:
+                low = mid
+            else:
+                high = mid - 1
+        # finding the highest level every class can be filled up to within the budget
+
+        result = deficits(low)
+        leftover = self.budget - sum(result.values())
+
+        if self.targetPerClass is None or low < self.targetPerClass:
+            for c in sorted(counts, key=lambda x: (counts[x], x)):
+                if leftover == 0 or counts[c] > low:
+                    break
+                result[c] += 1
+                leftover -= 1
+            # handing out the remainder one by one to the smallest classes
+
+        return result
+
+    def variationPlan(self, variations: int = 15) -> dict[str, int]:
+        """
+        Assigns the number of variations of every image
+
+        Keyword arguments:
+
+        variations (int) -- Variations of every image, only used when neither targetPerClass nor budget is set
+
+        Return: Number of variations keyed by the path of the image
+        """
+
+        classImages = {c: images for c, images in self.classImages.items() if len(images) > 0}
+
+        if self.targetPerClass is None and self.budget is None:
+            return {x: variations for images in classImages.values() for x in images}
+
+        deficits = self.classDeficits({c: len(images) for c, images in classImages.items()})
+
+        plan = {}
+        for _cls, images in classImages.items():
+            images = list(images)
+            self.rand.shuffle(images)
+            base, extra = divmod(deficits[_cls], len(images))
+
+            for i, image in enumerate(images):
+                count = base + 1 if i < extra else base
+                if self.maxVariations is not None:
+                    count = min(count, self.maxVariations)
+                plan[image] = count
+            # spreading the deficit evenly over the images of the class
+
+        return plan
+
+    def partitionClasses(self) -> dict[str, dict[str, list[str]]]:
+        """
+        Partitions every class separately into train, test, valid, if split set to true
+
+        Return: Images of every class keyed by partition and class
+        """
+
+        classImages = self.classImages
+        if not self.split:
+            return {"": classImages}
+
+        partitions: dict[str, dict[str, list[str]]] = {}
+        for _cls, images in classImages.items():
+            for partition, subset in self.partition(images).items():
+                partitions.setdefault(partition, {})[_cls] = subset
+
+        return partitions
+
+    def batch(self, images: dict[str, list[str]], partition: str = ""):
+        """
+        Groups the images of every class into small batches with each batch of having size batchSize
+
+        Keyword arguments:
+
+        images (dict[str, list[str]]) -- Path to the images keyed by their class
+
+        partition (str) -- Name of the partition the images belong to
+
+        Return: Generator of batches for every class
+        """
+
+        def groupBatches(imgs: list[str], _cls: str):
+            imgs = list(imgs)
+            self.rand.shuffle(imgs)
+            for i in range(0, len(imgs), self.batchSize):
+                batch = imgs[i:i + self.batchSize]
+
+                yield Batch(batch, os.path.join(self.targetFolder, partition, _cls), self.transforms, self.imageDim, f"{partition} {_cls} #{i//self.batchSize}", self.tiler, self.layout, self.memoryBudget, guardrails=self.guardrails, storage=self.storage, dedupe=self.dedupe)
+
+        for _cls in images:
+            yield groupBatches(images[_cls], _cls)
+
+    def createTargetFolder(self):
+        """
+        Creates the target folder and the folders of every partition and class if they dont exist
+        """
+
+        partitions = ['train', 'test', 'valid'] if self.split else ['']
+        for partition in partitions:
+            for _cls in self.classes:
+                self.createFolder(os.path.join(self.targetFolder, partition, _cls))
+
+    def sequentialAugment(self, variations: int = 15):
+        """
+        Augments every image one by one in 1 thread
+
+        Keyword arguments:
+
+        variations (int) -- Total Variations to the image when no balancing target or budget is set
+
+        Return: None
+        """
+
+        self.createTargetFolder()
+        plan = self.variationPlan(variations)
+
+        for partition, images in self.partitionClasses().items():
+            for batches in self.batch(images, partition):
+                for batch in batches:
+                    batch.augment(plan)
+
+    def partitionBatches(self) -> list[Batch]:
+        """
+        Gets one batch holding every image of every class of every partition
+
+        Return: List of batches
+        """
+
+        batches: list[Batch] = []
+        for partition, images in self.partitionClasses().items():
+            for _cls, imgs in images.items():
+                batches.append(Batch(imgs, os.path.join(self.targetFolder, partition, _cls), self.transforms, self.imageDim, f"{partition} {_cls}", self.tiler, self.layout, self.memoryBudget, guardrails=self.guardrails, storage=self.storage, dedupe=self.dedupe))
+
+        return batches
+
+    def batchesFor(self, images: Iterable[str]) -> list[Batch]:
+        """
+        Gets one batch per class and partition holding the given images, creating their folders. Used by watch(), every new image gets the same variations as the classes can't be balanced one image at a time
+
+        Keyword arguments:
+
+        images (Iterable[str]) -- Images relative to the images directory, the first folder of every path is its class
+
+        Return: List of batches
+        """
+
+        classImages: dict[str, list[str]] = {}
+        for path in images:
+            _cls = path.split(os.sep, 1)[0]
+            if _cls != path:
+                classImages.setdefault(_cls, []).append(os.path.join(self.imagesDirectory, path))
+
+        batches: list[Batch] = []
+        for _cls, imgs in classImages.items():
+            partitions = self.splitter.partition(imgs, self.splitKey) if self.split else {"": imgs}
+            for partition, group in partitions.items():
+                if not group:
+                    continue
+
+                folder = os.path.join(self.targetFolder, partition, _cls)
+                self.createFolder(folder)
+                batches.append(Batch(group, folder, self.transforms, self.imageDim, f"{partition} {_cls}", self.tiler, self.layout, self.memoryBudget, guardrails=self.guardrails, storage=self.storage, dedupe=self.dedupe))
+
+        return batches
+
+    def scheduledAugment(self, variations: int = 15, workers: Union[int, None] = None, variationsPerItem: Union[int, None] = None) -> dict[str, Union[int, float]]:
+        """
+        Augments every class with workers taking images, largest first, from a shared queue
+
+        Keyword arguments:
+
+        variations (int) -- Total Variations to the image when no balancing target or budget is set
+
+        workers (int) -- Number of worker threads, defaults to the number of cpus
+
+        variationsPerItem (int) -- Spreads the variations of an image over several workers in runs of this size, None keeps every image on one worker
+
+        Return: Statistics of the run, see Scheduler.run, with the summary of the guardrails under 'quarantine'
+        """
+
+        self.createTargetFolder()
+
+        stats = Scheduler(workers, variationsPerItem).run(self.partitionBatches(), self.variationPlan(variations))
+        if self.guardrails is not None:
+            stats['quarantine'] = self.guardrails.summary()
+
+        return stats
+
+    def threadAugment(self, variations: int = 15):
+        """
+        Augments every class in parallel, every batch of every class gets its own thread
+
+        Keyword arguments:
+
+        variations (int) -- Total Variations to the image when no balancing target or budget is set
+
+        Return: The started threads, join them to wait for the run. memoryBudget.report() then has the peak memory against the budget
+        """
+
+        self.createTargetFolder()
+        plan = self.variationPlan(variations)
+
+        threads: list[threading.Thread] = []
+
+        for partition, images in self.partitionClasses().items():
+            for batches in self.batch(images, partition):
+                for batch in batches:
+                    thread = threading.Thread(target=batch.augment, args=(plan,))
+                    threads.append(thread)
+
+        for thread in threads:
+            thread.start()
+
+        return threads
@@ -3,6 +3,22 @@ from typing import Any, Union
 import os
 from Batch import Batch
 from Composite import Composite
+from Catalog import Catalog, IMAGE_EXTENSIONS
+from Tiling import Tiler
+from OutputLayout import OutputLayout
+from MemoryBudget import MemoryBudget
+from AutoTune import AutoTuner, DEFAULT_CACHE_PATH
+from VirtualDataset import writeRecords
+from Archive import Archive
+from Split import HashSplitter
+from Scheduler import Scheduler
+from DryRun import CostEstimator
+from Guardrails import Guardrails
+from Storage import Storage
+from VideoSource import VideoSource
+from Watcher import FolderWatcher
+from functools import cached_property
+from typing import Iterable
 import threading
 
 class SimpleAugmentor:
@@ -15,13 +31,13 @@ class SimpleAugmentor:
     - Train, Valid, Test set partition if needed
     - Does not support multiple classes
     """
-    def __init__(self, imagesDirectory:str, targetFolder:str, transforms:Composite, batchSize:int=32, split:bool=True, ratio:tuple[float]=(0.75, 0.1, 0.15), seed:Union[None, Any]=None, imageDim:tuple[int, int]=(256, 256)) -> None:
+    def __init__(self, imagesDirectory:str, targetFolder:str, transforms:Composite, batchSize:int=32, split:bool=True, ratio:tuple[float]=(0.75, 0.1, 0.15), seed:Union[None, Any]=None, imageDim:tuple[int, int]=(256, 256), extensions:Union[Iterable[str], None]=IMAGE_EXTENSIONS, recursive:bool=False, catalogPath:Union[str, None]=None, tiler:Union[Tiler, None]=None, layout:Union[OutputLayout, None]=None, memoryBudget:Union[int, MemoryBudget, None]=None, videoSource:Union[VideoSource, None]=None, hashSplit:bool=False, guardrails:Union[Guardrails, None]=None, storage:Union[Storage, None]=None, dedupe:bool=False) -> None:
         """
         Initializes simple augmentor
         
         Keyword arguments:
 
-        imagesDirectory (str) -- Path to the folder containing all the images
+        imagesDirectory (str) -- Path to the folder containing all the images, or to a zip or tar archive of them which is read without extracting it
         
         targetFolder (str) -- Path to the folder to store all the augmented images
 
@@ -36,16 +52,50 @@ class SimpleAugmentor:
         seed -- Seed for random generator
 
         imageDim -- Dimension of the final image
-        
+
+        extensions (Iterable[str]) -- Extensions of the files treated as images, None treats every file as an image
+
+        recursive (bool) -- Includes the images in the sub folders
+
+        catalogPath (str) -- Path to persist the image catalog to, later runs only probe new or changed files
+
+        tiler (Tiler) -- Augments fixed size tiles of every image as separate samples, meant for very large images
+
+        layout (OutputLayout) -- Names the outputs deterministically and fans them out into hashed sub folders
+
+        memoryBudget (Union[int, MemoryBudget]) -- Memory in bytes, or a budget, every image is admitted against before it is decoded so the batches running at once can't run out of memory
+
+        videoSource (VideoSource) -- Streams sampled frames out of videos as the images, imagesDirectory is then ignored
+
+        hashSplit (bool) -- Assigns every image to its partition from a stable hash of its path instead of shuffling the whole list, the split stays the same as images are added and partitioning streams. The seed salts the hash
+
+        guardrails (Guardrails) -- Pixel cap and per image deadline, images breaking them are quarantined and skipped. guardrails.summary() has the quarantined images once the run is over
+
+        storage (Storage) -- Storage the outputs are written to instead of the disk, the output paths are its keys. Outputs are encoded in memory and uploaded while the next images are computed
+
+        dedupe (bool) -- Re-samples variations which would repeat the filter and parameters of an earlier variation of the same image, for filters with a parameter space such as flips and rotations. Variations with no new parameters left are dropped and logged
+
         Return: None
         """
         
         self.imagesDirectory= imagesDirectory
+        self.videoSource = videoSource
+        self.extensions = extensions
+        self.recursive = recursive
+        self.catalogPath = catalogPath
+        self.tiler = tiler
+        self.layout = layout
+        self.memoryBudget = MemoryBudget(memoryBudget) if isinstance(memoryBudget, int) else memoryBudget
         self.batchSize = batchSize
         self.targetFolder = targetFolder
         self.transforms = transforms
         self.split = split
         self.imageDim = imageDim
+        self.hashSplit = hashSplit
+        self.guardrails = guardrails
+        self.storage = storage
+        self.dedupe = dedupe
+        self.seed = seed
 
         if split:
             if not (isinstance(ratio, tuple) or isinstance(ratio, list)):
@@ -66,6 +116,7 @@ class SimpleAugmentor:
                 self.validate = True
                 self.validRatio = ratio[2]
             
+            self.ratio = tuple(ratio)
             self.trainRatio = ratio[0]
             self.testRatio = ratio[1]
 
@@ -75,18 +126,75 @@ class SimpleAugmentor:
             self.rand = Random()
 
     
+    @cached_property
+    def catalog(self) -> Catalog:
+        """
+        Catalog of the images directory, scanned once on first access
+        """
+        return Catalog(self.imagesDirectory, self.extensions, self.recursive, self.catalogPath).refresh()
+
+    @cached_property
+    def archive(self) -> Union[Archive, VideoSource, None]:
+        """
+        Source the images are read from, the video source when there is one, an archive when imagesDirectory is a zip or tar file and None for folders
+        """
+        if self.videoSource is not None:
+            return self.videoSource
+
+        if os.path.isfile(self.imagesDirectory):
+            return Archive(self.imagesDirectory, self.extensions)
+
+        return None
+
     @property
     def targetImages(self) -> list[str]:
         """
         List of all the images that will be target.
         """
-        return os.listdir(self.imagesDirectory)
+        if self.archive is not None:
+            return self.archive.members
+
+        return self.catalog.images
+
+    def imagePaths(self, images:Iterable[str]) -> list[str]:
+        """
+        Gets the paths batches read the images from, the member names themselves for archives and videos
+        """
+        if self.archive is not None:
+            return list(images)
+
+        return [os.path.join(self.imagesDirectory, x) for x in images]
     
-    def partition(self) -> dict[str, list[str]]:
+    @cached_property
+    def splitter(self) -> HashSplitter:
+        """
+        Hash based splitter used when hashSplit is set
+        """
+        return HashSplitter(self.ratio, self.seed)
+
+    def splitKey(self, image:str) -> str:
+        """
+        Identity an image is split by, the video for video frames so neighbouring frames never land in different partitions
+        """
+        if isinstance(self.archive, VideoSource):
+            return self.archive.parseMember(image)[0]
+
+        return image.replace('\\', '/')
+
+    def partition(self, images:Union[Iterable[str], None]=None) -> dict[str, list[str]]:
         """
         Partitions the folders content into train, test, valid, if split set to true
+
+        Keyword arguments:
+
+        images (Iterable[str]) -- Images to partition, defaults to targetImages
+
+        Return: Dictionary of the partitions
         """
-        images = self.targetImages
+        if self.hashSplit:
+            return self.splitter.partition(self.targetImages if images is None else images, self.splitKey)
+
+        images = self.targetImages if images is None else list(images)
 
         self.rand.shuffle(images)
         # getting and shuffling all the images 
@@ -120,15 +228,15 @@ class SimpleAugmentor:
         """
 
         def groupBatches(imgs:list[str], partition:str):
-            self.rand.shuffle(imgs)
+            if self.archive is not None:
+                imgs.sort(key=self.archive.position)
+                # every batch reads a contiguous range of the archive or of a video
+            else:
+                self.rand.shuffle(imgs)
             for i in range(0, len(imgs), self.batchSize):
-                bottom = i
-                top = i + self.batchSize
-                if top > len(imgs) - 1:
-                    top = len(imgs) - 1
-                batch =  list(map(lambda x: os.path.join(self.imagesDirectory, x), imgs[bottom:top]))
+                batch = self.imagePaths(imgs[i:i + self.batchSize])
 
-                yield Batch(batch, os.path.join(self.targetFolder, partition), self.transforms, self.imageDim, f"{partition} #{i/self.batchSize}")
+                yield Batch(batch, os.path.join(self.targetFolder, partition), self.transforms, self.imageDim, f"{partition} #{i/self.batchSize}", self.tiler, self.layout, self.memoryBudget, archive=self.archive, guardrails=self.guardrails, storage=self.storage, dedupe=self.dedupe)
 
         
         if isinstance(images, dict):
@@ -137,13 +245,107 @@ class SimpleAugmentor:
         else:
             yield groupBatches(images, "")
 
+    def streamBatches(self, images:Union[Iterable[str], None]=None):
+        """
+        Assigns images to their partitions with the hash splitter and yields the batches as they fill, without holding the partitions in memory
+
+        Keyword arguments:
+
+        images (Iterable[str]) -- Images to partition, defaults to targetImages
+
+        Return: Generator of batches
+        """
+        counts: dict[str, int] = {}
+        for partition, group in self.splitter.groups(self.targetImages if images is None else images, self.batchSize, self.splitKey):
+            i = counts.get(partition, 0)
+            counts[partition] = i + 1
+
+            yield Batch(self.imagePaths(group), os.path.join(self.targetFolder, partition), self.transforms, self.imageDim, f"{partition} #{i}", self.tiler, self.layout, self.memoryBudget, archive=self.archive, guardrails=self.guardrails, storage=self.storage, dedupe=self.dedupe)
+
+    def dryRun(self, variations:int=15, fraction:float=0.01, workers:Union[int, None]=None, seed:Any=0, reportPath:Union[str, None]=None) -> dict[str, Any]:
+        """
+        Forecasts the run without running it, a sample of the images goes through the real transforms and encoder into a temporary folder and the totals are extrapolated
+
+        Keyword arguments:
+
+        variations (int) -- Total Variations to the image
+
+        fraction (float) -- Fraction of the images sampled, at least 16 and at most 1000 images are
+
+        workers (int) -- Number of workers the wall time and the peak memory are forecast for, defaults to the number of cpus
+
+        seed (Any) -- Seed used to pick the sample
+
+        reportPath (str) -- Path to write the report to as json
+
+        Return: The report, see CostEstimator.estimate
+        """
+
+        def makeBatch(folder:str, images:list[str]) -> Batch:
+            return Batch(images, folder, self.transforms, self.imageDim, "dry run", self.tiler, self.layout, archive=self.archive, dedupe=self.dedupe)
+
+        sizes = None
+        if self.archive is None:
+            sizes = [(x.width, x.height) for x in self.catalog.entries.values() if x.width > 0]
+            # the catalog already probed every header
+
+        estimator = CostEstimator(fraction, seed=seed)
+        report = estimator.estimate(self.imagePaths(self.targetImages), makeBatch, variations, workers, sizes, self.memoryBudget)
+        if reportPath is not None:
+            estimator.save(report, reportPath)
+
+        return report
+
+    def autoTune(self, sampleSize:int=16, cachePath:Union[str, None]=DEFAULT_CACHE_PATH, force:bool=False) -> dict[str, Any]:
+        """
+        Benchmarks a sample of the images with the transforms and applies the fastest batch size and cv2 thread count, results are reused on later runs on the same host
+
+        Keyword arguments:
+
+        sampleSize (int) -- Number of images benchmarked
+
+        cachePath (str) -- Path of the json file the results are persisted to, None disables persisting
+
+        force (bool) -- Benchmarks again even if a persisted result exists
+
+        Return: The chosen configuration, see AutoTuner.tune
+        """
+
+        tuner = AutoTuner(self.transforms, self.imageDim, cachePath=cachePath)
+        result = tuner.tune(self.imagePaths(self.targetImages), sampleSize, force=force, load=self.archive.load if self.archive is not None else None)
+        tuner.apply(self, result)
+
+        return result
+
+    def virtualAugment(self, recordsPath:str, variations:int=15) -> int:
+        """
+        Records the sampled filters and parameters of every variation instead of saving their pixels, VirtualDataset renders them on access
+
+        Keyword arguments:
+
+        recordsPath (str) -- Path of the records file
+
+        variations (int) -- Total Variations to the image
+
+        Return: Number of records written
+        """
+
+        return writeRecords(recordsPath, self.imagePaths(self.targetImages), self.transforms, variations)
+
     def createTargetFolder(self):
         """
         Creates target folder if it doesnt exist
         """
 
-        if not os.path.exists(self.targetFolder):
-            os.mkdir(self.targetFolder)
+        self.createFolder(self.targetFolder)
+
+    def createFolder(self, path:str):
+        """
+        Creates an output folder if it doesnt exist, outputs written to a storage need none
+        """
+
+        if self.storage is None:
+            os.makedirs(path, exist_ok=True)
 
     def sequentialAugment(self, variations:int=15):
         """
@@ -158,28 +360,105 @@ class SimpleAugmentor:
 
         self.createTargetFolder()
 
-        batches:list[Batch] = []
+        for batch in self.partitionBatches():
+            batch.augment(variations)
+
+    def partitionBatches(self) -> list[Batch]:
+        """
+        Gets one batch holding every image of every partition, creating the folders of the partitions
 
+        Return: List of batches
+        """
+
+        batches:list[Batch] = []
 
         if self.split:
             partitions = self.partition()
             for partition in partitions:
 
                 partitionPath = os.path.join(self.targetFolder, partition)
-                if not os.path.exists(partition):
-                    os.mkdir(partitionPath)
+                self.createFolder(partitionPath)
                 
-                images = list(map(lambda x: os.path.join(self.imagesDirectory, x), partitions[partition]))
-                batch = Batch(images, partitionPath, self.transforms, self.imageDim, f"{partition}")
+                images = self.imagePaths(partitions[partition])
+                batch = Batch(images, partitionPath, self.transforms, self.imageDim, f"{partition}", self.tiler, self.layout, self.memoryBudget, archive=self.archive, guardrails=self.guardrails, storage=self.storage, dedupe=self.dedupe)
                 batches.append(batch)
         else:
-            images = list(map(lambda x: os.path.join(self.imagesDirectory, x), self.targetImages))
-            batch = Batch(images, self.targetFolder, self.transforms, self.imageDim)
+            images = self.imagePaths(self.targetImages)
+            batch = Batch(images, self.targetFolder, self.transforms, self.imageDim, tiler=self.tiler, layout=self.layout, memoryBudget=self.memoryBudget, archive=self.archive, guardrails=self.guardrails, storage=self.storage, dedupe=self.dedupe)
 
             batches.append(batch)
 
-        for batch in batches:
-            batch.augment(variations)
+        return batches
+
+    def batchesFor(self, images:Iterable[str]) -> list[Batch]:
+        """
+        Gets one batch per partition holding the given images, creating the folders of the partitions. The hash splitter assigns them, so images added later land where a full run would put them
+
+        Keyword arguments:
+
+        images (Iterable[str]) -- Images relative to the images directory
+
+        Return: List of batches
+        """
+
+        partitions = self.splitter.partition(images, self.splitKey) if self.split else {"": list(images)}
+
+        batches:list[Batch] = []
+        for partition, group in partitions.items():
+            if not group:
+                continue
+
+            partitionPath = os.path.join(self.targetFolder, partition)
+            self.createFolder(partitionPath)
+            batches.append(Batch(self.imagePaths(group), partitionPath, self.transforms, self.imageDim, f"{partition}", self.tiler, self.layout, self.memoryBudget, archive=self.archive, guardrails=self.guardrails, storage=self.storage, dedupe=self.dedupe))
+
+        return batches
+
+    def watch(self, variations:int=15, interval:float=1.0, settle:float=1.0, microBatch:int=32, workers:Union[int, None]=None, processExisting:bool=False) -> FolderWatcher:
+        """
+        Watches the images directory and augments images as they are added or changed, see FolderWatcher. Changed images are only augmented again with a layout
+
+        Keyword arguments:
+
+        variations (int) -- Total Variations to every new image
+
+        interval (float) -- Seconds between two polls while nothing changes
+
+        settle (float) -- Seconds a file has to stay unmodified before it is picked up
+
+        microBatch (int) -- Largest number of images augmented together
+
+        workers (int) -- Number of worker threads, defaults to the number of cpus
+
+        processExisting (bool) -- Also augments the images the catalog has not seen yet
+
+        Return: The watcher, run() blocks until stop() is called, start() runs it in a background thread
+        """
+
+        return FolderWatcher(self, processExisting, variations=variations, interval=interval, settle=settle, microBatch=microBatch, workers=workers)
+
+    def scheduledAugment(self, variations:int=15, workers:Union[int, None]=None, variationsPerItem:Union[int, None]=None) -> dict[str, Union[int, float]]:
+        """
+        Augments every image with workers taking images, largest first, from a shared queue, so a batch of large images can't hold up the run
+
+        Keyword arguments:
+
+        variations (int) -- Total Variations to the image
+
+        workers (int) -- Number of worker threads, defaults to the number of cpus
+
+        variationsPerItem (int) -- Spreads the variations of an image over several workers in runs of this size, None keeps every image on one worker
+
+        Return: Statistics of the run, see Scheduler.run, with the summary of the guardrails under 'quarantine'
+        """
+
+        self.createTargetFolder()
+
+        stats = Scheduler(workers, variationsPerItem).run(self.partitionBatches(), variations)
+        if self.guardrails is not None:
+            stats['quarantine'] = self.guardrails.summary()
+
+        return stats
 
     def threadAugment(self, variations:int=15):
         """
@@ -189,19 +468,21 @@ class SimpleAugmentor:
 
         variations (int) -- Total Variations to the image
 
-        Return: None        
+        Return: The started threads, join them to wait for the run. memoryBudget.report() then has the peak memory against the budget
         """
 
         self.createTargetFolder()
 
-        if self.split:
+        if self.split and self.hashSplit:
+            for partition in self.splitter.partitions:
+                self.createFolder(os.path.join(self.targetFolder, partition))
+            batches = [self.streamBatches()]
+        elif self.split:
             partitions = self.partition()
             batches = self.batch(partitions)
             for partition in partitions:
 
-                partitionPath = os.path.join(self.targetFolder, partition)
-                if not os.path.exists(partition):
-                    os.mkdir(partitionPath)
+                self.createFolder(os.path.join(self.targetFolder, partition))
         else:
             batches = self.batch(self.targetImages)
 
@@ -215,4 +496,6 @@ class SimpleAugmentor:
                 threads.append(thread)
 
         for thread in threads:
-            thread.start()
\ No newline at end of file
+            thread.start()
+
+        return threads
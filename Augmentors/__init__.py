@@ -1,3 +1,3 @@
 from Augmentors.SimpleAugmentor import SimpleAugmentor
-# from Augmentors.MultiClassAugmentor import MultiClassAugmentor
+from Augmentors.MultiClassAugmentor import MultiClassAugmentor
 from Augmentors.BoundingBoxAugmentor import BoundingBoxAugmentor
\ No newline at end of file
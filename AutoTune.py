@@ -0,0 +1,246 @@
+import os
+import copy
+import json
+import math
+import time
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from random import Random
+from typing import Any, Callable, Union
+from numpy import ndarray
+from Composite import Composite
+from LazyImport import LazyModule
+
+cv2 = LazyModule("cv2")
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "image-augmentor", "tuning.json")
+
+
+class AutoTuner:
+    """
+    Picks the number of parallel batches and the number of OpenCV threads by benchmarking a sample of the real dataset with the real transforms
+
+    cv2 runs its own thread pool inside every call, so many batches each running cv2 with every core oversubscribes the cpu. Every (workers, cvThreads) pair of the search space is timed on the decoded sample and the fastest one wins. Results are persisted per host, cpu count, transforms and image size, so later runs on the same machine skip the benchmark.
+    """
+
+    def __init__(self, transforms: Composite, imageDim: tuple[int, int] = (256, 256), workerCounts: Union[list[int], None] = None, cvThreadCounts: Union[list[int], None] = None, variations: int = 2, cachePath: Union[str, None] = DEFAULT_CACHE_PATH) -> None:
+        """
+        Initializes the tuner
+
+        Keyword arguments:
+
+        transforms (Composite) -- The transforms of the run
+
+        imageDim (tuple[int, int]) -- Dimension the outputs are resized to
+
+        workerCounts (list[int]) -- Numbers of parallel batches to try, defaults to powers of two up to the number of cpus
+
+        cvThreadCounts (list[int]) -- cv2.setNumThreads values to try, defaults to 1, the cpus per worker and every cpu
+
+        variations (int) -- Variations of every sample image per measurement
+
+        cachePath (str) -- Path of the json file the results are persisted to, None disables persisting
+
+        Return: None
+        """
+
+        cpus = os.cpu_count() or 1
+
+        self.transforms = transforms
+        self.imageDim = imageDim
+        self.workerCounts = workerCounts or sorted({min(2 ** i, cpus) for i in range(cpus.bit_length() + 1)})
+        self.cvThreadCounts = cvThreadCounts
+        self.variations = variations
+        self.cachePath = cachePath
+        self.cpus = cpus
+
+    def candidates(self) -> list[tuple[int, int]]:
+        """
+        Search space of the tuner
+
+        Return: List of (workers, cvThreads)
+        """
+
+        pairs = []
+        for workers in self.workerCounts:
+            threads = self.cvThreadCounts or sorted({1, max(1, self.cpus // workers), self.cpus})
+            pairs += [(workers, x) for x in threads]
+
+        return pairs
+
+    def key(self, images: list[ndarray]) -> str:
+        """
+        Key the result of a benchmark is persisted under
+
+        Keyword arguments:
+
+        images (list[ndarray]) -- The decoded sample
+
+        Return: Key made of the host, the cpu count, the filters, the output size and the average megapixels of the sample
+        """
+
+        filters = ",".join(type(f).__name__ for f in self.transforms.filters)
+        megapixels = round(sum(x.shape[0] * x.shape[1] for x in images) / len(images) / 1e6, 1)
+
+        return f"{socket.gethostname()}|{self.cpus}|{filters}|{self.imageDim[0]}x{self.imageDim[1]}|{megapixels}MP"
+
+    def benchmark(self, images: list[ndarray], workers: int, cvThreads: int) -> float:
+        """
+        Measures the throughput of one configuration, decoding is left out as it does not depend on it
+
+        Keyword arguments:
+
+        images (list[ndarray]) -- The decoded sample
+
+        workers (int) -- Number of parallel batches
+
+        cvThreads (int) -- Value passed to cv2.setNumThreads
+
+        Return: Images per second
+        """
+
+        bBoxes = [] if self.transforms.shouldApplyBBox else None
+        transforms = copy.deepcopy(self.transforms)
+        # a copy, so the random state of seeded transforms is left for the run
+
+        def work(image: ndarray):
+            for _ in range(self.variations):
+                transformed = transforms.transform(image, bBoxes)['image']
+                cv2.imencode('.jpg', cv2.resize(transformed, self.imageDim))
+            # the same work a batch does for every variation
+
+        previous = cv2.getNumThreads()
+        cv2.setNumThreads(cvThreads)
+        try:
+            with ThreadPoolExecutor(workers) as executor:
+                start = time.perf_counter()
+                list(executor.map(work, images))
+                elapsed = time.perf_counter() - start
+        finally:
+            cv2.setNumThreads(previous)
+
+        return len(images) * self.variations / elapsed
+
+    def load(self) -> dict[str, Any]:
+        """
+        Loads the persisted results
+        """
+
+        if self.cachePath is None or not os.path.exists(self.cachePath):
+            return {}
+
+        try:
+            with open(self.cachePath, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self, key: str, result: dict[str, Any]) -> None:
+        """
+        Persists a result next to the other results of the file
+        """
+
+        if self.cachePath is None:
+            return
+
+        results = self.load()
+        results[key] = result
+
+        os.makedirs(os.path.dirname(self.cachePath) or ".", exist_ok=True)
+        temporaryPath = f"{self.cachePath}.{os.getpid()}.tmp"
+        with open(temporaryPath, 'w') as f:
+            json.dump(results, f, indent=1)
+        os.replace(temporaryPath, self.cachePath)
+
+    def tune(self, paths: list[str], sampleSize: int = 16, seed: Any = 0, force: bool = False, load: Union[Callable[[str], ndarray], None] = None) -> dict[str, Any]:
+        """
+        Finds the fastest configuration for a dataset
+
+        Keyword arguments:
+
+        paths (list[str]) -- Paths to the images of the dataset
+
+        sampleSize (int) -- Number of images benchmarked
+
+        seed (Any) -- Seed used to pick the sample
+
+        force (bool) -- Benchmarks again even if a persisted result exists
+
+        load (Callable) -- Decodes an image from its path, defaults to cv2.imread
+
+        Return: Dictionary with workers, cvThreads, throughput (images per second) and the measurements of every candidate
+        """
+
+        sample = Random(seed).sample(list(paths), min(sampleSize, len(paths)))
+        images = [x for x in map(load or cv2.imread, sample) if x is not None]
+        if len(images) == 0:
+            raise ValueError("None of the sampled images can be loaded")
+
+        key = self.key(images)
+        if not force:
+            cached = self.load().get(key)
+            if cached is not None:
+                return cached
+
+        measurements = [{'workers': workers, 'cvThreads': cvThreads, 'throughput': self.benchmark(images, workers, cvThreads)} for workers, cvThreads in self.candidates()]
+        best = max(measurements, key=lambda x: x['throughput'])
+
+        result = {**best, 'measurements': measurements}
+        self.save(key, result)
+
+        return result
+
+    @staticmethod
+    def batchSizeFor(groups: list[int], workers: int) -> int:
+        """
+        Finds the smallest batch size that splits groups of images into at most workers batches, every group is batched on its own
+
+        Keyword arguments:
+
+        groups (list[int]) -- Number of images of every group, e.g. of every partition
+
+        workers (int) -- Number of batches that should run at once
+
+        Return: The batch size, one batch per group when there are more groups than workers
+        """
+
+        groups = [x for x in groups if x > 0]
+        low, high = 1, max(groups, default=1)
+        while low < high:
+            middle = (low + high) // 2
+            if sum(math.ceil(x / middle) for x in groups) <= workers:
+                high = middle
+            else:
+                low = middle + 1
+
+        return low
+
+    @staticmethod
+    def groupSizes(augmentor) -> list[int]:
+        """
+        Number of images of every group threadAugment batches separately, the partitions and for a MultiClassAugmentor the classes of every partition
+        """
+
+        classImages = getattr(augmentor, 'classImages', None)
+        groups = [len(x) for x in classImages.values()] if classImages is not None else [len(augmentor.targetImages)]
+
+        if augmentor.split:
+            groups = [round(x * ratio) for x in groups for ratio in augmentor.ratio]
+
+        return groups
+
+    @staticmethod
+    def apply(augmentor, result: dict[str, Any]) -> None:
+        """
+        Applies a configuration to an augmentor, its batch size is set so threadAugment runs the tuned number of batches at once over all the partitions and classes
+
+        Keyword arguments:
+
+        augmentor (Union[SimpleAugmentor, MultiClassAugmentor, BoundingBoxAugmentor]) -- The augmentor
+
+        result (dict) -- Result of tune()
+        """
+
+        augmentor.batchSize = AutoTuner.batchSizeFor(AutoTuner.groupSizes(augmentor), result['workers'])
+        cv2.setNumThreads(result['cvThreads'])
+        augmentor.tuning = result
@@ -1,14 +1,27 @@
 from Composite import Composite
+from Filters import Filter
 import os
 from uuid import uuid1
-from typing import Callable
-import cv2
+from typing import Any, Callable
+from LazyImport import LazyModule
 from numpy import ndarray
 import json
 from COCO import COCO
+from AnnotationStore import AnnotationStore
+from Tiling import Tiler
+from Catalog import probeImageSize
+from OutputLayout import OutputLayout
+from MemoryBudget import MemoryBudget
+from Archive import Archive
+from VideoSource import VideoSource
+from Guardrails import Guardrails
+from Storage import Storage
+from contextlib import nullcontext
 import numpy as np
+import threading
 from typing import Union
-from progress.bar import Bar
+
+cv2 = LazyModule("cv2")
 
 
 class Batch:
@@ -18,7 +31,10 @@ class Batch:
     Batches are meant to be ran in parallel in threads or async.
     """
 
-    def __init__(self, targetImages: list[str], targetFolder: str, transforms: Composite, imageDim: tuple[int, int] = (256, 256), name:str=str(uuid1())) -> None:
+    resampleAttempts = 10
+    # attempts at finding a variation of a sample that was not made yet before it is dropped
+
+    def __init__(self, targetImages: list[str], targetFolder: str, transforms: Composite, imageDim: tuple[int, int] = (256, 256), name:str=str(uuid1()), tiler:Union[Tiler, None]=None, layout:Union[OutputLayout, None]=None, memoryBudget:Union[MemoryBudget, None]=None, dedupe:bool=False, archive:Union[Archive, VideoSource, None]=None, guardrails:Union[Guardrails, None]=None, storage:Union[Storage, None]=None) -> None:
         """
         Initializes Batch Object
 
@@ -30,6 +46,20 @@ class Batch:
 
         transforms (Composite) -- A Composition of all the filters to be applied. Do not pass in transforms with bounding box
 
+        tiler (Tiler) -- Splits every image into tiles which are augmented and saved as separate samples
+
+        layout (OutputLayout) -- Names the outputs after their source and variation and fans them out into hashed sub folders, outputs get random flat names without it
+
+        memoryBudget (MemoryBudget) -- Budget every image is admitted against before it is decoded, shared by the batches of a run
+
+        dedupe (bool) -- Re-samples variations which would apply a filter with a parameter space (flips, channel permutations, rotations) with parameters already used on the same sample, so no variation is computed and saved twice. Variations are dropped when no new one is found, so a sample may get fewer variations than requested, the number dropped is logged. Samples are tracked over every call of augmentItem, runs of the same image split over several workers don't repeat each other either
+
+        archive (Union[Archive, VideoSource]) -- Archive or video source the images are read from, targetImages are then names of its members
+
+        guardrails (Guardrails) -- Pixel cap and per image deadline, images breaking them are quarantined and skipped
+
+        storage (Storage) -- Storage the outputs are written to, keys are the output paths. Images are encoded in memory and uploaded in the background while the next ones are computed. Outputs are written to the disk with cv2.imwrite without it
+
         Return: None
         """
 
@@ -40,6 +70,16 @@ class Batch:
         self.transforms = transforms
         self.imageDim = imageDim
         self.name = name
+        self.tiler = tiler
+        self.layout = layout
+        self.memoryBudget = memoryBudget
+        self.dedupe = dedupe
+        self.seen: dict[str, set] = {}
+        self.seenLock = threading.Lock()
+        # variations made so far keyed by sample, shared by the workers running items of the batch
+        self.archive = archive
+        self.guardrails = guardrails
+        self.storage = storage
 
     def checkTransformCompatiblity(self, transforms: Composite):
         """
@@ -54,45 +94,256 @@ class Batch:
         if transforms.shouldApplyBBox:
             raise ValueError("This module does not support bounding boxes")
 
-    def augment(self, variations: int = 15, log: Callable[[str], None] = print):
+    def augment(self, variations: Union[int, dict[str, int]] = 15, log: Callable[[str], None] = print):
         """
         Augments the batch
 
         Keyword arguments:
 
-        variations (int) -- The Number of variations of images
+        variations (Union[int, dict[str, int]]) -- The Number of variations of images, or the number of variations of every image keyed by its path. Images missing from the dictionary only get their original saved
 
         log (Callable) -- A Function which takes in a string, this is used to log errors 
 
         Return: None
         """
+        from progress.bar import Bar
+        # progress is only needed while augmenting, not in every worker that imports Batch
+
         with Bar(f"Batch {self.name}: ", max=len(self.targetImages)) as bar:
             for image in self.targetImages:
-                loadedImage = cv2.imread(image)
-                # loading image
+                count = variations if isinstance(variations, int) else variations.get(image, 0)
+                self.watchItem(image, count, log)
+                bar.next()
 
-                if loadedImage is None:
-                    log(f"[NOT OPENABLE] {image} can't be loaded, image may be corrupted or the path is invalid")
-                    continue
-                    # error logging if image doesnt exist
+        self.flush(log)
+
+    def augmentItem(self, image: str, variations: int = 15, log: Callable[[str], None] = print, first: int = 0, original: bool = True):
+        """
+        Augments a single image of the batch, a run of its variations when the scheduler splits it over several workers
+
+        Keyword arguments:
+
+        image (str) -- Path to the image
+
+        variations (int) -- The Number of variations to make
+
+        log (Callable) -- A Function which takes in a string, this is used to log errors
+
+        first (int) -- Index of the first variation, variations are keyed by their index so runs of the same image never overwrite each other
+
+        original (bool) -- Saves the original image too
+
+        Return: None
+        """
+        if self.guardrails is not None and not self.guardrails.allowsHeader(image, log):
+            return
+            # rejected from its header before anything is decoded
+
+        if self.oversized(image, log):
+            return
+
+        with self.admit(image) as release:
+            expiry = self.guardrails.expiry(release) if self.guardrails is not None else None
+            # the deadline covers decoding but not the wait for the memory budget
+
+            loadedImage = self.loadImage(image)
+            # loading image
+
+            if self.rejected(image, loadedImage, log):
+                return
+
+            for sample, halo, window in self.samples(loadedImage):
+                key = self.sampleKey(image, window)
+                dropped = 0
+
+                for variation in range(first, first + variations):
+                    if self.expired(image, expiry, variation - first, log):
+                        return
+
+                    choice = self.pickVariation(key) if self.dedupe else None
+                    if self.dedupe and choice is None:
+                        dropped += 1
+                        continue
+                        # every filter picked was a repeat of a variation of this sample
 
-                for _ in range(variations):
                     try:
-                        self.augmentImage(loadedImage)
+                        self.augmentImage(sample, halo, f"{key}#{variation}", choice)
                     except Exception as e:
                         log(
                             f"[AUGMENT ERROR] Cannot augment {image} due to [ [ {e} ] ]")
                     # trying to annotate image
 
-                try:
-                    self.originalImage(loadedImage)
-                except Exception as e:
-                    log(
-                        f"[ORIGINAL IMAGE ERROR] Cannot save {image} due to [ [ {e} ] ]")
-                # trying to save original image
-                bar.next()
+                if dropped > 0:
+                    log(f"[DEDUPE] Dropped {dropped} of {variations} variations of {key}, no new parameters were found in {self.resampleAttempts} attempts")
+
+                if original:
+                    try:
+                        self.originalImage(sample, halo, key)
+                    except Exception as e:
+                        log(
+                            f"[ORIGINAL IMAGE ERROR] Cannot save {image} due to [ [ {e} ] ]")
+                    # trying to save original image
+
+    def loadImage(self, image: str) -> Union[ndarray, None]:
+        """
+        Reads and decodes an image from the disk, the archive or the video source
+
+        Keyword arguments:
+
+        image (str) -- Path to the image, or name of the member when reading from an archive or a video source
+
+        Return: The image or None if it can't be loaded
+        """
+
+        if self.archive is not None:
+            return self.archive.load(image)
+
+        if self.tiler is not None:
+            windowed = Tiler.openWindowed(image)
+            if windowed is not None:
+                return windowed
+                # tiles are read from the mapped file one at a time
+
+        return cv2.imread(image)
+
+    def oversized(self, image: str, log: Callable[[str], None] = print) -> bool:
+        """
+        Checks a source against the tiler before it is decoded, sources too large to decode whole are logged and quarantined unless they can be memory mapped
+
+        Keyword arguments:
+
+        image (str) -- Path to the image
+
+        log (Callable) -- A Function which takes in a string, this is used to log errors
+
+        Return: True if the image should be skipped
+        """
+
+        if self.tiler is None or self.tiler.maxSourcePixels is None or self.archive is not None:
+            return False
+
+        size = probeImageSize(image)
+        if self.tiler.allowsSource(size) or Tiler.openWindowed(image) is not None:
+            return False
+
+        log(f"[TOO LARGE] {image} is {size[0]}x{size[1]}, sources over {self.tiler.maxSourcePixels} pixels are only tiled from .npy or binary .ppm files")
+        if self.guardrails is not None:
+            self.guardrails.quarantine(image, 'pixels', list(size))
+        return True
+
+    def rejected(self, image: str, loadedImage: Union[ndarray, None], log: Callable[[str], None] = print) -> bool:
+        """
+        Checks a decoded image, logging the images that can't be loaded and quarantining them and the images over the pixel cap
+
+        Keyword arguments:
+
+        image (str) -- Path to the image
+
+        loadedImage (ndarray) -- The decoded image, None if it couldn't be loaded
+
+        log (Callable) -- A Function which takes in a string, this is used to log errors
 
-    def saveImage(self, image: ndarray, isOriginal: bool = False):
+        Return: True if the image should be skipped
+        """
+
+        if loadedImage is None:
+            log(f"[NOT OPENABLE] {image} can't be loaded, image may be corrupted or the path is invalid")
+            if self.guardrails is not None:
+                self.guardrails.quarantine(image, 'unreadable')
+            return True
+            # error logging if image doesnt exist
+
+        return self.guardrails is not None and not self.guardrails.allowsSize(image, loadedImage.shape[1::-1], log)
+        # images whose header couldn't be probed are only checked once they are decoded
+
+    def watchItem(self, image: str, variations: int = 15, log: Callable[[str], None] = print, first: int = 0, original: bool = True) -> None:
+        """
+        Augments a single image under the watchdog of the guardrails, an image stuck past its deadline is abandoned instead of holding the worker. Takes the arguments of augmentItem
+        """
+
+        if self.guardrails is None:
+            self.augmentItem(image, variations, log, first, original)
+            return
+
+        self.guardrails.watch(image, lambda: self.augmentItem(image, variations, log, first, original), log)
+
+    def expired(self, image: str, expiry: Union[float, None], done: int, log: Callable[[str], None] = print) -> bool:
+        """
+        Checks if an image ran past the deadline of the guardrails, its remaining variations are then skipped
+        """
+
+        return self.guardrails is not None and self.guardrails.expired(image, expiry, done, log)
+
+    def admit(self, image: str):
+        """
+        Admits an image against the memory budget, waiting until it fits
+
+        Keyword arguments:
+
+        image (str) -- Path to the image
+
+        Return: Context manager holding the estimated memory of the image until the block exits, it gives the function releasing it early or None without a budget
+        """
+
+        if self.memoryBudget is None:
+            return nullcontext()
+
+        return self.memoryBudget.admit(self.memoryBudget.imageCost(image, self.transforms.memoryFactor, self.imageDim))
+
+    def samples(self, image: ndarray):
+        """
+        Splits the image into the samples to augment, the whole image is the only sample when there is no tiler
+
+        Keyword arguments:
+
+        image (ndarray) -- Ndarray of the image
+
+        Return: Generator of (sample, halo, window) where window is the (x, y, width, height) of the sample in the image
+        """
+
+        if self.tiler is None:
+            yield image, 0, (0, 0, image.shape[1], image.shape[0])
+            return
+
+        halo = self.transforms.halo
+        for window in self.tiler.windows(image.shape):
+            yield self.tiler.padded(image, window, halo), halo, window
+
+    def sampleKey(self, image: str, window: tuple[int, int, int, int]) -> str:
+        """
+        Gets the key identifying a sample of an image, outputs are named after it when there is a layout
+
+        Keyword arguments:
+
+        image (str) -- Path to the image
+
+        window (tuple) -- Window of the sample in (x, y, width, height) format
+
+        Return: The key
+        """
+
+        return image if self.tiler is None else f"{image}@{window[0]},{window[1]}"
+
+    def outputPath(self, isOriginal: bool = False, key: Union[str, None] = None) -> tuple[str, str]:
+        """
+        Gets the id and path of an output
+
+        Keyword arguments:
+
+        isOriginal (bool) -- If the image is the original image
+
+        key (str) -- Key of the sample, the variation index included
+
+        Return: Tuple of (id, path)
+        """
+
+        if self.layout is None or key is None:
+            id_ = f"original_{str(uuid1())}" if isOriginal else str(uuid1())
+            return id_, os.path.join(self.targetFolder, id_ + '.jpg')
+
+        return self.layout.path(self.targetFolder, key, isOriginal, create=self.storage is None)
+
+    def saveImage(self, image: ndarray, isOriginal: bool = False, key: Union[str, None] = None):
         """
         Saves the image to the destined path. This method is protected   
 
@@ -102,20 +353,96 @@ class Batch:
 
         isOriginal (bool) -- If the image is the original image
 
+        key (str) -- Key of the sample, the variation index included
+
         Return: None
         """
 
-        name = f"original_{str(uuid1())}.jpg" if isOriginal else f"{str(uuid1())}.jpg"
-        path = os.path.join(self.targetFolder, name)
+        _, path = self.outputPath(isOriginal, key)
         # getting name and path
 
         resizedImage = cv2.resize(image, self.imageDim)
         # resizing image
 
-        cv2.imwrite(path, resizedImage)
+        self.writeImage(path, resizedImage)
         # saving image
 
-    def augmentImage(self, image: ndarray):
+    def writeImage(self, path: str, image: ndarray):
+        """
+        Writes an output to the disk, or encodes it in memory and hands it to the storage
+
+        Keyword arguments:
+
+        path (str) -- Path of the output, its extension picks the encoding
+
+        image (ndarray) -- The ndarray of the image
+
+        Return: None
+        """
+
+        if self.storage is None:
+            cv2.imwrite(path, image)
+            return
+
+        ok, encoded = cv2.imencode(os.path.splitext(path)[1] or '.jpg', image)
+        if not ok:
+            raise ValueError(f"{path} can't be encoded")
+
+        self.storage.put(path, encoded.tobytes())
+        # the upload runs in the background, flush() waits for it
+
+    def flush(self, log: Callable[[str], None] = print):
+        """
+        Waits for the outputs still being written to the storage
+
+        Keyword arguments:
+
+        log (Callable) -- A Function which takes in a string, this is used to log errors
+
+        Return: None
+        """
+
+        with self.seenLock:
+            self.seen.clear()
+        # the batch is done, its variations can't be repeated anymore
+
+        if self.storage is None:
+            return
+
+        try:
+            self.storage.flush()
+        except OSError as e:
+            log(f"[WRITE ERROR] {e} due to [ [ {e.__cause__} ] ]")
+
+    def pickVariation(self, key: str) -> Union[tuple[Filter, Any], None]:
+        """
+        Picks the filter and the parameters of the next variation of a sample, re-sampling the ones already made from it
+
+        Keyword arguments:
+
+        key (str) -- Key of the sample, the picked (filter, parameters) pair is recorded under it
+
+        Return: (filter, parameters), the parameters are ignored for filters without a parameter space. None when every attempt was a repeat
+        """
+
+        with self.seenLock:
+            seen = self.seen.setdefault(key, set())
+            # work items of the same image may run at once on different workers
+
+            for _ in range(self.resampleAttempts):
+                f = self.transforms.pickFilter()
+                if f.parameterSpace is None:
+                    return f, None
+                    # random filters that can't be enumerated never repeat
+
+                parameters = f.sampleParameters()
+                if (id(f), parameters) not in seen:
+                    seen.add((id(f), parameters))
+                    return f, parameters
+
+        return None
+
+    def augmentImage(self, image: ndarray, halo: int = 0, key: Union[str, None] = None, choice: Union[tuple[Filter, Any], None] = None):
         """
         Augments the image
 
@@ -123,13 +450,24 @@ class Batch:
 
         image (ndarray) -- Ndarray of the image
 
+        halo (int) -- Pixels around the image which are only there as context for the filters
+
+        key (str) -- Key of the sample, the variation index included
+
+        choice (tuple[Filter, Any]) -- Filter and parameters picked by pickVariation, a random filter of the transforms is applied without it
+
         Return: None
         """
-        transformed = self.transforms.transform(image)['image']
-        self.saveImage(transformed)
+        if choice is None:
+            transformed = self.transforms.transform(image)['image']
+        elif choice[0].parameterSpace is None:
+            transformed = choice[0].forward(image)
+        else:
+            transformed = choice[0].forwardWithParameters(image, choice[1])
+        self.saveImage(Tiler.crop(transformed, halo, image.shape), False, key)
         # transforming and saving image
 
-    def originalImage(self, image: ndarray):
+    def originalImage(self, image: ndarray, halo: int = 0, key: Union[str, None] = None):
         """
         Saves the original image
 
@@ -137,14 +475,21 @@ class Batch:
 
         image (ndarray) -- Ndarray of the image
 
+        halo (int) -- Pixels around the image which are only there as context for the filters
+
+        key (str) -- Key of the sample
+
         Return: None
         """
-        self.saveImage(image, True)
+        self.saveImage(Tiler.crop(image, halo), True, key)
         # just saving image with original set to true
 
 
 class BoundingBoxBatch(Batch):
-    def __init__(self, targetImages: list[str], targetFolder: str, annotationsJson: str, targetJsonPath: str, transforms: Composite, imageDim: tuple[int, int] = (256, 256), name=str(uuid1())) -> None:
+    flushLock = threading.Lock()
+    # annotations are read, merged and written back by one batch at a time
+
+    def __init__(self, targetImages: list[str], targetFolder: str, annotationsJson: Union[str, AnnotationStore], targetJsonPath: str, transforms: Composite, imageDim: tuple[int, int] = (256, 256), name=str(uuid1()), tiler: Union[Tiler, None] = None, layout: Union[OutputLayout, None] = None, memoryBudget: Union[MemoryBudget, None] = None, archive: Union[Archive, VideoSource, None] = None, guardrails: Union[Guardrails, None] = None, storage: Union[Storage, None] = None, dedupe: bool = False) -> None:
         """
         Initializes Bounding Box Batch Object
 
@@ -154,7 +499,7 @@ class BoundingBoxBatch(Batch):
 
         targetFolder (str) -- The path to the folder to be saved
 
-        annotationsJson (str) -- The path to the json file to where all the annotations exists
+        annotationsJson (Union[str, AnnotationStore]) -- The path to the json file to where all the annotations exists, or its already opened annotation store
 
         targetJsonPath (str) -- The path to json file to save augmented annotations
 
@@ -162,12 +507,35 @@ class BoundingBoxBatch(Batch):
 
         imageDim (tuple[width, height]) -- A tuple containing width and height of the image to be resized to
 
+        tiler (Tiler) -- Splits every image into tiles which are augmented and saved as separate samples, boxes are clipped to every tile
+
+        layout (OutputLayout) -- Names the outputs after their source and variation and fans them out into hashed sub folders, outputs get random flat names without it
+
+        memoryBudget (MemoryBudget) -- Budget every image is admitted against before it is decoded, shared by the batches of a run
+
+        archive (Union[Archive, VideoSource]) -- Archive or video source the images are read from, targetImages are then names of its members
+
+        guardrails (Guardrails) -- Pixel cap and per image deadline, images breaking them are quarantined and skipped
+
+        storage (Storage) -- Storage the outputs are written to, keys are the output paths. Images are encoded in memory and uploaded in the background while the next ones are computed. Outputs are written to the disk with cv2.imwrite without it
+
+        dedupe (bool) -- Re-samples variations which would apply a filter with a parameter space with parameters already used on the same sample, see Batch
+
+        The annotation entries of the batch are kept in memory and written to targetJsonPath once by flush(), augment() and the scheduler flush every batch they ran
+
         Return: None
         """
-        super().__init__(targetImages, targetFolder, transforms, imageDim, name)
-        with open(annotationsJson, 'r') as f:
-            self.annotations = json.load(f)
+        super().__init__(targetImages, targetFolder, transforms, imageDim, name, tiler, layout, memoryBudget, dedupe, archive, guardrails, storage)
+        if isinstance(annotationsJson, AnnotationStore):
+            self.annotations = annotationsJson
+        else:
+            self.annotations = AnnotationStore.open(annotationsJson)
+        # the annotations are memory mapped and shared with every other batch
         self.targetJsonPath = targetJsonPath
+        self.jsonLock = threading.Lock()
+        self.pendingImages: list[dict[str, Any]] = []
+        self.pendingAnnotations: list[dict[str, Any]] = []
+        # entries waiting for flush(), rewriting the whole json for every image would grow quadratically with the batch
 
     def checkTransformCompatiblity(self, transforms: Composite):
         if not transforms.shouldApplyBBox:
@@ -184,14 +552,7 @@ class BoundingBoxBatch(Batch):
         Return: Id of the image
         """
         
-        fileName = os.path.split(imageName)[-1]
-        # getting filename
-
-        imgData = list(
-            filter(lambda x: fileName in x['file_name'], self.annotations['images']))[0]
-
-        return imgData['id']
-        # getting the id
+        return self.annotations.imageId(self.annotations.findRow(imageName))
 
     def getBBoxes(self, imageName:str) -> list[COCO, Union[int, str]]:
         """
@@ -204,12 +565,9 @@ class BoundingBoxBatch(Batch):
         Return: List of Bounding boxes
         """
         
-        imgID = self.getOGID(imageName)
-
-        imgAnnotation = list(
-            filter(lambda x: x['image_id'] == imgID, self.annotations['annotations']))
+        boxes, categoryIDs = self.annotations.boxes(self.annotations.findRow(imageName))
 
-        annotations = [(COCO.fromIterable(x['bbox']), x['category_id']) for x in imgAnnotation]
+        annotations = [(COCO.fromIterable(box), categoryID) for box, categoryID in zip(boxes.tolist(), categoryIDs)]
 
         return annotations
 
@@ -225,35 +583,120 @@ class BoundingBoxBatch(Batch):
 
         Return: None
         """
+        from progress.bar import Bar
+        # progress is only needed while augmenting, not in every worker that imports Batch
+
         with Bar(f"Batch {self.name}: ", max=len(self.targetImages)) as bar:
             for image in self.targetImages:
-                loadedImage = cv2.imread(image)
-                # loading image
+                self.watchItem(image, variations, log)
+                bar.next()
+
+        self.flush(log)
+
+    def augmentItem(self, image: str, variations: int = 15, log: Callable[[str], None] = print, first: int = 0, original: bool = True):
+        if self.guardrails is not None and not self.guardrails.allowsHeader(image, log):
+            return
+            # rejected from its header before anything is decoded
+
+        if self.oversized(image, log):
+            return
+
+        with self.admit(image) as release:
+            expiry = self.guardrails.expiry(release) if self.guardrails is not None else None
+            # the deadline covers decoding but not the wait for the memory budget
+
+            loadedImage = self.loadImage(image)
+            # loading image
+
+            if self.rejected(image, loadedImage, log):
+                return
 
-                if loadedImage is None:
-                    log(f"[NOT OPENABLE] {image} can't be loaded, image may be corrupted or the path is invalid")
-                    continue
-                    # error logging if image doesnt exist
+            bBoxes = self.getBBoxes(image)
 
-                bBoxes = self.getBBoxes(image)
+            for sample, halo, window in self.samples(loadedImage):
+                sampleBBoxes = self.tileBBoxes(bBoxes, window, halo)
+                key = self.sampleKey(image, window)
+                dropped = 0
+
+                for variation in range(first, first + variations):
+                    if self.expired(image, expiry, variation - first, log):
+                        return
+
+                    choice = self.pickVariation(key) if self.dedupe else None
+                    if self.dedupe and choice is None:
+                        dropped += 1
+                        continue
+                        # every filter picked was a repeat of a variation of this sample
 
-                for _ in range(variations):
                     try:
-                        self.augmentImage(loadedImage, bBoxes)
+                        self.augmentImage(sample, sampleBBoxes, halo, f"{key}#{variation}", choice)
                     except Exception as e:
                         log(
                             f"[AUGMENT ERROR] Cannot augment {image} due to [ [ {e} ] ]")
                     # trying to annotate image
 
-                try:
-                    self.originalImage(loadedImage, bBoxes)
-                except Exception as e:
-                    log(
-                        f"[ORIGINAL IMAGE ERROR] Cannot save {image} due to [ [ {e} ] ]")
-                # trying to save original image
-                bar.next()
+                if dropped > 0:
+                    log(f"[DEDUPE] Dropped {dropped} of {variations} variations of {key}, no new parameters were found in {self.resampleAttempts} attempts")
+
+                if original:
+                    try:
+                        self.originalImage(sample, sampleBBoxes, halo, key)
+                    except Exception as e:
+                        log(
+                            f"[ORIGINAL IMAGE ERROR] Cannot save {image} due to [ [ {e} ] ]")
+                    # trying to save original image
 
-    def augmentImage(self, image: ndarray, bBoxes: list[COCO]):
+    def tileBBoxes(self, bBoxes: list[tuple[COCO, Union[int, str]]], window: tuple[int, int, int, int], halo: int) -> list[tuple[COCO, Union[int, str]]]:
+        """
+        Clips the bounding boxes to a tile and moves them into the coordinates of the tile and its halo
+
+        Keyword arguments:
+
+        bBoxes (list[tuple[COCO, Union[int, str]]]) -- Bounding boxes of the whole image with their category ids
+
+        window (tuple) -- Window of the tile in (x, y, width, height) format
+
+        halo (int) -- Pixels around the tile
+
+        Return: Bounding boxes of the tile with their category ids
+        """
+
+        if self.tiler is None:
+            return bBoxes
+
+        x, y, width, height = window
+        clipped = self.tiler.shiftBoxes(bBoxes, -x, -y, width, height)
+
+        if halo == 0:
+            return clipped
+
+        return self.tiler.shiftBoxes(clipped, halo, halo, width + 2 * halo, height + 2 * halo)
+
+    def cropHalo(self, image: ndarray, bBoxes: list[tuple[COCO, Union[int, str]]], halo: int, sourceShape: Union[tuple, None] = None) -> tuple[ndarray, list[tuple[COCO, Union[int, str]]]]:
+        """
+        Removes the halo from a tile and moves its boxes back into the coordinates of the tile
+
+        Keyword arguments:
+
+        image (ndarray) -- The tile with its halo
+
+        bBoxes (list[tuple[COCO, Union[int, str]]]) -- Bounding boxes of the tile with their category ids
+
+        halo (int) -- Pixels around the tile
+
+        sourceShape (tuple) -- Shape of the tile with its halo before filtering, the halo is scaled when a filter resized the tile
+
+        Return: The tile and its bounding boxes
+        """
+
+        cropped = Tiler.crop(image, halo, sourceShape)
+        if cropped.shape == image.shape:
+            return image, bBoxes
+
+        x, y = Tiler.margins(image.shape, sourceShape or image.shape, halo)
+        return cropped, self.tiler.shiftBoxes(bBoxes, -x, -y, cropped.shape[1], cropped.shape[0])
+
+    def augmentImage(self, image: ndarray, bBoxes: list[COCO], halo: int = 0, key: Union[str, None] = None, choice: Union[tuple[Filter, Any], None] = None):
         """
         Augments the image
 
@@ -263,13 +706,26 @@ class BoundingBoxBatch(Batch):
 
         bBoxes (list[COCO]) -- List of all the bounding boxes
 
+        halo (int) -- Pixels around the image which are only there as context for the filters
+
+        key (str) -- Key of the sample, the variation index included
+
+        choice (tuple[Filter, Any]) -- Filter and parameters picked by pickVariation, a random filter of the transforms is applied without it
+
         Return: None
         """
-        transformed = self.transforms.transform(image, [x[0] for x in bBoxes])
-        self.saveImage(transformed['image'], list(zip(transformed['bBox'], [x[1] for x in bBoxes])))
+        boxes = [x[0] for x in bBoxes]
+        if choice is None:
+            transformed = self.transforms.transform(image, boxes)
+            transformedImage, transformedBoxes = transformed['image'], transformed['bBox']
+        elif choice[0].parameterSpace is None:
+            transformedImage, transformedBoxes = choice[0].forwardWithBBox(image, boxes)
+        else:
+            transformedImage, transformedBoxes = choice[0].forwardWithBBoxParameters(image, boxes, choice[1])
+        self.saveImage(*self.cropHalo(transformedImage, list(zip(transformedBoxes, [x[1] for x in bBoxes])), halo, image.shape), False, key)
         # transforming and saving image
 
-    def originalImage(self, image: ndarray, bBoxes: list[COCO]):
+    def originalImage(self, image: ndarray, bBoxes: list[COCO], halo: int = 0, key: Union[str, None] = None):
         """
         Saves the original image
 
@@ -279,12 +735,16 @@ class BoundingBoxBatch(Batch):
 
         bBoxes (list[COCO]) -- List of all the bounding boxes
 
+        halo (int) -- Pixels around the image which are only there as context for the filters
+
+        key (str) -- Key of the sample
+
         Return: None
         """
-        self.saveImage(image, bBoxes, True)
+        self.saveImage(*self.cropHalo(image, bBoxes, halo), True, key)
         # just saving image with original set to true
 
-    def saveImage(self, image: ndarray, bBoxes: list[COCO], isOriginal: bool = False):
+    def saveImage(self, image: ndarray, bBoxes: list[COCO], isOriginal: bool = False, key: Union[str, None] = None):
         """
         Saves the image to the destined path. This method is protected   
 
@@ -295,12 +755,13 @@ class BoundingBoxBatch(Batch):
         bBoxes (list[COCO]) -- List of all the bounding boxes
 
         isOriginal (bool) -- If the image is the original image
+
+        key (str) -- Key of the sample, the variation index included
         
         Return: None
         """
 
-        id_ = f"original_{str(uuid1())}" if isOriginal else str(uuid1())
-        path = os.path.join(self.targetFolder, id_+'.jpg')
+        id_, path = self.outputPath(isOriginal, key)
         # getting id and path
 
         ogHeight, ogWidth = image.shape[:2]
@@ -314,6 +775,10 @@ class BoundingBoxBatch(Batch):
         newBBoxes:list[tuple[COCO, Union[int, str]]] = []
 
         for bBox, categoryID in bBoxes:
+            if bBox.points['width'] <= 0 or bBox.points['height'] <= 0:
+                continue
+                # filters empty the boxes that are no longer visible
+
             x1, y1, x2, y2 = bBox.iterablePascalVOCFormat
             points = np.array([
                 [x1, y1],
@@ -328,32 +793,23 @@ class BoundingBoxBatch(Batch):
         resizedImage = cv2.resize(image, self.imageDim)
         # resizing image
 
-        cv2.imwrite(path, resizedImage)
+        self.writeImage(path, resizedImage)
         # saving image
 
-        if os.path.isfile(self.targetJsonPath):
-            with open(self.targetJsonPath, 'r') as f:
-                currentData = json.load(f)
-        else:
-            currentData = {
-                "images": [],
-                "categories": self.annotations['categories'],
-                "annotations": []
-            }
-
-        currentData['images'].append(
+        images = [
             {
                 "width": self.imageDim[0],
                 "height": self.imageDim[1],
                 "id": id_,
                 "file_name": path
             }
-        )
+        ]
 
-        for bBox, categoryID in newBBoxes:
-            currentData['annotations'].append(
+        annotations = []
+        for i, (bBox, categoryID) in enumerate(newBBoxes):
+            annotations.append(
                 {
-                    "id": str(uuid1()),
+                    "id": f"{id_}_{i}",
                     "image_id": id_,
                     "category_id": categoryID,
                     "segmentation": [],
@@ -364,5 +820,93 @@ class BoundingBoxBatch(Batch):
                 }
             )
 
+        with self.jsonLock:
+            self.pendingImages.extend(images)
+            self.pendingAnnotations.extend(annotations)
+
+    def flush(self, log: Callable[[str], None] = print):
+        """
+        Writes the annotation entries of the batch to the json and waits for the outputs still being written to the storage
+
+        Keyword arguments:
+
+        log (Callable) -- A Function which takes in a string, this is used to log errors
+
+        Return: None
+        """
+
+        with self.jsonLock:
+            images, self.pendingImages = self.pendingImages, []
+            annotations, self.pendingAnnotations = self.pendingAnnotations, []
+
+        if images:
+            with BoundingBoxBatch.flushLock:
+                try:
+                    currentData = self.readAnnotations()
+                    self.mergeAnnotations(currentData, images, annotations)
+                    self.writeAnnotations(currentData)
+                except OSError as e:
+                    log(f"[WRITE ERROR] Cannot write {self.targetJsonPath} due to [ [ {e} ] ]")
+            # batches of a partition share the json and may flush at once from their threads, the next one has to read what this one wrote
+
+        super().flush(log)
+
+    def mergeAnnotations(self, data: dict[str, Any], images: list[dict[str, Any]], annotations: list[dict[str, Any]]):
+        """
+        Adds image and annotation entries to the annotations written so far. With a layout the ids are deterministic and a re-run overwrites its outputs, so the entries of the same ids are replaced instead of duplicated
+
+        Keyword arguments:
+
+        data (dict[str, Any]) -- The annotations written so far, updated in place
+
+        images (list[dict[str, Any]]) -- Image entries to add
+
+        annotations (list[dict[str, Any]]) -- Annotation entries of the images
+
+        Return: None
+        """
+
+        if self.layout is not None:
+            ids = {x['id'] for x in images}
+            data['images'] = [x for x in data['images'] if x['id'] not in ids]
+            data['annotations'] = [x for x in data['annotations'] if x['image_id'] not in ids]
+
+        data['images'].extend(images)
+        data['annotations'].extend(annotations)
+
+    def readAnnotations(self) -> Union[dict[str, Any], None]:
+        """
+        Reads the annotations written so far from the disk or the storage
+
+        Return: The annotations, empty ones with the categories of the source if nothing was written yet
+        """
+
+        empty = {
+            "images": [],
+            "categories": self.annotations.categories,
+            "annotations": []
+        }
+
+        if self.storage is not None:
+            try:
+                return json.loads(self.storage.read(self.targetJsonPath))
+            except FileNotFoundError:
+                return empty
+
+        if not os.path.isfile(self.targetJsonPath):
+            return empty
+
+        with open(self.targetJsonPath, 'r') as f:
+            return json.load(f)
+
+    def writeAnnotations(self, data: dict[str, Any]):
+        """
+        Writes the annotations to the disk or the storage, synchronously as the next batch flushing into the same json reads them back
+        """
+
+        if self.storage is not None:
+            self.storage.write(self.targetJsonPath, json.dumps(data).encode('utf-8'))
+            return
+
         with open(self.targetJsonPath, 'w') as f:
-            json.dump(currentData, f)
\ No newline at end of file
+            json.dump(data, f)
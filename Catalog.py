@@ -0,0 +1,302 @@
+import os
+import json
+import struct
+from typing import NamedTuple, Union, Iterable
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.jpe', '.png', '.bmp', '.dib', '.webp', '.tif', '.tiff', '.jp2', '.pbm', '.pgm', '.ppm', '.pnm', '.sr', '.ras', '.exr', '.hdr', '.pic')
+# extensions cv2.imread can open
+
+
+class CatalogEntry(NamedTuple):
+    """
+    A single image of the catalog, width and height are 0 when the header could not be probed
+    """
+    path: str
+    size: int
+    mtimeNs: int
+    width: int
+    height: int
+
+
+def probeImageSize(path: str) -> Union[tuple[int, int], None]:
+    """
+    Reads the dimensions of an image from its header without decoding it
+
+    Supports JPEG, PNG, BMP, WebP, GIF and TIFF
+
+    Keyword arguments:
+
+    path (str) -- Path to the image
+
+    Return: (width, height) of the image or None if the format is not recognised
+    """
+
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(32)
+
+            if head[:8] == b'\x89PNG\r\n\x1a\n' and head[12:16] == b'IHDR':
+                return struct.unpack('>II', head[16:24])
+
+            if head[:6] in (b'GIF87a', b'GIF89a'):
+                return struct.unpack('<HH', head[6:10])
+
+            if head[:2] == b'BM' and len(head) >= 26:
+                width, height = struct.unpack('<ii', head[18:26])
+                return width, abs(height)
+
+            if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+                chunk = head[12:16]
+                if chunk == b'VP8X':
+                    width = int.from_bytes(head[24:27], 'little') + 1
+                    height = int.from_bytes(head[27:30], 'little') + 1
+                    return width, height
+                if chunk == b'VP8L':
+                    bits = int.from_bytes(head[21:25], 'little')
+                    return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+                if chunk == b'VP8 ':
+                    head += f.read(32)
+                    width, height = struct.unpack('<HH', head[26:30])
+                    return width & 0x3FFF, height & 0x3FFF
+                return None
+
+            if head[:2] == b'\xff\xd8':
+                return probeJPEG(f)
+
+            if head[:4] in (b'II*\x00', b'MM\x00*'):
+                return probeTIFF(f, '<' if head[:2] == b'II' else '>')
+    except (OSError, struct.error):
+        return None
+
+    return None
+
+
+def probeJPEG(f) -> Union[tuple[int, int], None]:
+    """
+    Walks the JPEG markers until the start of frame segment and reads the dimensions from it
+
+    Keyword arguments:
+
+    f -- File object of the JPEG opened in binary mode
+
+    Return: (width, height) of the image or None if no start of frame was found
+    """
+
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        while byte and byte != b'\xff':
+            byte = f.read(1)
+        # skipping to the next marker
+
+        marker = f.read(1)
+        while marker == b'\xff':
+            marker = f.read(1)
+        # skipping fill bytes
+
+        if not marker:
+            return None
+
+        code = marker[0]
+        if code == 0xD8 or code == 0x01 or 0xD0 <= code <= 0xD7:
+            continue
+            # markers without a payload
+
+        if code == 0xD9 or code == 0xDA:
+            return None
+            # end of image or start of scan reached before any frame
+
+        length = struct.unpack('>H', f.read(2))[0]
+
+        if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack('>xHH', f.read(5))
+            return width, height
+
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def probeTIFF(f, order: str) -> Union[tuple[int, int], None]:
+    """
+    Reads the dimensions from the first image file directory of a TIFF
+
+    Keyword arguments:
+
+    f -- File object of the TIFF opened in binary mode
+
+    order (str) -- struct byte order of the file, '<' or '>'
+
+    Return: (width, height) of the image or None if the tags are missing
+    """
+
+    f.seek(4)
+    offset = struct.unpack(order + 'I', f.read(4))[0]
+    f.seek(offset)
+    count = struct.unpack(order + 'H', f.read(2))[0]
+
+    dimensions = {}
+    for _ in range(count):
+        tag, type_, _, value = struct.unpack(order + 'HHI4s', f.read(12))
+        if tag in (256, 257):
+            dimensions[tag] = struct.unpack(order + ('H' if type_ == 3 else 'I'), value[:2] if type_ == 3 else value)[0]
+    # tag 256 is the width and 257 the height, stored as SHORT (3) or LONG (4)
+
+    if 256 not in dimensions or 257 not in dimensions:
+        return None
+
+    return dimensions[256], dimensions[257]
+
+
+class Catalog:
+    """
+    Catalog of the images in a directory
+
+    The directory is scanned with os.scandir and the size and dimensions of every image are recorded from its header. The catalog can be persisted to a compact index file, later refreshes only probe the files whose size or modification time changed.
+    """
+
+    def __init__(self, directory: str, extensions: Union[Iterable[str], None] = IMAGE_EXTENSIONS, recursive: bool = False, indexPath: Union[str, None] = None) -> None:
+        """
+        Initializes the catalog, nothing is scanned until refresh() is called
+
+        Keyword arguments:
+
+        directory (str) -- Path to the folder containing the images
+
+        extensions (Iterable[str]) -- Extensions of the files to keep (case insensitive), None keeps every file
+
+        recursive (bool) -- Scans the sub folders as well
+
+        indexPath (str) -- Path to the index file, the index is loaded from and saved to it when given
+
+        Return: None
+        """
+
+        self.directory = directory
+        self.extensions = None if extensions is None else tuple(x.lower() for x in extensions)
+        self.recursive = recursive
+        self.indexPath = indexPath
+        self.entries: dict[str, CatalogEntry] = {}
+        self.changed: list[str] = []
+        # paths that were new or changed at the last refresh
+
+        if indexPath is not None and os.path.isfile(indexPath):
+            self.load()
+
+    def accepts(self, name: str) -> bool:
+        """
+        Checks if a file name passes the extension filter
+        """
+        return self.extensions is None or name.lower().endswith(self.extensions)
+
+    def scan(self, directory: str = "", prefix: str = ""):
+        """
+        Walks the directory with os.scandir
+
+        Keyword arguments:
+
+        directory (str) -- Folder to scan, defaults to the catalog directory
+
+        prefix (str) -- Path of the folder relative to the catalog directory
+
+        Return: Generator of (relative path, os.DirEntry) of every accepted file
+        """
+
+        with os.scandir(directory or self.directory) as it:
+            for entry in it:
+                if entry.is_dir():
+                    if self.recursive:
+                        yield from self.scan(entry.path, os.path.join(prefix, entry.name))
+                elif entry.is_file() and self.accepts(entry.name):
+                    yield os.path.join(prefix, entry.name), entry
+
+    def refresh(self, save: bool = True) -> "Catalog":
+        """
+        Rescans the directory, only probing new or changed files
+
+        Keyword arguments:
+
+        save (bool) -- Saves the index afterwards if the catalog has an index path
+
+        Return: self
+        """
+
+        entries: dict[str, CatalogEntry] = {}
+        changed: list[str] = []
+
+        for path, dirEntry in self.scan():
+            stat = dirEntry.stat()
+            old = self.entries.get(path)
+
+            if old is not None and old.size == stat.st_size and old.mtimeNs == stat.st_mtime_ns:
+                entries[path] = old
+                continue
+                # unchanged since the last refresh
+
+            dimensions = probeImageSize(dirEntry.path) or (0, 0)
+            entries[path] = CatalogEntry(path, stat.st_size, stat.st_mtime_ns, dimensions[0], dimensions[1])
+            changed.append(path)
+
+        self.entries = entries
+        self.changed = changed
+
+        if save and self.indexPath is not None:
+            self.save()
+
+        return self
+
+    def load(self) -> None:
+        """
+        Loads the entries from the index file
+        """
+
+        with open(self.indexPath, 'r') as f:
+            data = json.load(f)
+
+        self.entries = {x[0]: CatalogEntry(*x) for x in data['entries']}
+
+    def save(self) -> None:
+        """
+        Saves the entries to the index file, the file is replaced atomically
+        """
+
+        temp = f"{self.indexPath}.tmp"
+        with open(temp, 'w') as f:
+            json.dump({"version": 1, "directory": self.directory, "entries": [list(x) for x in self.entries.values()]}, f, separators=(',', ':'))
+
+        os.replace(temp, self.indexPath)
+
+    @property
+    def images(self) -> list[str]:
+        """
+        Paths of all the images relative to the catalog directory, sorted
+        """
+        return sorted(self.entries)
+
+    @property
+    def totalBytes(self) -> int:
+        """
+        Total size of all the images on disk
+        """
+        return sum(x.size for x in self.entries.values())
+
+    @property
+    def totalPixels(self) -> int:
+        """
+        Total number of decoded pixels of all the probed images
+        """
+        return sum(x.width * x.height for x in self.entries.values())
+
+    def pixels(self, path: str) -> int:
+        """
+        Number of pixels of an image, 0 if it is unknown
+
+        Keyword arguments:
+
+        path (str) -- Path of the image relative to the catalog directory
+
+        Return: width * height of the image
+        """
+        entry = self.entries.get(path)
+        return 0 if entry is None else entry.width * entry.height
+
+    def __len__(self) -> int:
+        return len(self.entries)
@@ -3,6 +3,21 @@ from typing import Union, Any, Callable
 from random import Random
 from numpy import ndarray
 from COCO import COCO
+import numpy as np
+import math
+import time
+
+
+Transformed = tuple[ndarray, Union[list[COCO], None]]
+# (image, bBoxes) returned by a compiled composite, a plain tuple is cheaper to build than a NamedTuple or a dictionary
+
+
+def nearestIndex(z:float, count:int) -> int:
+    """
+    Index in range(count) nearest to z, ties go to the lower index
+    """
+    return min(max(math.ceil(z - 0.5), 0), count - 1)
+
 
 class Composite:
     """
@@ -44,6 +59,20 @@ class Composite:
 
         self.avoidPreviousFilter = avoidPreviousFilter
 
+    @property
+    def halo(self) -> int:
+        """
+        Largest halo of the filters, any of them can be picked
+        """
+        return max((f.halo for f in self.filters), default=0)
+
+    @property
+    def memoryFactor(self) -> float:
+        """
+        Largest working memory of the filters in multiples of the image, any of them can be picked
+        """
+        return max((f.memoryFactor for f in self.filters), default=0)
+
     def pickIndex(self) -> int:
         """
         Picks the index of a random filter in transforms
@@ -54,7 +83,7 @@ class Composite:
             raise ValueError("The probably function should return values from 0 to range ([0, 1])")
         z = y * len(self.filters)
 
-        return min(list(range(len(self.filters))), key=lambda n: abs(n-z))
+        return nearestIndex(z, len(self.filters))
     
     def transform(self, image:ndarray, bBoxes:Union[list[COCO], None]=None) -> ndarray:
         """
@@ -66,6 +95,18 @@ class Composite:
         Return: Image with filter applied
         """
         
+        return self.pickFilter().apply(image, self.shouldApplyBBox, bBoxes)
+
+    def pickFilter(self) -> Filter:
+        """
+        Picks the filter the next transform applies, avoiding the previous one if avoidPreviousFilter is set
+        """
+        return self.filters[self.pickFilterIndex()]
+
+    def pickFilterIndex(self) -> int:
+        """
+        Picks the index of the filter the next transform applies, avoiding the previous one if avoidPreviousFilter is set
+        """
         if self.avoidPreviousFilter:
             idx = self.previousIndex
             while idx == self.previousIndex:
@@ -74,5 +115,171 @@ class Composite:
         else:
             idx = self.pickIndex()
 
-        return self.filters[idx].apply(image, self.shouldApplyBBox, bBoxes)
-        
\ No newline at end of file
+        return idx
+
+    def sample(self, shape:Union[tuple, None]=None) -> tuple[int, Any]:
+        """
+        Picks a filter and samples its parameters without applying it, the pair can be recorded and applied later with transformWithParameters
+
+        Keyword arguments:
+
+        shape (tuple) -- Shape of the image the parameters are for
+
+        Return: (index of the filter, parameters)
+        """
+        idx = self.pickFilterIndex()
+        return idx, self.filters[idx].sampleParameters(shape)
+
+    def transformWithParameters(self, image:ndarray, index:int, parameters:Any, bBoxes:Union[list[COCO], None]=None) -> dict[str, Any]:
+        """
+        Applies a filter with the given parameters, the same arguments always give the same result
+
+        Keyword arguments:
+
+        image (ndarray) -- Ndarray of the image
+
+        index (int) -- Index of the filter
+
+        parameters (Any) -- Parameters of the filter, as returned by sample
+
+        bBoxes (list[COCO]) -- Bounding boxes of the image when the transforms have bounding boxes enabled
+
+        Return: dictionary of the values returned by the filter
+        """
+        f = self.filters[index]
+        if self.shouldApplyBBox:
+            image, bBoxes = f.forwardWithBBoxParameters(image, bBoxes, parameters)
+            return {'image': image, 'bBox': bBoxes}
+
+        return {'image': f.forwardWithParameters(image, parameters)}
+        
+
+    def compile(self) -> "CompiledComposite":
+        """
+        Validates the composition once and returns a lean callable applying it, meant for online use where the per call overhead of transform() shows on small images
+
+        Return: The compiled composite, it shares the random generator of the composite
+        """
+        if len(self.filters) == 0:
+            raise ValueError("There should be at least 1 filter to compile")
+
+        if not all(isinstance(f, Filter) for f in self.filters):
+            raise TypeError("All the elements of the filters list should be a subclass of filters")
+
+        return CompiledComposite(self)
+
+
+class CompiledComposite:
+    """
+    Applies a random filter of a composite without the checks and the dictionary of transform()
+
+    The filters are bound once, calls only pick an index and run the filter. The bounding boxes are not checked, they have to be COCO objects when the composite applies them.
+    """
+
+    __slots__ = ('composite', 'steps', 'count', 'rand', 'probablityFunction', 'avoidPreviousFilter', 'previousIndex', 'shouldApplyBBox')
+
+    def __init__(self, composite:Composite) -> None:
+        """
+        Binds the filters of a composite, use Composite.compile() which validates it first
+
+        Keyword arguments:
+
+        composite (Composite) -- The composite
+
+        Return: None
+        """
+        self.composite = composite
+        self.shouldApplyBBox = composite.shouldApplyBBox
+        self.steps = tuple(f.compile(composite.shouldApplyBBox) for f in composite.filters)
+        self.count = len(self.steps)
+        self.rand = composite.rand
+        self.probablityFunction = composite.probablityFunction
+        self.avoidPreviousFilter = composite.avoidPreviousFilter
+        self.previousIndex = -1
+
+    def pickIndex(self) -> int:
+        """
+        Picks the index of the filter to apply, the same way Composite.pickFilterIndex does
+        """
+        y = self.probablityFunction(self.rand.random())
+        if not 0 <= y <= 1:
+            raise ValueError("The probably function should return values from 0 to range ([0, 1])")
+
+        return nearestIndex(y * self.count, self.count)
+
+    def __call__(self, image:ndarray, bBoxes:Union[list[COCO], None]=None) -> Transformed:
+        """
+        Applies a random filter to the image
+
+        Keyword arguments:
+
+        image (ndarray) -- Ndarray of the image
+
+        bBoxes (list[COCO]) -- Bounding boxes of the image when the composite applies them
+
+        Return: (image, bBoxes) of the filtered image, bBoxes is None when the composite does not apply them
+        """
+        y = self.probablityFunction(self.rand.random())
+        if not 0 <= y <= 1:
+            raise ValueError("The probably function should return values from 0 to range ([0, 1])")
+        idx = min(max(math.ceil(y * self.count - 0.5), 0), self.count - 1)
+        # pickIndex inlined, the calls cost as much as a flip of a tiny image
+
+        if self.avoidPreviousFilter and self.count > 1:
+            while idx == self.previousIndex:
+                idx = self.pickIndex()
+            self.previousIndex = idx
+
+        if self.shouldApplyBBox:
+            return self.steps[idx](image, bBoxes)
+
+        return self.steps[idx](image), None
+
+
+def benchmarkCompile(composite:Composite, imageDim:tuple[int, int]=(224, 224), iterations:int=20000, rounds:int=20) -> dict[str, float]:
+    """
+    Microbenchmark of the per call overhead compile() removes, both paths run the same filters on the same image
+
+    Keyword arguments:
+
+    composite (Composite) -- The composite, cheap filters such as flips make the overhead visible
+
+    imageDim (tuple[int, int]) -- (width, height) of the random image
+
+    iterations (int) -- Number of calls timed on each path
+
+    rounds (int) -- Number of rounds the calls are split into, the rounds of the two paths alternate
+
+    Return: Dictionary with the microseconds per call of transform() and of the compiled composite in their fastest round, and the speedup
+    """
+    image = np.random.default_rng(0).integers(0, 256, (imageDim[1], imageDim[0], 3), dtype=np.uint8)
+    bBoxes = [COCO.fromIterable([1, 1, 10, 10])] if composite.shouldApplyBBox else None
+    compiled = composite.compile()
+
+    calls = max(1, iterations // rounds)
+
+    def timed(function:Callable) -> float:
+        start = time.perf_counter()
+        for _ in range(calls):
+            function(image, bBoxes)
+        return (time.perf_counter() - start) / calls * 1e6
+
+    timed(composite.transform)
+    # warming up the filters and cv2
+
+    transform = compiledTime = math.inf
+    for _ in range(rounds):
+        transform = min(transform, timed(composite.transform))
+        compiledTime = min(compiledTime, timed(compiled))
+    # like timeit the fastest round is kept, alternating the paths spreads load from the rest of the machine over both
+
+    return {'transform': transform, 'compiled': compiledTime, 'speedup': transform / compiledTime}
+
+
+if __name__ == '__main__':
+    from Filters.Flip import HorizontalFlip, VerticalFlip
+
+    for shouldApplyBBox in (False, True):
+        result = benchmarkCompile(Composite([HorizontalFlip(), VerticalFlip()], shouldApplyBBox, seed=1), (8, 8), 20000, 100)
+        print(f"bBoxes={shouldApplyBBox} transform {result['transform']:.2f}us compiled {result['compiled']:.2f}us speedup {result['speedup']:.2f}x")
+    # tiny images so the per call overhead dominates, run with python Composite.py
@@ -0,0 +1,241 @@
+import os
+import copy
+import json
+import math
+import time
+import heapq
+import shutil
+import tempfile
+from random import Random
+from statistics import NormalDist, fmean, stdev
+from typing import Any, Callable, Iterable, Union
+from Batch import Batch
+from Catalog import probeImageSize
+from MemoryBudget import MemoryBudget, estimateMemory
+
+
+class CostEstimator:
+    """
+    Forecasts the runtime, output size, file count and peak memory of an augmentation job without running it
+
+    A random sample of the sources goes through the real batch, so the real filters, tiler, dedupe, encoder and writes are timed, into a temporary folder. Every sampled image gives one measurement of seconds, bytes and files. Totals are extrapolated to every source with a normal confidence interval around the sample mean (finite population corrected), and the peak memory comes from the image headers with the estimate the memory budget admits images with.
+    """
+
+    def __init__(self, fraction: float = 0.01, minSamples: int = 16, maxSamples: Union[int, None] = 1000, seed: Any = 0, confidence: float = 0.95) -> None:
+        """
+        Initializes the estimator
+
+        Keyword arguments:
+
+        fraction (float) -- Fraction of the sources sampled
+
+        minSamples (int) -- Sources sampled at least, every source when there are fewer
+
+        maxSamples (int) -- Sources sampled at most, None does not cap the sample
+
+        seed (Any) -- Seed used to pick the sample
+
+        confidence (float) -- Confidence of the low and high bounds
+
+        Return: None
+        """
+
+        if not 0 < fraction <= 1:
+            raise ValueError("fraction should be in range (0, 1]")
+
+        if not 0 < confidence < 1:
+            raise ValueError("confidence should be in range (0, 1)")
+
+        self.fraction = fraction
+        self.minSamples = minSamples
+        self.maxSamples = maxSamples
+        self.seed = seed
+        self.confidence = confidence
+
+    def sample(self, images: list[str]) -> list[str]:
+        """
+        Picks the sources that are measured
+        """
+
+        size = max(self.minSamples, math.ceil(len(images) * self.fraction))
+        if self.maxSamples is not None:
+            size = min(size, self.maxSamples)
+
+        return Random(self.seed).sample(images, min(size, len(images)))
+
+    def measure(self, images: list[str], makeBatch: Callable[[str, list[str]], Batch], variations: int = 15, log: Callable[[str], None] = print) -> list[dict[str, Any]]:
+        """
+        Runs the sampled images through real batches writing into a temporary folder
+
+        Keyword arguments:
+
+        images (list[str]) -- The sampled images
+
+        makeBatch (Callable) -- Builds the batch of the job from an output folder and its images, the same way the augmentor does
+
+        variations (int) -- The Number of variations of images
+
+        log (Callable) -- A Function which takes in a string, this is used to log errors
+
+        Return: List of {image, seconds, bytes, files, size} per image, size is the (width, height) or None when it is unknown
+        """
+
+        measurements = []
+        transforms = None
+        root = tempfile.mkdtemp(prefix="dry-run-")
+        try:
+            for i, image in enumerate(images):
+                folder = os.path.join(root, str(i))
+                os.makedirs(folder)
+                # every image gets its own folder so its outputs can be counted and removed
+
+                batch = makeBatch(folder, [image])
+                if transforms is None:
+                    transforms = copy.deepcopy(batch.transforms)
+                batch.transforms = transforms
+                # a copy, so the random state of seeded transforms is left for the run
+                size = probeImageSize(image)
+                if size is None:
+                    loaded = batch.loadImage(image)
+                    size = (loaded.shape[1], loaded.shape[0]) if loaded is not None else None
+                    # archive members and video frames have no header on the disk
+
+                start = time.perf_counter()
+                batch.augmentItem(image, variations, log)
+                batch.flush(log)
+                # bounding box batches write their annotations on flush
+                seconds = time.perf_counter() - start
+
+                files = 0
+                written = 0
+                for directory, _, fileNames in os.walk(folder):
+                    for fileName in fileNames:
+                        files += 1
+                        written += os.path.getsize(os.path.join(directory, fileName))
+
+                measurements.append({'image': image, 'seconds': seconds, 'bytes': written, 'files': files, 'size': size})
+                shutil.rmtree(folder)
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+        return measurements
+
+    def interval(self, values: list[float], population: int) -> dict[str, float]:
+        """
+        Extrapolates the total of a population from a sample of it
+
+        Keyword arguments:
+
+        values (list[float]) -- The sampled values
+
+        population (int) -- Size of the population
+
+        Return: Dictionary with the estimate and its low and high bounds
+        """
+
+        mean = fmean(values)
+        total = mean * population
+        if len(values) < 2 or len(values) >= population:
+            return {'estimate': total, 'low': total, 'high': total}
+
+        z = NormalDist().inv_cdf((1 + self.confidence) / 2)
+        correction = math.sqrt((population - len(values)) / (population - 1))
+        margin = z * population * stdev(values) / math.sqrt(len(values)) * correction
+
+        return {'estimate': total, 'low': max(0.0, total - margin), 'high': total + margin}
+
+    def peakMemory(self, sizes: Iterable[tuple[int, int]], workers: int, memoryFactor: float, imageDim: Union[tuple[int, int], None], memoryBudget: Union[MemoryBudget, None] = None) -> int:
+        """
+        Peak memory of the run, the workers all holding the largest images at once
+
+        Keyword arguments:
+
+        sizes (Iterable[tuple[int, int]]) -- (width, height) of the images
+
+        workers (int) -- Number of images in flight at once
+
+        memoryFactor (float) -- Working memory of the filters in multiples of the image, Composite.memoryFactor
+
+        imageDim (tuple[int, int]) -- (width, height) the outputs are resized to
+
+        memoryBudget (MemoryBudget) -- Budget of the run, it caps the peak unless a single image is larger
+
+        Return: Estimate in bytes
+        """
+
+        largest = heapq.nlargest(workers, (estimateMemory(x, memoryFactor, imageDim) for x in sizes))
+        if len(largest) == 0:
+            return 0
+
+        peak = sum(largest)
+        if memoryBudget is not None:
+            peak = min(peak, max(memoryBudget.maxBytes, largest[0]))
+
+        return peak
+
+    def estimate(self, images: list[str], makeBatch: Callable[[str, list[str]], Batch], variations: int = 15, workers: Union[int, None] = None, sizes: Union[Iterable[tuple[int, int]], None] = None, memoryBudget: Union[MemoryBudget, None] = None, log: Callable[[str], None] = print) -> dict[str, Any]:
+        """
+        Forecasts a job
+
+        Keyword arguments:
+
+        images (list[str]) -- Every source of the job
+
+        makeBatch (Callable) -- Builds the batch of the job from an output folder and its images
+
+        variations (int) -- The Number of variations of images
+
+        workers (int) -- Number of workers the wall time and the peak memory are forecast for, defaults to the number of cpus
+
+        sizes (Iterable[tuple[int, int]]) -- (width, height) of every source when they are known without decoding, e.g. from the catalog. The peak memory is taken from the sample otherwise
+
+        memoryBudget (MemoryBudget) -- Budget of the run
+
+        log (Callable) -- A Function which takes in a string, this is used to log errors
+
+        Return: Json serializable report, totals are dictionaries of estimate, low and high
+        """
+
+        workers = workers or os.cpu_count() or 1
+        images = list(images)
+        if len(images) == 0:
+            raise ValueError("There are no images to estimate")
+
+        sampled = self.sample(images)
+        measurements = self.measure(sampled, makeBatch, variations, log)
+        population = len(images)
+
+        seconds = self.interval([x['seconds'] for x in measurements], population)
+        longest = max(x['seconds'] for x in measurements)
+        # the run can't finish before its longest image
+
+        template = makeBatch(tempfile.gettempdir(), [])
+        knownSizes = [x['size'] for x in measurements if x['size'] is not None] if sizes is None else sizes
+
+        return {
+            'sources': population,
+            'sampled': len(measurements),
+            'unreadable': sum(1 for x in measurements if x['size'] is None),
+            'variations': variations,
+            'workers': workers,
+            'confidence': self.confidence,
+            'seconds': seconds,
+            'wallSeconds': {k: max(v / workers, longest) for k, v in seconds.items()},
+            'outputBytes': self.interval([x['bytes'] for x in measurements], population),
+            'outputFiles': self.interval([x['files'] for x in measurements], population),
+            'peakMemoryBytes': self.peakMemory(knownSizes, workers, template.transforms.memoryFactor, template.imageDim, memoryBudget),
+            'perImage': {
+                'seconds': fmean(x['seconds'] for x in measurements),
+                'bytes': fmean(x['bytes'] for x in measurements),
+                'files': fmean(x['files'] for x in measurements),
+            },
+        }
+
+    @staticmethod
+    def save(report: dict[str, Any], path: str) -> None:
+        """
+        Writes a report as json
+        """
+
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=1)
@@ -5,17 +5,40 @@ class Blur(Filter):
     """
     Adds random Blur to the image
     """
+    supportsInPlace = True
 
     def __init__(self, min:int=3, max:int=10) -> None:
         super().__init__()
         self.min = min
         self.max = max
 
-    def forward(self, image: ndarray) -> ndarray:
+    @property
+    def halo(self) -> int:
+        """
+        Radius of the largest kernel
+        """
+        return (self.max + 1) // 2
+
+    def sampleKernel(self) -> int:
+        """
+        Picks a random odd kernel size between min and max
+        """
         k = self.rand.randint(self.min, self.max)
         if k%2 == 0:
             k+= 1
-        return cv2.blur(image, (k, k))
+        return k
+
+    def forward(self, image: ndarray) -> ndarray:
+        return self.forwardInto(image, None)
+
+    def sampleParameters(self, shape: Union[tuple, None] = None) -> int:
+        return self.sampleKernel()
+
+    def forwardWithParameters(self, image: ndarray, parameters: int, out: Union[ndarray, None] = None) -> ndarray:
+        return cv2.blur(image, (parameters, parameters), dst=out)
+
+    def forwardInto(self, image: ndarray, out: ndarray) -> ndarray:
+        return self.forwardWithParameters(image, self.sampleKernel(), out)
     
 
 class GaussianBlur(Blur):
@@ -25,8 +48,5 @@ class GaussianBlur(Blur):
     def __init__(self, min: int = 3, max: int = 10) -> None:
         super().__init__(min, max)
     
-    def forward(self, image: ndarray) -> ndarray:
-        k = self.rand.randint(self.min, self.max)
-        if k%2 == 0:
-            k+= 1
-        return cv2.GaussianBlur(image, (k, k), 0)
\ No newline at end of file
+    def forwardWithParameters(self, image: ndarray, parameters: int, out: Union[ndarray, None] = None) -> ndarray:
+        return cv2.GaussianBlur(image, (parameters, parameters), 0, dst=out)
@@ -4,33 +4,66 @@ class Brightness(Filter):
     """
     Adds Random Brightness to Image
     """
+    supportsInPlace = True
 
     def __init__(self) -> None:
         super().__init__()
 
     def forward(self, image: ndarray) -> ndarray:
-        return cv2.convertScaleAbs(image, alpha=1.0, beta=(self.rand.random()*60)-30)
+        return self.forwardInto(image, None)
+
+    def sampleParameters(self, shape: Union[tuple, None] = None) -> float:
+        return (self.rand.random()*60)-30
+
+    def forwardWithParameters(self, image: ndarray, parameters: float, out: Union[ndarray, None] = None) -> ndarray:
+        return cv2.convertScaleAbs(image, dst=out, alpha=1.0, beta=parameters)
+
+    def forwardInto(self, image: ndarray, out: ndarray) -> ndarray:
+        return self.forwardWithParameters(image, self.sampleParameters(), out)
     
 
 class Contrast(Filter):
     """
     Adds Random Contrast to Image
     """
+    supportsInPlace = True
 
     def __init__(self) -> None:
         super().__init__()
 
     def forward(self, image: ndarray) -> ndarray:
-        return cv2.convertScaleAbs(image, beta=0.0, alpha=(self.rand.random() + 0.5))
+        return self.forwardInto(image, None)
+
+    def sampleParameters(self, shape: Union[tuple, None] = None) -> float:
+        return self.rand.random() + 0.5
+
+    def forwardWithParameters(self, image: ndarray, parameters: float, out: Union[ndarray, None] = None) -> ndarray:
+        return cv2.convertScaleAbs(image, dst=out, beta=0.0, alpha=parameters)
+
+    def forwardInto(self, image: ndarray, out: ndarray) -> ndarray:
+        return self.forwardWithParameters(image, self.sampleParameters(), out)
     
 
 class BrightnessContrast(Filter):
     """
     Adds Random Brightness and Contrast to Image
     """
+    supportsInPlace = True
 
     def __init__(self) -> None:
         super().__init__()
 
     def forward(self, image: ndarray) -> ndarray:
-        return cv2.convertScaleAbs(image, beta=(self.rand.random()*60)-30, alpha=(self.rand.random() + 0.5))  
\ No newline at end of file
+        return self.forwardInto(image, None)
+
+    def sampleParameters(self, shape: Union[tuple, None] = None) -> tuple[float, float]:
+        beta = (self.rand.random()*60)-30
+        return beta, self.rand.random() + 0.5
+        # (beta, alpha)
+
+    def forwardWithParameters(self, image: ndarray, parameters: tuple[float, float], out: Union[ndarray, None] = None) -> ndarray:
+        return cv2.convertScaleAbs(image, dst=out, beta=parameters[0], alpha=parameters[1])
+
+    def forwardInto(self, image: ndarray, out: ndarray) -> ndarray:
+        return self.forwardWithParameters(image, self.sampleParameters(), out)
+
@@ -0,0 +1,86 @@
+from numpy import ndarray
+import numpy as np
+from collections import OrderedDict
+import threading
+
+
+class BufferPool:
+    """
+    Pool of preallocated image buffers reused across filters, variations and images
+
+    Every shape and dtype gets a pair of buffers so a chain of filters can ping-pong between them without allocating. Pools are not thread safe, use BufferPool.local() to get the pool of the current worker thread.
+    """
+
+    threadLocal = threading.local()
+
+    def __init__(self, maxBytes: int = 512 * 1024 * 1024) -> None:
+        """
+        Initializes the buffer pool
+
+        Keyword arguments:
+
+        maxBytes (int) -- Upper bound of the memory held by the pool, buffer pairs of the least recently used shapes are released first
+
+        Return: None
+        """
+
+        self.maxBytes = maxBytes
+        self.currentBytes = 0
+        self.pairs: OrderedDict[tuple, tuple[ndarray, ndarray]] = OrderedDict()
+
+    @classmethod
+    def local(cls, maxBytes: int = 512 * 1024 * 1024) -> "BufferPool":
+        """
+        Gets the buffer pool of the current thread, creating it on first use
+
+        Keyword arguments:
+
+        maxBytes (int) -- Memory budget used when the pool is created
+
+        Return: The pool of the current thread
+        """
+
+        pool = getattr(cls.threadLocal, 'pool', None)
+        if pool is None:
+            pool = cls(maxBytes)
+            cls.threadLocal.pool = pool
+
+        return pool
+
+    def pair(self, shape: tuple, dtype) -> tuple[ndarray, ndarray]:
+        """
+        Gets the two ping-pong buffers for the given shape and dtype
+
+        Keyword arguments:
+
+        shape (tuple) -- Shape of the buffers
+
+        dtype -- Numpy dtype of the buffers
+
+        Return: Tuple of two buffers that never share memory
+        """
+
+        key = (tuple(shape), np.dtype(dtype).str)
+
+        if key in self.pairs:
+            self.pairs.move_to_end(key)
+            return self.pairs[key]
+
+        buffers = (np.empty(shape, dtype), np.empty(shape, dtype))
+        self.pairs[key] = buffers
+        self.currentBytes += buffers[0].nbytes * 2
+
+        while self.currentBytes > self.maxBytes and len(self.pairs) > 1:
+            _, evicted = self.pairs.popitem(last=False)
+            self.currentBytes -= evicted[0].nbytes * 2
+        # the pair that was just created is always kept
+
+        return buffers
+
+    def clear(self) -> None:
+        """
+        Releases every buffer held by the pool
+        """
+
+        self.pairs.clear()
+        self.currentBytes = 0
@@ -1,8 +1,11 @@
 from numpy import ndarray
 from Filters.Filter import Filter
-import cv2
+from Filters.Filter import cv2
 
 class JPEGCompression(Filter):
+    parameterSpace = (None,)
+    # the compression is deterministic
+
     def __init__(self, amount:int=5) -> None:
         super().__init__()
         self.amount = 10
@@ -10,4 +13,7 @@ class JPEGCompression(Filter):
     def forward(self, image: ndarray) -> ndarray:
         encoded_image, buffer = cv2.imencode('.jpg', image, [int(cv2.IMWRITE_JPEG_QUALITY), self.amount])
 
-        return cv2.imdecode(buffer, 1)
\ No newline at end of file
+        return cv2.imdecode(buffer, 1)
+
+    def forwardWithParameters(self, image: ndarray, parameters: None) -> ndarray:
+        return self.forward(image)
\ No newline at end of file
@@ -0,0 +1,189 @@
+from Filters.Filter import *
+
+
+class RandomCrop(Filter):
+    """
+    Crops a random region of fixed size out of the image
+
+    The crop is a numpy view of the image, so no pixels are copied and every filter placed after it in a Stack only touches the cropped region.
+    Boxes that end up with less than minBoxVisibility of their area inside the crop are emptied to (0, 0, 0, 0), they keep their position in the list so their categories stay aligned and are dropped when saved.
+    """
+
+    def __init__(self, size: tuple[int, int] = (256, 256), minBoxVisibility: float = 0.0) -> None:
+        """
+        Initializes the crop
+
+        Keyword arguments:
+
+        size (tuple[int, int]) -- Size of the crop in (width, height) format, images smaller than it are cropped to their own size
+
+        minBoxVisibility (float) -- Boxes keeping less than this fraction of their area are dropped, boxes with no area left are always dropped
+
+        Return: None
+        """
+
+        super().__init__()
+        if not (isinstance(size, tuple) or isinstance(size, list)) or len(size) != 2:
+            raise TypeError("size should be a tuple of (width, height)")
+
+        if size[0] <= 0 or size[1] <= 0:
+            raise ValueError("The width and height of the crop should be positive")
+
+        self.size = tuple(size)
+        self.minBoxVisibility = minBoxVisibility
+
+    def sampleWindow(self, shape: tuple) -> tuple[int, int, int, int]:
+        """
+        Picks a random window of the image
+
+        Keyword arguments:
+
+        shape (tuple) -- Shape of the image in (height, width) format
+
+        Return: Window in (x, y, width, height) format
+        """
+
+        height, width = shape[:2]
+        cropWidth, cropHeight = min(self.size[0], width), min(self.size[1], height)
+
+        x = self.rand.randint(0, width - cropWidth)
+        y = self.rand.randint(0, height - cropHeight)
+
+        return x, y, cropWidth, cropHeight
+
+    def sampleParameters(self, shape: Union[tuple, None] = None) -> tuple[int, int, int, int]:
+        if shape is None:
+            raise ValueError("The window of a crop depends on the shape of the image")
+
+        return self.sampleWindow(shape)
+
+    def outputShape(self, shape: tuple, parameters: tuple[int, int, int, int]) -> tuple:
+        return (parameters[3], parameters[2]) + tuple(shape[2:])
+
+    def forward(self, image: ndarray) -> ndarray:
+        return self.forwardWithParameters(image, self.sampleWindow(image.shape))
+
+    def forwardWithParameters(self, image: ndarray, parameters: tuple[int, int, int, int]) -> ndarray:
+        x, y, width, height = parameters
+        return image[y:y + height, x:x + width]
+
+    def forwardWithBBox(self, image: ndarray, bBoxes: list[COCO]):
+        return self.forwardWithBBoxParameters(image, bBoxes, self.sampleWindow(image.shape))
+
+    def forwardWithBBoxParameters(self, image: ndarray, bBoxes: list[COCO], parameters: tuple[int, int, int, int]):
+        x, y, width, height = parameters
+        return image[y:y + height, x:x + width], cropBoxes(bBoxes, (x, y, width, height), (1.0, 1.0), self.minBoxVisibility)
+
+
+class RandomResizedCrop(RandomCrop):
+    """
+    Crops a random region with random area and aspect ratio and resizes it to a fixed size
+
+    Only the cropped region is resized, so the cost of the resize and of every later filter depends on the output size instead of the source size.
+    """
+
+    def __init__(self, size: tuple[int, int] = (256, 256), scale: tuple[float, float] = (0.08, 1.0), ratio: tuple[float, float] = (3 / 4, 4 / 3), interpolation: Union[int, None] = None, minBoxVisibility: float = 0.0) -> None:
+        """
+        Initializes the crop
+
+        Keyword arguments:
+
+        size (tuple[int, int]) -- Size of the output in (width, height) format
+
+        scale (tuple[float, float]) -- Range of the area of the crop as a fraction of the area of the image
+
+        ratio (tuple[float, float]) -- Range of the aspect ratio (width / height) of the crop
+
+        interpolation (int) -- cv2 interpolation flag used for the resize, defaults to cv2.INTER_LINEAR
+
+        minBoxVisibility (float) -- Boxes keeping less than this fraction of their area are dropped, boxes with no area left are always dropped
+
+        Return: None
+        """
+
+        super().__init__(size, minBoxVisibility)
+        if not (0 < scale[0] <= scale[1] <= 1):
+            raise ValueError("scale should be a range inside (0, 1]")
+
+        if not (0 < ratio[0] <= ratio[1]):
+            raise ValueError("ratio should be a positive range")
+
+        self.scale = scale
+        self.ratio = ratio
+        self.interpolation = cv2.INTER_LINEAR if interpolation is None else interpolation
+
+    def sampleWindow(self, shape: tuple) -> tuple[int, int, int, int]:
+        height, width = shape[:2]
+        area = width * height
+        logRatio = (math.log(self.ratio[0]), math.log(self.ratio[1]))
+
+        for _ in range(10):
+            targetArea = area * self.rand.uniform(*self.scale)
+            aspect = math.exp(self.rand.uniform(*logRatio))
+
+            cropWidth = round(math.sqrt(targetArea * aspect))
+            cropHeight = round(math.sqrt(targetArea / aspect))
+
+            if 0 < cropWidth <= width and 0 < cropHeight <= height:
+                x = self.rand.randint(0, width - cropWidth)
+                y = self.rand.randint(0, height - cropHeight)
+                return x, y, cropWidth, cropHeight
+        # falling back to a centered crop with the closest valid aspect ratio
+
+        aspect = width / height
+        if aspect < self.ratio[0]:
+            cropWidth, cropHeight = width, round(width / self.ratio[0])
+        elif aspect > self.ratio[1]:
+            cropWidth, cropHeight = round(height * self.ratio[1]), height
+        else:
+            cropWidth, cropHeight = width, height
+
+        return (width - cropWidth) // 2, (height - cropHeight) // 2, cropWidth, cropHeight
+
+    def outputShape(self, shape: tuple, parameters: tuple[int, int, int, int]) -> tuple:
+        return (self.size[1], self.size[0]) + tuple(shape[2:])
+
+    def forwardWithParameters(self, image: ndarray, parameters: tuple[int, int, int, int]) -> ndarray:
+        x, y, width, height = parameters
+        return cv2.resize(image[y:y + height, x:x + width], self.size, interpolation=self.interpolation)
+
+    def forwardWithBBoxParameters(self, image: ndarray, bBoxes: list[COCO], parameters: tuple[int, int, int, int]):
+        x, y, width, height = parameters
+        resized = cv2.resize(image[y:y + height, x:x + width], self.size, interpolation=self.interpolation)
+
+        return resized, cropBoxes(bBoxes, (x, y, width, height), (self.size[0] / width, self.size[1] / height), self.minBoxVisibility)
+
+
+def cropBoxes(bBoxes: list[COCO], window: tuple[int, int, int, int], scale: tuple[float, float], minBoxVisibility: float) -> list[COCO]:
+    """
+    Moves boxes into a cropped window, clipping them to it
+
+    Keyword arguments:
+
+    bBoxes (list[COCO]) -- List Containg bounding boxes in COCO format
+
+    window (tuple) -- The crop in (x, y, width, height) format
+
+    scale (tuple[float, float]) -- Scale applied to the x and y coordinates after cropping
+
+    minBoxVisibility (float) -- Boxes keeping less than this fraction of their area are emptied
+
+    Return: Boxes in the same order, the ones that are not visible enough are emptied to (0, 0, 0, 0)
+    """
+
+    if len(bBoxes) == 0:
+        return []
+
+    x, y, width, height = window
+    boxes = np.array([bBox.iterablePascalVOCFormat for bBox in bBoxes], dtype=np.float64)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+    boxes -= (x, y, x, y)
+    np.clip(boxes, 0, (width, height, width, height), out=boxes)
+    clippedAreas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+    hidden = (clippedAreas <= 0) | (clippedAreas < minBoxVisibility * areas)
+    boxes *= (scale[0], scale[1], scale[0], scale[1])
+    boxes[hidden] = 0
+
+    return [COCO.fromPascalVOCIterable(box) for box in boxes.tolist()]
@@ -1,12 +1,27 @@
 from numpy import ndarray
 from random import Random
-import cv2
+from LazyImport import LazyModule
 import numpy as np
-from typing import Union, Any
+from typing import Union, Any, Callable
 from COCO import COCO
 import math
 
+cv2 = LazyModule("cv2")
+# cv2 is only imported once a filter runs, importing the filters stays cheap for spawned workers
+
 class Filter:
+    supportsInPlace = False
+    # filters that can write their result into a preallocated buffer through forwardInto set this to True
+
+    halo = 0
+    # number of neighboring pixels on every side a single output pixel depends on, used when filtering tiles
+
+    memoryFactor = 1
+    # peak working memory of forward() in multiples of the size of the input image, used to admit images against a memory budget
+
+    parameterSpace = None
+    # every parameter value the filter can sample, None when the values can't be enumerated
+
     def __init__(self) -> None:
         """
         Base Class for all the filters
@@ -37,6 +52,79 @@ class Filter:
         Return (ndarray) : Image with the filter applied
         """
         raise NotImplementedError("This method is meant to be implemented by the child")
+
+    def sampleParameters(self, shape:Union[tuple, None]=None) -> Any:
+        """
+        Samples the random parameters of the filter, forward() is forwardWithParameters() with freshly sampled parameters
+
+        Keyword arguments:
+
+        shape (tuple) -- Shape of the image the parameters are for, only needed by filters whose parameters depend on it
+
+        Return: The parameters, made of json serializable values so they can be recorded
+        """
+        if self.parameterSpace is None:
+            raise NotImplementedError("This method is meant to be implemented by the child")
+
+        return self.rand.choice(self.parameterSpace)
+
+    def forwardWithParameters(self, image:ndarray, parameters:Any) -> ndarray:
+        """
+        Applies Filter to the image with the given parameters instead of random ones, the same parameters always give the same image
+
+        Keyword arguments:
+
+        image (ndarray) -- Numpy array of the image
+
+        parameters (Any) -- Parameters returned by sampleParameters, lists may stand in for tuples
+
+        Return (ndarray) : Image with the filter applied
+        """
+        raise NotImplementedError("This method is meant to be implemented by the child")
+
+    def forwardWithBBoxParameters(self, image:ndarray, bBoxes:list[COCO], parameters:Any):
+        """
+        Applies Filter to the image and the bounding boxes with the given parameters instead of random ones
+
+        Keyword arguments:
+
+        image (ndarray) -- Numpy array of the image
+
+        bBoxes (list[COCO]) -- List Containg bounding boxes in COCO format
+
+        parameters (Any) -- Parameters returned by sampleParameters
+
+        Return: Image with filter applied and and applied bbox
+        """
+        return self.forwardWithParameters(image, parameters), bBoxes
+
+    def outputShape(self, shape:tuple, parameters:Any) -> tuple:
+        """
+        Shape of the image returned for an input of the given shape, filters which crop or resize override it
+
+        Keyword arguments:
+
+        shape (tuple) -- Shape of the input
+
+        parameters (Any) -- Parameters returned by sampleParameters
+
+        Return: Shape of the output
+        """
+        return shape
+
+    def forwardInto(self, image:ndarray, out:ndarray) -> ndarray:
+        """
+        Applies Filter to the image, writing the result into out when the filter supports it
+
+        Keyword arguments:
+
+        image (ndarray) -- Numpy array of the image, it is never written to
+
+        out (ndarray) -- Preallocated buffer with the same shape and dtype as the image or None to allocate a new one, it should not share memory with the image
+
+        Return (ndarray) : Image with the filter applied, this is out for filters that support in place execution
+        """
+        return self.forward(image)
     
     def forwardWithBBox(self, image:ndarray, bBoxes:list[COCO]):
         """
@@ -52,6 +140,18 @@ class Filter:
         """
         return self.forward(image), bBoxes
     
+    def compile(self, shouldApplyBBox:bool=False) -> Callable:
+        """
+        Gets the leanest callable applying the filter, used by Composite.compile
+
+        Keyword arguments:
+
+        shouldApplyBBox (bool) -- If the bounding boxes should be applied
+
+        Return: forward, or forwardWithBBox when the bounding boxes are applied
+        """
+        return self.forwardWithBBox if shouldApplyBBox else self.forward
+
     def apply(self, image:ndarray, shouldApplyBBox=False, bBoxes:Union[None, list[COCO]]=None) -> dict[str, Any]:
         """
         Applies filter to the image and returns a dictionary with all the data
@@ -5,11 +5,23 @@ class HorizontalFlip(Filter):
     """
     Flips the image in X axis
     """
+    supportsInPlace = True
+    parameterSpace = (None,)
+
     def __init__(self) -> None:
         super().__init__()
 
+    def forwardWithParameters(self, image: ndarray, parameters: None) -> ndarray:
+        return self.forward(image)
+
+    def forwardWithBBoxParameters(self, image: ndarray, bBoxes: list[COCO], parameters: None):
+        return self.forwardWithBBox(image, bBoxes)
+
     def forward(self, image: ndarray) -> ndarray:
-        return cv2.flip(image, 0)
+        return self.forwardInto(image, None)
+
+    def forwardInto(self, image: ndarray, out: ndarray) -> ndarray:
+        return cv2.flip(image, 0, dst=out)
     
     def forwardWithBBox(self, image: ndarray, bBoxes: list[COCO]):
         flippedImage = self.forward(image)
@@ -26,11 +38,23 @@ class VerticalFlip(Filter):
     """
     Flips the image in Y axis
     """
+    supportsInPlace = True
+    parameterSpace = (None,)
+
     def __init__(self) -> None:
         super().__init__()
 
+    def forwardWithParameters(self, image: ndarray, parameters: None) -> ndarray:
+        return self.forward(image)
+
+    def forwardWithBBoxParameters(self, image: ndarray, bBoxes: list[COCO], parameters: None):
+        return self.forwardWithBBox(image, bBoxes)
+
     def forward(self, image: ndarray) -> ndarray:
-        return cv2.flip(image, 1)
+        return self.forwardInto(image, None)
+
+    def forwardInto(self, image: ndarray, out: ndarray) -> ndarray:
+        return cv2.flip(image, 1, dst=out)
     
     def forwardWithBBox(self, image: ndarray, bBoxes: list[COCO]):
         flippedImage = self.forward(image)
@@ -47,11 +71,23 @@ class Flip(Filter):
     """
     Flips the image in X and Y axis
     """
+    supportsInPlace = True
+    parameterSpace = (None,)
+
     def __init__(self) -> None:
         super().__init__()
 
+    def forwardWithParameters(self, image: ndarray, parameters: None) -> ndarray:
+        return self.forward(image)
+
+    def forwardWithBBoxParameters(self, image: ndarray, bBoxes: list[COCO], parameters: None):
+        return self.forwardWithBBox(image, bBoxes)
+
     def forward(self, image: ndarray) -> ndarray:
-        return cv2.flip(image, -1)
+        return self.forwardInto(image, None)
+
+    def forwardInto(self, image: ndarray, out: ndarray) -> ndarray:
+        return cv2.flip(image, -1, dst=out)
 
     def forwardWithBBox(self, image: ndarray, bBoxes: list[COCO]):
         flippedImage = self.forward(image)
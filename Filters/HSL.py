@@ -1,19 +1,30 @@
 from numpy import ndarray
 from Filters.Filter import Filter
-import cv2
+from typing import Union
+from Filters.Filter import cv2
 import numpy as np
 
 class HSL(Filter):
     """
     Adds random hue saturation and lightness
     """
+    memoryFactor = 26
+    # float64 copies of the image while converting
+
     def __init__(self) -> None:
         super().__init__()
 
+    def sampleParameters(self, shape: Union[tuple, None] = None) -> list[float]:
+        return [(self.rand.random() / 3) + (1 - (1/6)) for _ in range(3)]
+        # factors of the hue, lightness and saturation channels
+
     def forward(self, image: ndarray) -> ndarray:
+        return self.forwardWithParameters(image, self.sampleParameters())
+
+    def forwardWithParameters(self, image: ndarray, parameters: list[float]) -> ndarray:
         image = cv2.cvtColor(image, cv2.COLOR_RGB2HLS).astype(np.float64)
 
-        image *= (np.random.rand((3)) / 3) + (1 - (1/6))
+        image *= parameters
 
         return cv2.cvtColor(image.clip(0, 255).round().astype(np.uint8), cv2.COLOR_HLS2RGB)
     
@@ -21,13 +32,22 @@ class Hue(Filter):
     """
     Adds random hue 
     """
+    memoryFactor = 26
+    # float64 copies of the image while converting
+
     def __init__(self) -> None:
         super().__init__()
 
+    def sampleParameters(self, shape: Union[tuple, None] = None) -> float:
+        return (self.rand.random() / 3) + (1 - (1/6))
+
     def forward(self, image: ndarray) -> ndarray:
+        return self.forwardWithParameters(image, self.sampleParameters())
+
+    def forwardWithParameters(self, image: ndarray, parameters: float) -> ndarray:
         image = cv2.cvtColor(image, cv2.COLOR_RGB2HLS).astype(np.float64)
 
-        image[:, :, 0] *= (np.random.rand((1)) / 3) + (1 - (1/6))
+        image[:, :, 0] *= parameters
 
         return cv2.cvtColor(image.clip(0, 255).round().astype(np.uint8), cv2.COLOR_HLS2RGB)
     
@@ -35,13 +55,22 @@ class Saturation(Filter):
     """
     Adds random saturation 
     """
+    memoryFactor = 26
+    # float64 copies of the image while converting
+
     def __init__(self) -> None:
         super().__init__()
 
+    def sampleParameters(self, shape: Union[tuple, None] = None) -> float:
+        return (self.rand.random() / 3) + (1 - (1/6))
+
     def forward(self, image: ndarray) -> ndarray:
+        return self.forwardWithParameters(image, self.sampleParameters())
+
+    def forwardWithParameters(self, image: ndarray, parameters: float) -> ndarray:
         image = cv2.cvtColor(image, cv2.COLOR_RGB2HLS).astype(np.float64)
 
-        image[:, :, 1] *= (np.random.rand((1)) / 3) + (1 - (1/6))
+        image[:, :, 1] *= parameters
 
         return cv2.cvtColor(image.clip(0, 255).round().astype(np.uint8), cv2.COLOR_HLS2RGB)
     
@@ -49,12 +78,21 @@ class Lightness(Filter):
     """
     Adds random lightness 
     """
+    memoryFactor = 26
+    # float64 copies of the image while converting
+
     def __init__(self) -> None:
         super().__init__()
 
+    def sampleParameters(self, shape: Union[tuple, None] = None) -> float:
+        return (self.rand.random() / 3) + (1 - (1/6))
+
     def forward(self, image: ndarray) -> ndarray:
+        return self.forwardWithParameters(image, self.sampleParameters())
+
+    def forwardWithParameters(self, image: ndarray, parameters: float) -> ndarray:
         image = cv2.cvtColor(image, cv2.COLOR_RGB2HLS).astype(np.float64)
 
-        image[:, :, 2] *= (np.random.rand((1)) / 3) + (1 - (1/6))
+        image[:, :, 2] *= parameters
 
         return cv2.cvtColor(image.clip(0, 255).round().astype(np.uint8), cv2.COLOR_HLS2RGB)
\ No newline at end of file
@@ -1,17 +1,32 @@
 from numpy import ndarray
+from typing import Union
 import numpy as np
 from Filters import Filter
-import cv2
+from Filters.Filter import cv2
 
 class Noise(Filter):
     """
     Adds noise to image
     """
+    supportsInPlace = True
+    memoryFactor = 10
+    # the noise is sampled as float64 before it is cast
+
     def __init__(self, mean:int=0, stdDeviation:int=3) -> None:
         super().__init__()
         self.mean = mean
         self.stdDeviation = stdDeviation
 
     def forward(self, image: ndarray) -> ndarray:
-        noise = np.random.normal(self.mean, self.stdDeviation, image.shape).astype(np.uint8)
-        return cv2.add(image, noise)
\ No newline at end of file
+        return self.forwardInto(image, None)
+
+    def sampleParameters(self, shape: Union[tuple, None] = None) -> int:
+        return self.rand.getrandbits(32)
+        # seed of the generator the noise is drawn from
+
+    def forwardWithParameters(self, image: ndarray, parameters: int, out: Union[ndarray, None] = None) -> ndarray:
+        noise = np.random.default_rng(parameters).normal(self.mean, self.stdDeviation, image.shape).astype(np.uint8)
+        return cv2.add(image, noise, dst=out)
+
+    def forwardInto(self, image: ndarray, out: ndarray) -> ndarray:
+        return self.forwardWithParameters(image, self.sampleParameters(), out)
\ No newline at end of file
@@ -4,6 +4,8 @@ class RGBShift(Filter):
     """
     Shift the values of colors by a random amount
     """
+    supportsInPlace = True
+
     def __init__(self, rMax:int=25, gMax:int=25, bMax:int=25) -> None:
         super().__init__()        
         self.rMax = rMax
@@ -11,12 +13,21 @@ class RGBShift(Filter):
         self.bMax = bMax
 
     def forward(self, image: ndarray) -> ndarray:
+        return self.forwardInto(image, None)
+
+    def sampleParameters(self, shape: Union[tuple, None] = None) -> tuple[int, int, int]:
         rShift = self.rand.randint(-self.rMax, self.rMax)
         gShift = self.rand.randint(-self.gMax, self.gMax)
         bShift = self.rand.randint(-self.bMax, self.bMax)
 
-        shift = np.array([rShift, gShift, bShift]).astype(np.uint8)
-        shiftedImage  = image + shift
+        return rShift, gShift, bShift
+
+    def forwardInto(self, image: ndarray, out: ndarray) -> ndarray:
+        return self.forwardWithParameters(image, self.sampleParameters(), out)
+
+    def forwardWithParameters(self, image: ndarray, parameters: tuple[int, int, int], out: Union[ndarray, None] = None) -> ndarray:
+        shift = np.array(parameters).astype(np.uint8)
+        shiftedImage  = np.add(image, shift, out=out)
         return shiftedImage
     
 
@@ -24,10 +35,18 @@ class RGBPermute(Filter):
     """
     Permutes the RGB Channels
     """
+    supportsInPlace = True
+    parameterSpace = ((0, 1, 2), (0, 2, 1), (1, 0, 2), (1, 2, 0), (2, 0, 1), (2, 1, 0))
+    # the order of the channels
+
     def __init__(self) -> None:
         super().__init__()
 
     def forward(self, image: ndarray) -> ndarray:
-        channels = [image[:, :, 0], image[:, :, 1], image[:, :, 2]]
-        self.rand.shuffle(channels)
-        return np.stack(channels, 2)
\ No newline at end of file
+        return self.forwardInto(image, None)
+
+    def forwardWithParameters(self, image: ndarray, parameters: tuple[int, int, int], out: Union[ndarray, None] = None) -> ndarray:
+        return np.take(image, parameters, axis=2, out=out)
+
+    def forwardInto(self, image: ndarray, out: ndarray) -> ndarray:
+        return self.forwardWithParameters(image, self.sampleParameters(), out)
@@ -1,16 +1,125 @@
 from Filters.Filter import *
+from collections import OrderedDict
+import threading
+
+
+class RemapCache:
+    """
+    Bounded LRU cache of precomputed cv2.remap maps keyed by (height, width, angle, anchor)
+
+    Rotations only use integer angles, so for a given image size there are only a few dozen distinct maps. Caching them turns every rotation into a single cv2.remap call.
+    """
+
+    def __init__(self, maxBytes: int = 256 * 1024 * 1024) -> None:
+        """
+        Initializes the cache
+
+        Keyword arguments:
+
+        maxBytes (int) -- Upper bound of the memory used by the cached maps, least recently used maps are evicted first. 0 disables caching
+
+        Return: None
+        """
+
+        self.maxBytes = maxBytes
+        self.currentBytes = 0
+        self.maps: OrderedDict[tuple, tuple[ndarray, ndarray]] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __deepcopy__(self, memo: dict) -> "RemapCache":
+        return self
+        # the maps only depend on the geometry, copies of a filter share the cache and its lock
+
+    def get(self, key: tuple, M: ndarray, dsize: tuple[int, int]) -> tuple[ndarray, ndarray]:
+        """
+        Gets the remap maps for the key, building them from the affine matrix if they are not cached
+
+        Keyword arguments:
+
+        key (tuple) -- The cache key
+
+        M (ndarray) -- 2x3 affine matrix mapping the source image to the destination image
+
+        dsize (tuple[int, int]) -- Size of the destination image in (width, height) format
+
+        Return: The maps in the fixed point format accepted by cv2.remap
+        """
+
+        with self.lock:
+            if key in self.maps:
+                self.maps.move_to_end(key)
+                return self.maps[key]
+
+        maps = self.buildMaps(M, dsize)
+        size = maps[0].nbytes + maps[1].nbytes
+
+        if size > self.maxBytes:
+            return maps
+            # a single map larger than the budget is used once and never stored
+
+        with self.lock:
+            if key not in self.maps:
+                self.maps[key] = maps
+                self.currentBytes += size
+
+                while self.currentBytes > self.maxBytes:
+                    _, evicted = self.maps.popitem(last=False)
+                    self.currentBytes -= evicted[0].nbytes + evicted[1].nbytes
+                # evicting least recently used maps
+
+        return maps
+
+    @staticmethod
+    def buildMaps(M: ndarray, dsize: tuple[int, int]) -> tuple[ndarray, ndarray]:
+        """
+        Builds remap maps equivalent to cv2.warpAffine(image, M, dsize)
+
+        Keyword arguments:
+
+        M (ndarray) -- 2x3 affine matrix
+
+        dsize (tuple[int, int]) -- Size of the destination image in (width, height) format
+
+        Return: The maps in the fixed point format accepted by cv2.remap
+        """
+
+        width, height = dsize
+        inverse = cv2.invertAffineTransform(M).astype(np.float32)
+        # remap needs the source coordinate of every destination pixel
+
+        xs = np.arange(width, dtype=np.float32)[np.newaxis, :]
+        ys = np.arange(height, dtype=np.float32)[:, np.newaxis]
+
+        mapX = inverse[0, 0] * xs + inverse[0, 1] * ys + inverse[0, 2]
+        mapY = inverse[1, 0] * xs + inverse[1, 1] * ys + inverse[1, 2]
+
+        return cv2.convertMaps(mapX, mapY, cv2.CV_16SC2)
+
+    def clear(self) -> None:
+        """
+        Removes every cached map
+        """
+
+        with self.lock:
+            self.maps.clear()
+            self.currentBytes = 0
+
 
 class Rotate(Filter):
-    def __init__(self, maxAngle:int=25, rotateAnchor:tuple[float, float]=(0.5, 0.5)) -> None:
+    supportsInPlace = True
+
+    def __init__(self, maxAngle:int=25, rotateAnchor:tuple[float, float]=(0.5, 0.5), interpolation:Union[int, None]=None, cacheBytes:int=256 * 1024 * 1024) -> None:
         """
         Rotates the image in the given angle from the rotate angle
-        
+
         Keyword arguments:
         maxAngle (int) -- Maximum angle of rotation
         rotateAnchor (tuple) -- Anchor of rotation values should be in range [0, 1] in form (x, y)
-        Return: return_description
+        interpolation (int) -- cv2 interpolation flag, defaults to cv2.INTER_LINEAR. cv2.INTER_NEAREST trades quality for speed
+        cacheBytes (int) -- Memory budget of the rotation map cache, 0 disables caching
+        Return: None
         """
-        
+
         super().__init__()
         if not (isinstance(maxAngle, float) or isinstance(maxAngle, int)):
             raise TypeError("maxAngle should be float or int")
@@ -18,69 +127,121 @@ class Rotate(Filter):
 
         if not (isinstance(rotateAnchor, tuple) or isinstance(rotateAnchor, list)):
             raise TypeError("rotateAnchor should be tuple or list")
-        
+
         if len(rotateAnchor) != 2:
             raise ValueError(f"rotateAnchor should have 2 elements, x and y component not {len(rotateAnchor)}")
-        
-        for value, i in enumerate(rotateAnchor):
+
+        for i, value in enumerate(rotateAnchor):
             if (not isinstance(value, float)) and (value != 0 and value != 1):
                 raise TypeError("Rotate Anchor should either be float or 0 or 1")
             if value < 0 or value > 1:
                 raise ValueError(f"The value of the {['x', 'y'][i]} element should be in range [0, 1]")
-        
-        self.rotateAnchor = rotateAnchor
+
+        self.rotateAnchor = tuple(rotateAnchor)
+        self.interpolation = cv2.INTER_LINEAR if interpolation is None else interpolation
+        self.cache = RemapCache(cacheBytes)
+
+    def sampleAngle(self) -> int:
+        """
+        Picks a random angle between 0 and maxAngle
+        """
+
+        return self.rand.randint(min(0, self.maxAngle), max(0, self.maxAngle))
+
+    @property
+    def parameterSpace(self) -> range:
+        """
+        Every angle sampleAngle can pick
+        """
+
+        return range(min(0, self.maxAngle), max(0, self.maxAngle) + 1)
+
+    def sampleParameters(self, shape: Union[tuple, None] = None) -> int:
+        return self.sampleAngle()
+
+    def forwardWithParameters(self, image: ndarray, parameters: int, out: Union[ndarray, None] = None) -> ndarray:
+        return self.rotateImage(image, parameters, out)
+
+    def getMatrix(self, shape: tuple, angle: int) -> ndarray:
+        """
+        Gets the rotation matrix of the image
+
+        Keyword arguments:
+
+        shape (tuple) -- Shape of the image in (height, width) format
+
+        angle (int) -- Angle of rotation, positive angles rotate clockwise
+
+        Return: 2x3 affine matrix
+        """
+
+        height, width = shape[:2]
+        anchor = (width * self.rotateAnchor[0], height * self.rotateAnchor[1])
+
+        return cv2.getRotationMatrix2D(anchor, -angle, 1)
+
+    def rotateImage(self, image: ndarray, angle: int, out: Union[ndarray, None] = None) -> ndarray:
+        """
+        Rotates the image using the cached remap maps
+
+        Keyword arguments:
+
+        image (ndarray) -- The ndarray of the image to be rotated
+
+        angle (int) -- Angle of rotation
+
+        out (ndarray) -- Optional buffer to write the rotated image into
+
+        Return: The ndarray of the rotated image
+        """
+
+        height, width = image.shape[:2]
+        M = self.getMatrix(image.shape, angle)
+
+        if self.cache.maxBytes <= 0:
+            return cv2.warpAffine(image, M, (width, height), dst=out, flags=self.interpolation)
+
+        mapXY, mapInterpolation = self.cache.get((height, width, angle, self.rotateAnchor), M, (width, height))
+
+        return cv2.remap(image, mapXY, mapInterpolation, self.interpolation, dst=out)
 
     def forward(self, image: ndarray) -> ndarray:
         """
         Rotates the image by the given angle when initializing the object
-        
+
         Keyword arguments:
         image -- The ndarray of the image to be rotated
         Return: The ndarray of the rotated image
         """
-        anchor = np.multiply(image.shape[:2], self.rotateAnchor).astype(np.int64).tolist()
-        if self.maxAngle < 0:
-            M = cv2.getRotationMatrix2D(anchor, self.rand.randint(0, self.maxAngle), 1)
-        else:
-            M = cv2.getRotationMatrix2D(anchor, -self.rand.randint(0, self.maxAngle), 1)
 
-        return cv2.warpAffine(image, M, image.shape[:2])
-    
-    def forwardWithBBox(self, image: ndarray, bBoxes: list[COCO]):
-        anchor = np.multiply(image.shape[:2], self.rotateAnchor).astype(np.int64).tolist()
-        if self.maxAngle < 0:
-            theta = self.rand.randint(0, self.maxAngle)
-        else:
-            theta = self.rand.randint(0, self.maxAngle)
+        return self.rotateImage(image, self.sampleAngle())
 
-        M = cv2.getRotationMatrix2D(anchor, theta, 1)
+    def forwardInto(self, image: ndarray, out: ndarray) -> ndarray:
+        return self.rotateImage(image, self.sampleAngle(), out)
 
+    def forwardWithBBox(self, image: ndarray, bBoxes: list[COCO]):
+        return self.forwardWithBBoxParameters(image, bBoxes, self.sampleAngle())
 
-        rotatedPoints = []
-        for bBox in bBoxes:
-            corners = np.stack(tuple(map(lambda x: np.array(x), bBox.corners)))
-            center = np.multiply(self.rotateAnchor, image.shape[:2])
-            
-            translatedCorners = corners - center
-
-            radiansTheta = math.radians(theta)
+    def forwardWithBBoxParameters(self, image: ndarray, bBoxes: list[COCO], parameters: int):
+        height, width = image.shape[:2]
+        angle = parameters
 
-            rotationMatrix = np.array([
-                    [np.cos(radiansTheta), -np.sin(radiansTheta)],
-                    [np.sin(radiansTheta), np.cos(radiansTheta)]
-                ])
-            
-            rotatedTranlatedCorners = np.dot(translatedCorners, rotationMatrix)
+        if len(bBoxes) == 0:
+            return self.rotateImage(image, angle), []
 
-            newCorners = rotatedTranlatedCorners + center
+        M = self.getMatrix(image.shape, angle)
 
-            xMin = np.clip(np.min(newCorners[:, 0]), 0, image.shape[0])
-            yMin = np.clip(np.min(newCorners[:, 1]), 0, image.shape[1])
-            xMax = np.clip(np.max(newCorners[:, 0]), 0, image.shape[0])
-            yMax = np.clip(np.max(newCorners[:, 1]), 0, image.shape[1])
+        corners = np.array([bBox.corners for bBox in bBoxes], dtype=np.float64)
+        # shape (boxes, 4, 2)
 
+        newCorners = corners @ M[:, :2].T + M[:, 2]
+        # rotating every corner of every box at once
 
-            rotatedPoints.append(COCO.fromPascalVOCIterable((xMin, yMin, xMax, yMax)))
+        xMin = np.clip(newCorners[:, :, 0].min(axis=1), 0, width)
+        yMin = np.clip(newCorners[:, :, 1].min(axis=1), 0, height)
+        xMax = np.clip(newCorners[:, :, 0].max(axis=1), 0, width)
+        yMax = np.clip(newCorners[:, :, 1].max(axis=1), 0, height)
 
+        rotatedPoints = [COCO.fromPascalVOCIterable(box) for box in np.stack((xMin, yMin, xMax, yMax), 1).tolist()]
 
-        return cv2.warpAffine(image, M, image.shape[:2]), rotatedPoints
\ No newline at end of file
+        return self.rotateImage(image, angle), rotatedPoints
@@ -1,29 +1,160 @@
 from COCO import COCO
 from Filters import Filter
+from Filters.BufferPool import BufferPool
 from numpy import ndarray
+from typing import Any, Callable, Union
 
 class Stack(Filter):
     """
     Stacks multiple filters together
     """
-    def __init__(self, filters:list[Filter]) -> None:
+    def __init__(self, filters:list[Filter], inPlace:bool=False, pool:Union[BufferPool, None]=None) -> None:
+        """
+        Initializes the stack
+
+        Keyword arguments:
+
+        filters (list[Filter]) -- Filters to apply in order
+
+        inPlace (bool) -- Ping-pongs the filters that support it between two pooled buffers instead of allocating a new image for every filter. The returned image may then be a pooled buffer which is only valid until the next in place call on the same thread
+
+        pool (BufferPool) -- Pool to take the buffers from, defaults to the pool of the current thread
+
+        Return: None
+        """
         if not all(issubclass(type(x), Filter) for x in filters):
             raise TypeError("All the elements of the filters list should be a subclass of filters")
-        
+
         self.filters = filters
+        self.inPlace = inPlace
+        self.pool = pool
+
+    def setSeed(self, seed) -> None:
+        """
+        Sets a seed for the random generator of the stack and of every filter in it, the way Composite seeds its filters
+        """
+        super().setSeed(seed)
+        for f in self.filters:
+            f.setSeed(seed)
+
+    @property
+    def halo(self) -> int:
+        """
+        Halo of the whole stack, the halos of the filters add up
+        """
+        return sum(f.halo for f in self.filters)
+
+    @property
+    def memoryFactor(self) -> float:
+        """
+        Working memory of the stack, the result of the previous filter stays alive while the next one runs
+        """
+        return max((f.memoryFactor for f in self.filters), default=0) + 1
+
+    def getPool(self) -> BufferPool:
+        """
+        Gets the buffer pool used for in place execution
+        """
+        return self.pool if self.pool is not None else BufferPool.local()
+
+    def nextBuffer(self, current: ndarray, pool: BufferPool) -> ndarray:
+        """
+        Gets the pooled buffer the next filter should write into
+
+        Keyword arguments:
+
+        current (ndarray) -- The current image
+
+        pool (BufferPool) -- Pool to take the buffers from
+
+        Return: The buffer of the pair that is not holding the current image
+        """
+        first, second = pool.pair(current.shape, current.dtype)
+        return second if current is first else first
+
+    def sampleParameters(self, shape: Union[tuple, None] = None) -> list[Any]:
+        """
+        Samples the parameters of every filter, the shape is carried through the filters that crop or resize
+        """
+        parameters = []
+        for f in self.filters:
+            parameters.append(f.sampleParameters(shape))
+            if shape is not None:
+                shape = f.outputShape(shape, parameters[-1])
+
+        return parameters
+
+    def outputShape(self, shape: tuple, parameters: list[Any]) -> tuple:
+        for f, p in zip(self.filters, parameters):
+            shape = f.outputShape(shape, p)
+
+        return shape
+
+    def forwardWithParameters(self, image: ndarray, parameters: list[Any]) -> ndarray:
+        for f, p in zip(self.filters, parameters):
+            image = f.forwardWithParameters(image, p)
+
+        return image
+
+    def forwardWithBBoxParameters(self, image: ndarray, bBoxes: list[COCO], parameters: list[Any]):
+        for f, p in zip(self.filters, parameters):
+            image, bBoxes = f.forwardWithBBoxParameters(image, bBoxes, p)
+
+        return image, bBoxes
+
+    def compile(self, shouldApplyBBox: bool = False) -> Callable:
+        """
+        Chains the compiled filters into one function, in place stacks keep their forward as it manages the pooled buffers
+        """
+        if self.inPlace:
+            return self.forwardWithBBox if shouldApplyBBox else self.forward
+
+        steps = tuple(f.compile(shouldApplyBBox) for f in self.filters)
+
+        if shouldApplyBBox:
+            def forwardWithBBox(image: ndarray, bBoxes: list[COCO]):
+                for step in steps:
+                    image, bBoxes = step(image, bBoxes)
+                return image, bBoxes
+
+            return forwardWithBBox
+
+        def forward(image: ndarray) -> ndarray:
+            for step in steps:
+                image = step(image)
+            return image
+
+        return forward
 
     def forward(self, image: ndarray) -> ndarray:
+        if not self.inPlace:
+            current = image
+            for f in self.filters:
+                current = f.forward(current)
+
+            return current
+
+        pool = self.getPool()
         current = image
         for f in self.filters:
-            current = f.forward(current)
+            if f.supportsInPlace:
+                current = f.forwardInto(current, self.nextBuffer(current, pool))
+            else:
+                current = f.forward(current)
+                # filters that cannot work in place allocate, the following filters go back to the pool
 
         return current
-    
+
     def forwardWithBBox(self, image: ndarray, bBoxes: list[COCO]):
         currentImage = image
         currentBBox = bBoxes
+        pool = self.getPool() if self.inPlace else None
 
         for f in self.filters:
-            currentImage, currentBBox = f.forwardWithBBox(currentImage, currentBBox)
+            if self.inPlace and f.supportsInPlace and type(f).forwardWithBBox is Filter.forwardWithBBox:
+                currentImage = f.forwardInto(currentImage, self.nextBuffer(currentImage, pool))
+                # filters which do not move the boxes can run in place
+            else:
+                currentImage, currentBBox = f.forwardWithBBox(currentImage, currentBBox)
 
-        return currentImage, currentBBox       
\ No newline at end of file
+        return currentImage, currentBBox
@@ -1,10 +1,62 @@
-from Filters.Filter import Filter
-from Filters.BrightnessContrast import BrightnessContrast, Brightness, Contrast
-from Filters.Flip import HorizontalFlip, VerticalFlip, Flip
-from Filters.RGB import RGBPermute, RGBShift
-from Filters.Rotate import Rotate
-from Filters.Stack import Stack
-from Filters.Blur import GaussianBlur, Blur
-from Filters.Noise import Noise
-from Filters.Compression import JPEGCompression
-from Filters.HSL import HSL, Hue, Saturation, Lightness
\ No newline at end of file
+import importlib
+import sys
+from types import ModuleType
+
+exports = {
+    'Filter': 'Filters.Filter',
+    'BrightnessContrast': 'Filters.BrightnessContrast',
+    'Brightness': 'Filters.BrightnessContrast',
+    'Contrast': 'Filters.BrightnessContrast',
+    'HorizontalFlip': 'Filters.Flip',
+    'VerticalFlip': 'Filters.Flip',
+    'Flip': 'Filters.Flip',
+    'RGBPermute': 'Filters.RGB',
+    'RGBShift': 'Filters.RGB',
+    'Rotate': 'Filters.Rotate',
+    'Stack': 'Filters.Stack',
+    'GaussianBlur': 'Filters.Blur',
+    'Blur': 'Filters.Blur',
+    'Noise': 'Filters.Noise',
+    'JPEGCompression': 'Filters.Compression',
+    'HSL': 'Filters.HSL',
+    'Hue': 'Filters.HSL',
+    'Saturation': 'Filters.HSL',
+    'Lightness': 'Filters.HSL',
+    'BufferPool': 'Filters.BufferPool',
+    'RandomCrop': 'Filters.Crop',
+    'RandomResizedCrop': 'Filters.Crop',
+}
+# filter classes are imported from their module the first time they are used, so importing the package is close to free
+
+__all__ = list(exports)
+
+
+def __getattr__(name: str):
+    if name not in exports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(exports[name]), name)
+    globals()[name] = value
+
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(exports))
+
+
+class LazyPackage(ModuleType):
+    """
+    Keeps the classes bound on the package when a submodule with the same name is imported
+
+    The import system sets Filters.Rotate to the Filters.Rotate module once it is loaded, which would shadow the Rotate class.
+    """
+
+    def __setattr__(self, name: str, value) -> None:
+        if isinstance(value, ModuleType) and exports.get(name) == value.__name__:
+            value = getattr(value, name)
+
+        super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = LazyPackage
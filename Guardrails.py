@@ -0,0 +1,296 @@
+import json
+import queue
+import time
+import threading
+from typing import Any, Callable, Union
+from Catalog import probeImageSize
+
+
+class Watch:
+    """
+    State of an image running under the watchdog
+    """
+
+    def __init__(self, image: str, work: Callable[[], Any]) -> None:
+        self.image = image
+        self.work = work
+        self.expiry: Union[float, None] = None
+        # set once the image is admitted and starts decoding
+        self.release: Union[Callable[[], None], None] = None
+        # releases the memory budget held by the image
+        self.quarantined = False
+        self.error: Union[Exception, None] = None
+        self.done = threading.Event()
+
+
+class Runner:
+    """
+    Long lived thread running the watched items of one worker one after another, so thread local state such as the buffer pool of the filters is kept between items
+    """
+
+    idleSeconds = 1.0
+    # how often an idle runner checks if the worker owning it is still alive
+
+    def __init__(self, guardrails: "Guardrails") -> None:
+        self.guardrails = guardrails
+        self.owner = threading.current_thread()
+        self.jobs: queue.SimpleQueue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self.loop, name=f"watched {self.owner.name}", daemon=True)
+        self.thread.start()
+
+    def loop(self) -> None:
+        while True:
+            try:
+                watch = self.jobs.get(timeout=self.idleSeconds)
+            except queue.Empty:
+                if self.owner.is_alive():
+                    continue
+                return
+                # the worker is gone, nothing else will be submitted
+
+            if watch is None:
+                return
+
+            self.guardrails.local.watch = watch
+            try:
+                watch.work()
+            except Exception as e:
+                watch.error = e
+            finally:
+                self.guardrails.local.watch = None
+                watch.done.set()
+
+    def submit(self, watch: Watch) -> None:
+        self.jobs.put(watch)
+
+    def stop(self) -> None:
+        """
+        Lets the thread exit once its current item returns
+        """
+        self.jobs.put(None)
+
+
+class Guardrails:
+    """
+    Limits on what a single image may cost a run, images breaking them are quarantined instead of stalling or killing it
+
+    The pixel cap is checked from the header before the image is decoded, so a decompression bomb is rejected after reading a few bytes. Images whose header can't be probed (archive members, video frames, unknown formats) are checked right after decoding instead. The deadline is checked between the variations of an image, an image running past it gets no more variations. Items run through watch() are also guarded by a watchdog, so a single variation that hangs (a pathological filter, a stuck read) doesn't hold the worker: the item is abandoned once it is watchdogGrace seconds past its deadline and the worker moves on. The items of a worker run one after another on a single long lived thread, so thread local state such as the buffer pool of the filters is reused between them. Python threads can't be killed, the abandoned thread finishes the variation it is stuck in and makes no further ones, its memory budget is released at once and the worker gets a new thread.
+    Quarantined images are kept in a list, appended to a json lines file when one is given, and summarized with summary().
+    """
+
+    watchdogGrace = 0.1
+    # seconds an item may run past its deadline before the watchdog abandons it, the check between variations usually stops it first
+
+    def __init__(self, maxPixels: Union[int, None] = None, deadline: Union[float, None] = None, quarantinePath: Union[str, None] = None) -> None:
+        """
+        Initializes the guardrails
+
+        Keyword arguments:
+
+        maxPixels (int) -- Largest width * height decoded, None does not cap it
+
+        deadline (float) -- Seconds a single image may take, None does not limit it
+
+        quarantinePath (str) -- Path of a json lines file every quarantined image is appended to
+
+        Return: None
+        """
+
+        if maxPixels is not None and maxPixels <= 0:
+            raise ValueError("maxPixels should be positive")
+
+        if deadline is not None and deadline <= 0:
+            raise ValueError("deadline should be positive")
+
+        self.maxPixels = maxPixels
+        self.deadline = deadline
+        self.quarantinePath = quarantinePath
+        self.quarantined: list[dict[str, Any]] = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        # the watch of the item the current thread runs, and the runner of a worker
+
+    def quarantine(self, image: str, reason: str, detail: Any = None, log: Union[Callable[[str], None], None] = None) -> None:
+        """
+        Records an image that broke a limit
+
+        Keyword arguments:
+
+        image (str) -- Path to the image
+
+        reason (str) -- 'pixels', 'deadline' or 'unreadable'
+
+        detail (Any) -- Json serializable details, e.g. the size of the image
+
+        log (Callable) -- A Function which takes in a string, this is used to log errors
+        """
+
+        entry = {'image': image, 'reason': reason, 'detail': detail}
+        with self.lock:
+            self.quarantined.append(entry)
+            if self.quarantinePath is not None:
+                with open(self.quarantinePath, 'a') as f:
+                    f.write(json.dumps(entry) + "\n")
+
+        if log is not None:
+            log(f"[QUARANTINED] {image} ({reason}: {detail})")
+
+    def allowsSize(self, image: str, size: Union[tuple[int, int], None], log: Union[Callable[[str], None], None] = None) -> bool:
+        """
+        Checks an image against the pixel cap, quarantining it if it is over
+
+        Keyword arguments:
+
+        image (str) -- Path to the image
+
+        size (tuple[int, int]) -- (width, height) of the image, None passes
+
+        log (Callable) -- A Function which takes in a string, this is used to log errors
+
+        Return: False if the image was quarantined
+        """
+
+        if self.maxPixels is None or size is None or size[0] * size[1] <= self.maxPixels:
+            return True
+
+        self.quarantine(image, 'pixels', list(size), log)
+        return False
+
+    def allowsHeader(self, image: str, log: Union[Callable[[str], None], None] = None) -> bool:
+        """
+        Checks the header of an image against the pixel cap without decoding it
+
+        Return: False if the image was quarantined
+        """
+
+        if self.maxPixels is None:
+            return True
+
+        return self.allowsSize(image, probeImageSize(image), log)
+
+    def expiry(self, release: Union[Callable[[], None], None] = None) -> Union[float, None]:
+        """
+        Time.perf_counter() value an image started now has to finish by, None without a deadline
+
+        Keyword arguments:
+
+        release (Callable) -- Releases the memory budget held by the image, called by the watchdog when it abandons the image
+
+        Return: The expiry
+        """
+
+        expiry = None if self.deadline is None else time.perf_counter() + self.deadline
+
+        watch = getattr(self.local, 'watch', None)
+        if watch is not None:
+            watch.release = release
+            watch.expiry = expiry
+            # starts the watchdog of the item
+
+        return expiry
+
+    def expired(self, image: str, expiry: Union[float, None], done: int, log: Union[Callable[[str], None], None] = None) -> bool:
+        """
+        Checks if an image ran past its deadline, quarantining it if it did
+
+        Keyword arguments:
+
+        image (str) -- Path to the image
+
+        expiry (float) -- Value returned by expiry() when the image started
+
+        done (int) -- Number of variations made so far, recorded with the quarantine
+
+        log (Callable) -- A Function which takes in a string, this is used to log errors
+
+        Return: True if the image was quarantined
+        """
+
+        watch = getattr(self.local, 'watch', None)
+        if watch is not None and watch.quarantined:
+            return True
+            # abandoned by the watchdog
+
+        if expiry is None or time.perf_counter() <= expiry:
+            return False
+
+        if self.claim(watch):
+            self.quarantine(image, 'deadline', {'seconds': self.deadline, 'variationsDone': done}, log)
+        return True
+
+    def claim(self, watch: Union[Watch, None]) -> bool:
+        """
+        Marks a watched item as quarantined, the check between variations and the watchdog may both find it expired
+
+        Return: True if the caller should quarantine the image
+        """
+
+        if watch is None:
+            return True
+
+        with self.lock:
+            if watch.quarantined:
+                return False
+            watch.quarantined = True
+            return True
+
+    def watch(self, image: str, work: Callable[[], Any], log: Union[Callable[[str], None], None] = None) -> bool:
+        """
+        Runs the work of an image under a watchdog, abandoning and quarantining it when it runs past its deadline
+
+        Keyword arguments:
+
+        image (str) -- Path to the image
+
+        work (Callable) -- Augments the image, it has to call expiry() once the image is admitted
+
+        log (Callable) -- A Function which takes in a string, this is used to log errors
+
+        Return: False if the image was quarantined for its deadline. Errors of the work are raised again unless it was abandoned
+        """
+
+        if self.deadline is None:
+            work()
+            return True
+
+        watch = Watch(image, work)
+        runner = getattr(self.local, 'runner', None)
+        if runner is None:
+            runner = self.local.runner = Runner(self)
+        runner.submit(watch)
+
+        while True:
+            expiry = watch.expiry
+            if watch.done.wait(0.05 if expiry is None else max(0.0, expiry + self.watchdogGrace - time.perf_counter())):
+                break
+            # the wait for the memory budget isn't part of the deadline, polling until the item starts
+
+            if expiry is not None and time.perf_counter() > expiry + self.watchdogGrace:
+                if self.claim(watch):
+                    self.quarantine(image, 'deadline', {'seconds': self.deadline, 'abandoned': True}, log)
+
+                if watch.release is not None:
+                    watch.release()
+                    # the stuck thread keeps its buffers until it returns but not its share of the budget
+                runner.stop()
+                self.local.runner = None
+                return False
+
+        if watch.error is not None:
+            raise watch.error
+
+        return not watch.quarantined
+
+    def summary(self) -> dict[str, Any]:
+        """
+        Summary of the quarantined images
+
+        Return: Dictionary with the total, the count of every reason and the quarantined entries
+        """
+
+        with self.lock:
+            reasons: dict[str, int] = {}
+            for entry in self.quarantined:
+                reasons[entry['reason']] = reasons.get(entry['reason'], 0) + 1
+
+            return {'quarantined': len(self.quarantined), 'reasons': reasons, 'images': list(self.quarantined)}
@@ -0,0 +1,59 @@
+import importlib
+import subprocess
+import sys
+from typing import Any, Union
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is only imported the first time one of its attributes is used
+
+    Heavy dependencies like cv2 take longer to import than the rest of the package together, every spawned worker pays that cost even if it never touches them. Attributes are cached on the stand-in after the first lookup, so later accesses are plain attribute reads.
+    """
+
+    def __init__(self, name: str) -> None:
+        """
+        Initializes the stand-in, nothing is imported yet
+
+        Keyword arguments:
+
+        name (str) -- Name of the module
+
+        Return: None
+        """
+
+        self.moduleName = name
+
+    def __getattr__(self, attribute: str) -> Any:
+        value = getattr(importlib.import_module(self.moduleName), attribute)
+        setattr(self, attribute, value)
+        # only called for attributes that are not cached yet
+
+        return value
+
+    def __repr__(self) -> str:
+        return f"<lazy module {self.moduleName!r}>"
+
+
+def importTime(module: str, python: Union[str, None] = None) -> float:
+    """
+    Measures how long a module takes to import in a fresh interpreter, which is what every spawned worker pays
+
+    Keyword arguments:
+
+    module (str) -- Name of the module
+
+    python (str) -- Interpreter to measure with, defaults to the current one
+
+    Return: The cumulative import time of the module in seconds
+    """
+
+    result = subprocess.run([python or sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True, check=True)
+
+    for line in reversed(result.stderr.splitlines()):
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1]) / 1e6
+    # -X importtime reports "self | cumulative | name" in microseconds on stderr
+
+    raise ValueError(f"No import time reported for {module}")
@@ -0,0 +1,168 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Union
+from Catalog import probeImageSize
+
+try:
+    import resource
+except ImportError:
+    resource = None
+    # not available on Windows, the peak resident memory is then not reported
+
+
+def estimateMemory(size: tuple[int, int], memoryFactor: float = 1.0, imageDim: Union[tuple[int, int], None] = None, channels: int = 3) -> int:
+    """
+    Estimates the peak memory of augmenting one image
+
+    Keyword arguments:
+
+    size (tuple[int, int]) -- (width, height) of the image
+
+    memoryFactor (float) -- Working memory of the filters in multiples of the image, Composite.memoryFactor
+
+    imageDim (tuple[int, int]) -- (width, height) the outputs are resized to
+
+    channels (int) -- Channels of the decoded image
+
+    Return: Estimate in bytes
+    """
+
+    decoded = size[0] * size[1] * channels
+    output = imageDim[0] * imageDim[1] * channels if imageDim is not None else decoded
+    # the decoded image stays alive while the filters run, the resized output and its encoding come after them
+
+    return int(decoded * (1 + memoryFactor) + 2 * output)
+
+
+class MemoryBudget:
+    """
+    Admits images into an augmentation run against a memory budget
+
+    Every image is admitted before it is decoded with an estimate of the memory it needs, from its dimensions (read from the header) and from the filters. Decoding blocks while the admitted images would go over the budget, so the peak memory of a run follows the budget instead of the number of batches running at once. An image larger than the whole budget is admitted alone.
+    One budget is shared by every batch of a run.
+    """
+
+    def __init__(self, maxBytes: int, defaultSize: tuple[int, int] = (4000, 3000), channels: int = 3) -> None:
+        """
+        Initializes the budget
+
+        Keyword arguments:
+
+        maxBytes (int) -- Memory the admitted images may use at once
+
+        defaultSize (tuple[int, int]) -- (width, height) assumed for images whose header can't be probed
+
+        channels (int) -- Channels of the decoded images
+
+        Return: None
+        """
+
+        if maxBytes <= 0:
+            raise ValueError("maxBytes should be positive")
+
+        self.maxBytes = maxBytes
+        self.defaultSize = defaultSize
+        self.channels = channels
+
+        self.condition = threading.Condition()
+        self.inUse = 0
+        self.peak = 0
+        self.admitted = 0
+        self.throttled = 0
+        self.throttledSeconds = 0.0
+
+    def estimate(self, size: tuple[int, int], memoryFactor: float = 1.0, imageDim: Union[tuple[int, int], None] = None) -> int:
+        """
+        Estimates the peak memory of augmenting one image
+
+        Keyword arguments:
+
+        size (tuple[int, int]) -- (width, height) of the image
+
+        memoryFactor (float) -- Working memory of the filters in multiples of the image, Composite.memoryFactor
+
+        imageDim (tuple[int, int]) -- (width, height) the outputs are resized to
+
+        Return: Estimate in bytes
+        """
+
+        return estimateMemory(size, memoryFactor, imageDim, self.channels)
+
+    def imageCost(self, path: str, memoryFactor: float = 1.0, imageDim: Union[tuple[int, int], None] = None) -> int:
+        """
+        Estimates the peak memory of augmenting an image from its header
+
+        Keyword arguments:
+
+        path (str) -- Path to the image
+
+        memoryFactor (float) -- Working memory of the filters in multiples of the image, Composite.memoryFactor
+
+        imageDim (tuple[int, int]) -- (width, height) the outputs are resized to
+
+        Return: Estimate in bytes
+        """
+
+        return self.estimate(probeImageSize(path) or self.defaultSize, memoryFactor, imageDim)
+
+    @contextmanager
+    def admit(self, cost: int) -> Iterator[Callable[[], None]]:
+        """
+        Holds cost bytes of the budget while the block runs, waiting until they fit
+
+        Keyword arguments:
+
+        cost (int) -- Estimated bytes, see estimate()
+
+        Return: Context manager giving a function which releases the bytes before the block exits, e.g. when the watchdog abandons the image. Releasing more than once has no effect
+        """
+
+        with self.condition:
+            if self.inUse > 0 and self.inUse + cost > self.maxBytes:
+                self.throttled += 1
+                start = time.perf_counter()
+                self.condition.wait_for(lambda: self.inUse == 0 or self.inUse + cost <= self.maxBytes)
+                self.throttledSeconds += time.perf_counter() - start
+
+            self.inUse += cost
+            self.admitted += 1
+            self.peak = max(self.peak, self.inUse)
+
+        released = False
+
+        def release():
+            nonlocal released
+            with self.condition:
+                if released:
+                    return
+                released = True
+                self.inUse -= cost
+                self.condition.notify_all()
+
+        try:
+            yield release
+        finally:
+            release()
+
+    def report(self) -> dict[str, Union[int, float, None]]:
+        """
+        Peak memory of the run against the budget
+
+        Return: Dictionary with the budget, the peak of the admitted estimates, the peak resident memory of the process (None when unknown), the number of admitted and throttled images and the seconds spent throttled
+        """
+
+        peakRss = None
+        if resource is not None:
+            peakRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+            # ru_maxrss is in kilobytes on Linux
+
+        with self.condition:
+            return {
+                'budget': self.maxBytes,
+                'peakEstimated': self.peak,
+                'peakRss': peakRss,
+                'admitted': self.admitted,
+                'throttled': self.throttled,
+                'throttledSeconds': self.throttledSeconds,
+            }
@@ -0,0 +1,100 @@
+import os
+import hashlib
+
+
+class OutputLayout:
+    """
+    Deterministic output naming with hashed sub folder fan-out
+
+    Every saved image is named after a hash of its sample key (the source image and the variation index), so re-runs overwrite their previous outputs and the path of any output can be computed without scanning a folder. The leading characters of the hash pick the sub folders, e.g. ab/cd/abcd12....jpg for two levels of two characters, which keeps every folder small.
+    """
+
+    def __init__(self, levels: int = 2, width: int = 2, extension: str = '.jpg', digestSize: int = 10) -> None:
+        """
+        Initializes the layout
+
+        Keyword arguments:
+
+        levels (int) -- Number of nested sub folders, 0 puts every image directly in the target folder
+
+        width (int) -- Number of hex characters of the hash used for every sub folder, every level fans out to 16 ** width folders
+
+        extension (str) -- Extension of the saved images
+
+        digestSize (int) -- Size of the hash in bytes, the names are twice as many hex characters long
+
+        Return: None
+        """
+
+        if levels < 0 or width < 1:
+            raise ValueError("levels should not be negative and width should be positive")
+
+        if levels * width > digestSize * 2:
+            raise ValueError("The hash is too short for the requested fan-out")
+
+        self.levels = levels
+        self.width = width
+        self.extension = extension
+        self.digestSize = digestSize
+        self.createdFolders: set[str] = set()
+
+    def imageID(self, key: str, isOriginal: bool = False) -> str:
+        """
+        Gets the id of an output from its sample key
+
+        Keyword arguments:
+
+        key (str) -- Key identifying the sample, the same key always gives the same id
+
+        isOriginal (bool) -- If the image is the original image
+
+        Return: The id, prefixed with original_ for original images
+        """
+
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=self.digestSize).hexdigest()
+        return f"original_{digest}" if isOriginal else digest
+
+    def folder(self, targetFolder: str, imageID: str) -> str:
+        """
+        Gets the sub folder an output belongs in
+
+        Keyword arguments:
+
+        targetFolder (str) -- The folder all the outputs are saved in
+
+        imageID (str) -- Id of the output
+
+        Return: Path to the sub folder
+        """
+
+        digest = imageID[len("original_"):] if imageID.startswith("original_") else imageID
+        parts = [digest[i * self.width:(i + 1) * self.width] for i in range(self.levels)]
+
+        return os.path.join(targetFolder, *parts)
+
+    def path(self, targetFolder: str, key: str, isOriginal: bool = False, create: bool = True) -> tuple[str, str]:
+        """
+        Gets the id and path of an output, creating its sub folder if needed
+
+        Keyword arguments:
+
+        targetFolder (str) -- The folder all the outputs are saved in
+
+        key (str) -- Key identifying the sample
+
+        isOriginal (bool) -- If the image is the original image
+
+        create (bool) -- Creates the sub folder, storages which are not a local folder have none to create
+
+        Return: Tuple of (id, path)
+        """
+
+        imageID = self.imageID(key, isOriginal)
+        folder = self.folder(targetFolder, imageID)
+
+        if create and folder not in self.createdFolders:
+            os.makedirs(folder, exist_ok=True)
+            self.createdFolders.add(folder)
+        # remembering the folders so every save after the first one skips the syscall
+
+        return imageID, os.path.join(folder, imageID + self.extension)
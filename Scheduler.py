@@ -0,0 +1,131 @@
+import os
+import time
+import threading
+from collections import deque
+from typing import Callable, NamedTuple, Union
+from Batch import Batch
+from Catalog import probeImageSize
+
+
+class WorkItem(NamedTuple):
+    """
+    A run of variations of a single image, the unit of work handed to the workers
+    """
+    cost: int
+    batch: Batch
+    image: str
+    first: int
+    count: int
+    original: bool
+    # the original is saved by the first item of every image only
+
+
+class Scheduler:
+    """
+    Runs batches as a shared queue of image or image x variation work items instead of one thread per batch
+
+    Fixed chunks of images finish at very different times when a few of them hold the largest images, and the run waits for the slowest chunk. Here every idle worker takes the next item from one queue, so no worker sits idle while items remain. Items are ordered largest first, by the pixel count read from the header times the number of variations, which keeps the largest items from being the last ones to start.
+    """
+
+    def __init__(self, workers: Union[int, None] = None, variationsPerItem: Union[int, None] = None) -> None:
+        """
+        Initializes the scheduler
+
+        Keyword arguments:
+
+        workers (int) -- Number of worker threads, defaults to the number of cpus
+
+        variationsPerItem (int) -- Variations of an image per work item, the variations of a large image are then spread over several workers at the cost of decoding it once per item. None keeps every image a single item
+
+        Return: None
+        """
+
+        if variationsPerItem is not None and variationsPerItem < 1:
+            raise ValueError("variationsPerItem should be at least 1")
+
+        self.workers = workers or os.cpu_count() or 1
+        self.variationsPerItem = variationsPerItem
+
+    def items(self, batches: list[Batch], variations: Union[int, dict[str, int]] = 15) -> list[WorkItem]:
+        """
+        Splits batches into work items, largest first
+
+        Keyword arguments:
+
+        batches (list[Batch]) -- The batches, their images may be shared by many workers
+
+        variations (Union[int, dict[str, int]]) -- The Number of variations of images, or the number of variations of every image keyed by its path
+
+        Return: List of the work items in the order they are started
+        """
+
+        items = []
+        for batch in batches:
+            for image in batch.targetImages:
+                count = variations if isinstance(variations, int) else variations.get(image, 0)
+                size = probeImageSize(image)
+                pixels = size[0] * size[1] if size is not None else 1
+                # images that can't be probed (archive members, video frames) keep their order
+
+                step = self.variationsPerItem or max(count, 1)
+                for first in range(0, max(count, 1), step):
+                    share = min(step, count - first)
+                    items.append(WorkItem(pixels * (share + (first == 0)), batch, image, first, share, first == 0))
+
+        items.sort(key=lambda x: x.cost, reverse=True)
+        # the sort is stable, items of the same cost stay in batch order
+
+        return items
+
+    def run(self, batches: list[Batch], variations: Union[int, dict[str, int]] = 15, log: Callable[[str], None] = print) -> dict[str, Union[int, float]]:
+        """
+        Augments the batches and waits for them
+
+        Keyword arguments:
+
+        batches (list[Batch]) -- The batches
+
+        variations (Union[int, dict[str, int]]) -- The Number of variations of images, or the number of variations of every image keyed by its path
+
+        log (Callable) -- A Function which takes in a string, this is used to log errors
+
+        Return: Dictionary with the number of items and workers, the wall seconds, the busy seconds summed over the workers and the utilization of the workers (busy / (workers * wall))
+        """
+
+        queue = deque(self.items(batches, variations))
+        total = len(queue)
+        busy = [0.0] * self.workers
+
+        def work(worker: int):
+            while True:
+                try:
+                    item = queue.popleft()
+                except IndexError:
+                    return
+                # deque.popleft is atomic, the queue needs no lock
+
+                start = time.perf_counter()
+                try:
+                    item.batch.watchItem(item.image, item.count, log, item.first, item.original)
+                except Exception as e:
+                    log(f"[AUGMENT ERROR] Cannot augment {item.image} due to [ [ {e} ] ]")
+                busy[worker] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=work, args=(i,)) for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for batch in batches:
+            batch.flush(log)
+        # uploads to a storage may still be running
+        wall = time.perf_counter() - start
+
+        return {
+            'items': total,
+            'workers': self.workers,
+            'wallSeconds': wall,
+            'busySeconds': sum(busy),
+            'utilization': sum(busy) / (self.workers * wall) if wall > 0 else 0.0,
+        }
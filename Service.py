@@ -0,0 +1,402 @@
+import os
+import threading
+import time
+import queue
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+from typing import Any, Union
+from LazyImport import LazyModule
+import numpy as np
+from numpy import ndarray
+from COCO import COCO
+from Composite import Composite
+from SharedRing import SharedRing, RingFrame
+
+cv2 = LazyModule("cv2")
+
+
+class AugmentationRequest:
+    """
+    A request waiting in the server queue
+    """
+
+    def __init__(self, message: dict[str, Any]) -> None:
+        self.message = message
+        self.received = time.perf_counter()
+        self.done = threading.Event()
+        self.response: dict[str, Any] = {}
+
+    def finish(self, response: dict[str, Any]) -> None:
+        self.response = response
+        self.done.set()
+
+
+class AugmentationServer:
+    """
+    Long running local server hosting named Composite pipelines
+
+    Clients connect over a Unix socket (an address string) or localhost TCP (a (host, port) tuple) through multiprocessing.connection. multiprocessing.connection unpickles every message, so clients always have to authenticate, with a random key unless one is given. Images are passed by path or through a SharedRing owned by the client, the server answers in the slot the image came in whenever the result fits, so neither image is pickled. Concurrent requests are grouped into batches of up to maxBatchSize, a batch is dispatched as soon as it is full or its oldest request has waited maxLatency seconds.
+    """
+
+    def __init__(self, pipelines: dict[str, Composite], address: Union[str, tuple[str, int]] = ('127.0.0.1', 0), authkey: Union[bytes, None] = None, maxBatchSize: int = 16, maxLatency: float = 0.005, workers: int = 4, historySize: int = 10000) -> None:
+        """
+        Initializes the server, nothing is served until start() is called
+
+        Keyword arguments:
+
+        pipelines (dict[str, Composite]) -- Pipelines keyed by the name clients refer to them with
+
+        address (Union[str, tuple[str, int]]) -- Path of a Unix socket or a (host, port) tuple, port 0 picks a free port
+
+        authkey (bytes) -- Key clients need to connect, None generates a random one. Hand server.authkey to the clients
+
+        maxBatchSize (int) -- Maximum number of requests in a batch
+
+        maxLatency (float) -- Maximum number of seconds the first request of a batch waits for more requests
+
+        workers (int) -- Number of batches processed at once
+
+        historySize (int) -- Number of latest requests the latency percentiles are computed from
+
+        Return: None
+        """
+
+        self.pipelines = pipelines
+        self.address = address
+        self.authkey = authkey if authkey is not None else os.urandom(32)
+        # without a key any local user could connect and have the server unpickle arbitrary objects
+        self.maxBatchSize = maxBatchSize
+        self.maxLatency = maxLatency
+        self.workers = workers
+
+        self.requests: queue.Queue = queue.Queue()
+        self.latencies: deque = deque(maxlen=historySize)
+        self.completed = 0
+        self.batches = 0
+        self.statsLock = threading.Lock()
+
+        self.listener: Union[Listener, None] = None
+        self.executor: Union[ThreadPoolExecutor, None] = None
+        self.running = threading.Event()
+        self.threads: list[threading.Thread] = []
+
+    def start(self) -> "AugmentationServer":
+        """
+        Starts listening and batching in background threads
+
+        Return: self
+        """
+
+        family = 'AF_UNIX' if isinstance(self.address, str) else 'AF_INET'
+        self.listener = Listener(self.address, family, authkey=self.authkey)
+        self.address = self.listener.address
+        self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix="augment-server")
+        self.started = time.perf_counter()
+        self.running.set()
+
+        for target in (self.acceptLoop, self.batchLoop):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+        return self
+
+    def close(self) -> None:
+        """
+        Stops the server
+        """
+
+        self.running.clear()
+        if self.listener is not None:
+            self.listener.close()
+        for thread in self.threads:
+            thread.join(1)
+        if self.executor is not None:
+            self.executor.shutdown()
+
+    def __enter__(self) -> "AugmentationServer":
+        return self.start()
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def acceptLoop(self) -> None:
+        """
+        Accepts connections, every connection is served by its own thread
+        """
+
+        while self.running.is_set():
+            try:
+                connection = self.listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                continue
+                # the listener was closed or a client failed the handshake
+
+            threading.Thread(target=self.serve, args=(connection,), daemon=True).start()
+
+    def serve(self, connection) -> None:
+        """
+        Answers the requests of one connection until the client disconnects
+        """
+
+        rings: dict[str, SharedRing] = {}
+
+        with connection:
+            try:
+                while self.running.is_set():
+                    try:
+                        message = connection.recv()
+                    except (EOFError, OSError):
+                        return
+
+                    if message.get('op') == 'stats':
+                        connection.send(self.stats())
+                        continue
+
+                    if 'ring' in message:
+                        if message['ring'] not in rings:
+                            for ring in rings.values():
+                                ring.close()
+                            rings = {message['ring']: SharedRing.attach(message['ring'], message['slots'], message['slotBytes'], message.get('pid'))}
+                            # a client replaces its ring when an image outgrows it
+                        message['attachedRing'] = rings[message['ring']]
+
+                    request = AugmentationRequest(message)
+                    self.requests.put(request)
+                    request.done.wait()
+                    connection.send(request.response)
+            finally:
+                for ring in rings.values():
+                    ring.close()
+
+    def batchLoop(self) -> None:
+        """
+        Groups queued requests into batches and dispatches them to the workers
+        """
+
+        while self.running.is_set():
+            try:
+                first = self.requests.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            batch = [first]
+            deadline = first.received + self.maxLatency
+            while len(batch) < self.maxBatchSize:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            # collecting requests until the batch is full or the oldest one hit its deadline
+
+            self.executor.submit(self.processBatch, batch)
+
+    def processBatch(self, batch: list[AugmentationRequest]) -> None:
+        """
+        Processes a batch of requests
+        """
+
+        for request in batch:
+            try:
+                response = self.process(request.message)
+            except Exception as e:
+                response = {'error': f"{type(e).__name__}: {e}"}
+            request.finish(response)
+
+            with self.statsLock:
+                self.latencies.append(time.perf_counter() - request.received)
+                self.completed += 1
+
+        with self.statsLock:
+            self.batches += 1
+
+    def process(self, message: dict[str, Any]) -> dict[str, Any]:
+        """
+        Runs a single request through its pipeline
+
+        Keyword arguments:
+
+        message (dict) -- The request, it has the pipeline name, the image as 'path' or as the 'frame' of a ring, optional 'bBoxes' in COCO format and optional 'outPath' to write the result to
+
+        Return: The response, 'frame' or 'image' holds the pixels unless they were written to outPath, 'bBoxes' holds the boxes
+        """
+
+        pipeline = self.pipelines.get(message.get('pipeline'))
+        if pipeline is None:
+            raise KeyError(f"No pipeline named {message.get('pipeline')!r}")
+
+        ring: Union[SharedRing, None] = message.get('attachedRing')
+        if ring is not None:
+            frame = RingFrame(*message['frame'])
+            image = ring.get(frame)[0].copy()
+            # the slot is overwritten by the response
+        else:
+            image = cv2.imread(message['path'])
+            if image is None:
+                raise ValueError(f"{message['path']} can't be loaded, image may be corrupted or the path is invalid")
+
+        bBoxes = [COCO.fromIterable(x) for x in message['bBoxes']] if message.get('bBoxes') is not None else None
+        transformed = pipeline.transform(image, bBoxes)
+
+        response: dict[str, Any] = {}
+        if 'bBox' in transformed:
+            response['bBoxes'] = [x.iterableFormat for x in transformed['bBox']]
+
+        if message.get('outPath'):
+            if not cv2.imwrite(message['outPath'], transformed['image']):
+                raise ValueError(f"Cannot write {message['outPath']}")
+            response['outPath'] = message['outPath']
+        elif ring is not None and ring.frameBytes([transformed['image']]) <= ring.slotBytes:
+            response['frame'] = tuple(ring.write(frame.slot, [transformed['image']]))
+            # the client keeps the slot until it read the result
+        else:
+            response['image'] = np.array(transformed['image'], copy=True)
+            # an in place stack hands out a pooled buffer which the next request of the worker overwrites while the response may still be pickled
+
+        return response
+
+    def stats(self) -> dict[str, float]:
+        """
+        Latency percentiles (in seconds) of the latest requests and the overall throughput
+
+        Return: Dictionary with p50, p99, throughput (requests per second), completed requests and average batch size
+        """
+
+        with self.statsLock:
+            latencies = np.array(self.latencies)
+            completed = self.completed
+            batches = self.batches
+
+        elapsed = time.perf_counter() - self.started
+
+        return {
+            'p50': float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+            'p99': float(np.percentile(latencies, 99)) if len(latencies) else 0.0,
+            'throughput': completed / elapsed if elapsed > 0 else 0.0,
+            'completed': completed,
+            'averageBatchSize': completed / batches if batches else 0.0,
+        }
+
+
+class AugmentationClient:
+    """
+    Client of an AugmentationServer, one connection per client so use one client per thread
+    """
+
+    def __init__(self, address: Union[str, tuple[str, int]], authkey: Union[bytes, None] = None) -> None:
+        """
+        Connects to a server
+
+        Keyword arguments:
+
+        address (Union[str, tuple[str, int]]) -- Address of the server, AugmentationServer.address once it started
+
+        authkey (bytes) -- Key of the server, AugmentationServer.authkey
+
+        Return: None
+        """
+
+        family = 'AF_UNIX' if isinstance(address, str) else 'AF_INET'
+        self.connection = Client(address, family, authkey=authkey)
+        self.ring: Union[SharedRing, None] = None
+
+    def __enter__(self) -> "AugmentationClient":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+        if self.ring is not None:
+            self.ring.close()
+
+    def ringFor(self, nbytes: int) -> SharedRing:
+        """
+        Gets the ring of the client, replacing it with one at least twice as large when a frame doesn't fit
+
+        Keyword arguments:
+
+        nbytes (int) -- Bytes the frame takes in a slot
+
+        Return: The ring
+        """
+
+        if self.ring is None or self.ring.slotBytes < nbytes:
+            slotBytes = max(nbytes, 2 * self.ring.slotBytes if self.ring is not None else 0, 1)
+            if self.ring is not None:
+                self.ring.close()
+            self.ring = SharedRing(1, slotBytes)
+            # requests of a client are synchronous, one slot is all it ever uses
+
+        return self.ring
+
+    def request(self, message: dict[str, Any]) -> dict[str, Any]:
+        """
+        Sends a raw request and waits for its response, raising the error of the server if it failed
+        """
+
+        self.connection.send(message)
+        response = self.connection.recv()
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+
+        return response
+
+    def transform(self, pipeline: str, image: Union[ndarray, str], bBoxes: Union[list[COCO], None] = None, outPath: Union[str, None] = None) -> dict[str, Any]:
+        """
+        Transforms an image on the server
+
+        Keyword arguments:
+
+        pipeline (str) -- Name of the pipeline
+
+        image (Union[ndarray, str]) -- The image, passed through the ring of the client, or its path which the server reads itself
+
+        bBoxes (list[COCO]) -- Bounding boxes of the image
+
+        outPath (str) -- Path the server writes the result to instead of sending it back
+
+        Return: dictionary with 'image' (unless outPath was given) and 'bBox' when boxes were sent
+        """
+
+        message: dict[str, Any] = {'pipeline': pipeline, 'outPath': outPath}
+        if bBoxes is not None:
+            message['bBoxes'] = [x.iterableFormat for x in bBoxes]
+
+        frame = None
+        if isinstance(image, str):
+            message['path'] = image
+        else:
+            ring = self.ringFor(SharedRing.frameBytes([image]))
+            frame = ring.put([image])
+            message.update(ring=ring.name, slots=ring.slots, slotBytes=ring.slotBytes, frame=tuple(frame), pid=os.getpid())
+
+        result: dict[str, Any] = {}
+        try:
+            response = self.request(message)
+            if 'frame' in response:
+                result['image'] = self.ring.get(RingFrame(*response['frame']))[0].copy()
+            elif 'image' in response:
+                result['image'] = response['image']
+        finally:
+            if frame is not None:
+                self.ring.release(frame)
+
+        if 'bBoxes' in response:
+            result['bBox'] = [COCO.fromIterable(x) for x in response['bBoxes']]
+
+        return result
+
+    def stats(self) -> dict[str, float]:
+        """
+        Gets the latency and throughput statistics of the server
+        """
+
+        self.connection.send({'op': 'stats'})
+        return self.connection.recv()
@@ -0,0 +1,288 @@
+import os
+import multiprocessing
+from multiprocessing import shared_memory, resource_tracker
+from typing import Iterable, NamedTuple, Union
+import numpy as np
+from numpy import ndarray
+from COCO import COCO
+
+ALIGNMENT = 64
+# arrays start on cache line boundaries inside a slot
+
+
+def attachSharedMemory(name: str, ownerPid: Union[int, None] = None) -> shared_memory.SharedMemory:
+    """
+    Attaches to a shared memory block created by another process without letting this process' resource tracker take ownership of it
+
+    Keyword arguments:
+
+    name (str) -- Name of the block
+
+    ownerPid (int) -- Pid of the process that created the block, the tracker is left alone when it is this process
+
+    Return: The attached block
+    """
+
+    block = shared_memory.SharedMemory(name)
+    if ownerPid != os.getpid():
+        resource_tracker.unregister(block._name, 'shared_memory')
+    # before python 3.13 attaching registers the block as if this process created it
+
+    return block
+
+
+class RingFrame(NamedTuple):
+    """
+    Header of the arrays written to a slot, it is all that needs to be pickled between processes
+    """
+    slot: int
+    arrays: tuple[tuple[tuple[int, ...], str, int], ...]
+    # (shape, dtype, offset) of every array
+
+
+class SharedRing:
+    """
+    Fixed number of fixed size shared memory slots for passing images between processes without pickling them
+
+    The producer writes arrays into a free slot and sends the small RingFrame header through any queue or pipe, the consumer gets numpy views of the slot and releases it once it is done with them. Writing is a single copy into shared memory and reading copies nothing, so passing a frame costs microseconds whatever its size.
+    A full ring blocks put() until a slot is released, which also bounds how far a producer can run ahead of its consumers.
+
+    The ring is shared with child processes by passing it to them when they are started (as a Process argument or a pool initializer argument), the children attach to the same block. Unrelated processes, e.g. the AugmentationServer, attach() by name instead, they can then read and write the slots the owner acquired but can't acquire or release slots themselves.
+    """
+
+    def __init__(self, slots: int = 8, slotBytes: int = 64 * 1024 * 1024, context=None) -> None:
+        """
+        Creates the ring, the calling process owns the shared memory block
+
+        Keyword arguments:
+
+        slots (int) -- Number of slots, the number of frames that can be in flight at once
+
+        slotBytes (int) -- Size of every slot, it has to fit every array of a frame
+
+        context -- multiprocessing context the locks are created with, defaults to the default context
+
+        Return: None
+        """
+
+        if slots < 1 or slotBytes < 1:
+            raise ValueError("slots and slotBytes should be positive")
+
+        context = context or multiprocessing.get_context()
+
+        self.slots = slots
+        self.slotBytes = slotBytes
+        self.ownerPid = os.getpid()
+        self.block = shared_memory.SharedMemory(create=True, size=slots + slots * slotBytes)
+        self.name = self.block.name
+        self.lock = context.Lock()
+        self.free = context.Semaphore(slots)
+        self.cursor = 0
+        self.attached = False
+
+        self.block.buf[:slots] = bytes(slots)
+        # the first bytes of the block mark which slots are taken, the slots follow them
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state['block']
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self.block = shared_memory.SharedMemory(self.name)
+        # children share the resource tracker of the owner, so unlike attachSharedMemory the registration is left alone
+
+    @classmethod
+    def attach(cls, name: str, slots: int, slotBytes: int, ownerPid: Union[int, None] = None) -> "SharedRing":
+        """
+        Attaches to the ring of an unrelated process, only the owner acquires and releases slots
+
+        Keyword arguments:
+
+        name (str) -- Name of the ring, SharedRing.name
+
+        slots (int) -- Number of slots of the ring
+
+        slotBytes (int) -- Size of every slot
+
+        ownerPid (int) -- Pid of the process that created the ring
+
+        Return: The attached ring
+        """
+
+        ring = cls.__new__(cls)
+        ring.slots = slots
+        ring.slotBytes = slotBytes
+        ring.ownerPid = ownerPid
+        ring.block = attachSharedMemory(name, ownerPid)
+        ring.name = name
+        ring.lock = None
+        ring.free = None
+        ring.cursor = 0
+        ring.attached = True
+        # never freed by close(), the owner may be this very process
+
+        return ring
+
+    def __enter__(self) -> "SharedRing":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Detaches from the block, the owner also frees it. Views returned by get() must not be used afterwards
+        """
+
+        self.block.close()
+        if not self.attached and os.getpid() == self.ownerPid:
+            self.block.unlink()
+
+    def slotView(self, slot: int) -> memoryview:
+        """
+        Gets the memory of a slot
+        """
+
+        start = self.slots + slot * self.slotBytes
+        return self.block.buf[start:start + self.slotBytes]
+
+    def acquire(self, timeout: Union[float, None] = None) -> int:
+        """
+        Takes a free slot, waiting for one to be released if the ring is full
+
+        Keyword arguments:
+
+        timeout (float) -- Maximum number of seconds to wait, None waits forever
+
+        Return: Index of the slot
+        """
+
+        if not self.free.acquire(timeout=timeout):
+            raise TimeoutError("No slot of the ring was released in time")
+
+        with self.lock:
+            for i in range(self.slots):
+                slot = (self.cursor + i) % self.slots
+                if self.block.buf[slot] == 0:
+                    self.block.buf[slot] = 1
+                    self.cursor = slot + 1
+                    return slot
+        # the semaphore guarantees a slot is free
+
+        raise RuntimeError("The ring has no free slot, a slot was released twice")
+
+    def release(self, frame: Union[RingFrame, int]) -> None:
+        """
+        Gives a slot back to the ring, views of the slot must not be used afterwards
+
+        Keyword arguments:
+
+        frame (Union[RingFrame, int]) -- The frame or the index of its slot
+        """
+
+        slot = frame.slot if isinstance(frame, RingFrame) else frame
+        with self.lock:
+            if self.block.buf[slot] == 0:
+                raise ValueError(f"Slot {slot} is not taken")
+            self.block.buf[slot] = 0
+
+        self.free.release()
+
+    def put(self, arrays: Iterable[ndarray], timeout: Union[float, None] = None) -> RingFrame:
+        """
+        Copies arrays into a free slot
+
+        Keyword arguments:
+
+        arrays (Iterable[ndarray]) -- The arrays of the frame, e.g. an image and its boxes
+
+        timeout (float) -- Maximum number of seconds to wait for a free slot, None waits forever
+
+        Return: Header of the frame, send it to the consumer
+        """
+
+        arrays = [np.asarray(x) for x in arrays]
+        if self.frameBytes(arrays) > self.slotBytes:
+            raise ValueError(f"The frame needs {self.frameBytes(arrays)} bytes, the slots of the ring only have {self.slotBytes}")
+        # checked before a slot is taken, a frame that never fits would hold it
+
+        return self.write(self.acquire(timeout), arrays)
+
+    @staticmethod
+    def frameBytes(arrays: Iterable[ndarray]) -> int:
+        """
+        Gets the number of bytes a frame of the arrays takes in a slot
+        """
+
+        return sum(-(-np.asarray(x).nbytes // ALIGNMENT) * ALIGNMENT for x in arrays)
+
+    def write(self, slot: int, arrays: Iterable[ndarray]) -> RingFrame:
+        """
+        Copies arrays into a slot that is already taken, e.g. to answer a frame in the slot it came in
+
+        Keyword arguments:
+
+        slot (int) -- Index of the slot
+
+        arrays (Iterable[ndarray]) -- The arrays of the frame
+
+        Return: Header of the frame
+        """
+
+        arrays = [np.asarray(x) for x in arrays]
+        if self.frameBytes(arrays) > self.slotBytes:
+            raise ValueError(f"The frame needs {self.frameBytes(arrays)} bytes, the slots of the ring only have {self.slotBytes}")
+
+        memory = self.slotView(slot)
+        headers = []
+        offset = 0
+        for array in arrays:
+            np.ndarray(array.shape, array.dtype, memory, offset)[...] = array
+            headers.append((array.shape, array.dtype.str, offset))
+            offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+
+        return RingFrame(slot, tuple(headers))
+
+    def get(self, frame: RingFrame) -> list[ndarray]:
+        """
+        Gets zero copy views of the arrays of a frame, they are valid until the frame is released
+
+        Keyword arguments:
+
+        frame (RingFrame) -- Header of the frame
+
+        Return: The arrays in the order they were put
+        """
+
+        memory = self.slotView(frame.slot)
+        return [np.ndarray(shape, dtype, memory, offset) for shape, dtype, offset in frame.arrays]
+
+
+def boxArray(bBoxes: list[COCO]) -> ndarray:
+    """
+    Packs boxes into an array so they can be put into a ring next to their image
+
+    Keyword arguments:
+
+    bBoxes (list[COCO]) -- List Containg bounding boxes in COCO format
+
+    Return: Float array of shape (n, 4) in COCO format
+    """
+
+    return np.array([bBox.iterableFormat for bBox in bBoxes], dtype=np.float64).reshape(-1, 4)
+
+
+def boxesFromArray(array: ndarray) -> list[COCO]:
+    """
+    Unpacks boxes packed by boxArray
+
+    Keyword arguments:
+
+    array (ndarray) -- Float array of shape (n, 4) in COCO format
+
+    Return: List of the boxes
+    """
+
+    return [COCO.fromIterable(box) for box in array.tolist()]
@@ -0,0 +1,130 @@
+import hashlib
+from typing import Any, Callable, Iterable, Iterator, Union
+
+
+class HashSplitter:
+    """
+    Assigns images to the train, valid and test partitions from a stable hash of their identity
+
+    Every identity is hashed to a number in [0, 1) which is compared against the cumulative ratios, so the partition of an image never depends on the other images. Adding images to a dataset leaves the partition of the existing ones unchanged, and assigning is a streaming pass with no shuffle and no list of every image.
+    """
+
+    def __init__(self, ratio: tuple[float] = (0.75, 0.1, 0.15), salt: Any = None) -> None:
+        """
+        Initializes the splitter
+
+        Keyword arguments:
+
+        ratio (tuple[float]) -- (train, test) or (train, test, valid) ratios, in the order the augmentors take them
+
+        salt (Any) -- Mixed into the hash, different salts give independent splits of the same images
+
+        Return: None
+        """
+
+        if len(ratio) < 2 or len(ratio) > 3:
+            raise ValueError("There should either be 2 or 3 elements in ratio")
+
+        if abs(sum(ratio) - 1) > 1e-9:
+            raise ValueError("The sum of ratio should be 1")
+
+        self.ratio = tuple(ratio)
+        self.salt = b"" if salt is None else f"{salt}|".encode('utf-8')
+
+        thresholds = [("train", ratio[0])]
+        if len(ratio) == 3:
+            thresholds.append(("valid", ratio[0] + ratio[2]))
+        thresholds.append(("test", 1.0))
+        self.thresholds = thresholds
+        # same order and same slices as the shuffled partition: train, then valid, then test
+
+    @property
+    def partitions(self) -> list[str]:
+        return [name for name, _ in self.thresholds]
+
+    def fraction(self, identity: str) -> float:
+        """
+        Hashes an identity to a number in [0, 1)
+        """
+
+        digest = hashlib.blake2b(self.salt + identity.encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'big') / 2 ** 64
+
+    def assign(self, identity: str) -> str:
+        """
+        Gets the partition of an image
+
+        Keyword arguments:
+
+        identity (str) -- Identity of the image, e.g. its path relative to the dataset so moving the dataset keeps the split
+
+        Return: Name of the partition
+        """
+
+        value = self.fraction(identity)
+        for name, threshold in self.thresholds:
+            if value < threshold:
+                return name
+
+        return self.thresholds[-1][0]
+
+    def stream(self, images: Iterable[str], key: Union[Callable[[str], str], None] = None) -> Iterator[tuple[str, str]]:
+        """
+        Assigns images one at a time
+
+        Keyword arguments:
+
+        images (Iterable[str]) -- The images, any iterable including generators
+
+        key (Callable) -- Gets the identity of an image, defaults to the image itself
+
+        Return: Generator of (partition, image)
+        """
+
+        for image in images:
+            yield self.assign(image if key is None else key(image)), image
+
+    def partition(self, images: Iterable[str], key: Union[Callable[[str], str], None] = None) -> dict[str, list[str]]:
+        """
+        Assigns every image, the hash based counterpart of the augmentors' partition()
+
+        Keyword arguments:
+
+        images (Iterable[str]) -- The images
+
+        key (Callable) -- Gets the identity of an image, defaults to the image itself
+
+        Return: Dictionary of the partitions
+        """
+
+        partitions: dict[str, list[str]] = {name: [] for name in self.partitions}
+        for name, image in self.stream(images, key):
+            partitions[name].append(image)
+
+        return partitions
+
+    def groups(self, images: Iterable[str], size: int, key: Union[Callable[[str], str], None] = None) -> Iterator[tuple[str, list[str]]]:
+        """
+        Groups a stream of images into batches of a partition as they are assigned, only one pending batch per partition is held
+
+        Keyword arguments:
+
+        images (Iterable[str]) -- The images
+
+        size (int) -- Size of a batch
+
+        key (Callable) -- Gets the identity of an image, defaults to the image itself
+
+        Return: Generator of (partition, batch), the last batches of every partition may be smaller
+        """
+
+        pending: dict[str, list[str]] = {name: [] for name in self.partitions}
+        for name, image in self.stream(images, key):
+            pending[name].append(image)
+            if len(pending[name]) >= size:
+                yield name, pending[name]
+                pending[name] = []
+
+        for name, group in pending.items():
+            if group:
+                yield name, group
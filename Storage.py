@@ -0,0 +1,455 @@
+import os
+import queue
+import threading
+import http.client
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable, Iterator, Union
+from urllib.parse import quote, unquote, urlsplit
+import numpy as np
+from numpy import ndarray
+from LazyImport import LazyModule
+
+cv2 = LazyModule("cv2")
+
+
+class Storage:
+    """
+    Base class of the places outputs are written to and images can be read from, keys are '/' separated paths
+
+    put() hands a write to a pool of uploader threads and returns at once, so encoding the next image overlaps with writing the previous ones. At most maxPending writes wait at once, put() blocks when they are all taken, and flush() waits for every pending write. A storage can also stand in for an archive as the source of a batch, load() decodes a key.
+    """
+
+    def __init__(self, concurrency: int = 8, maxPending: int = 64) -> None:
+        """
+        Initializes the write pool
+
+        Keyword arguments:
+
+        concurrency (int) -- Number of writes running at once
+
+        maxPending (int) -- Number of writes put() lets wait before blocking
+
+        Return: None
+        """
+
+        if concurrency < 1 or maxPending < 1:
+            raise ValueError("concurrency and maxPending should be positive")
+
+        self.concurrency = concurrency
+        self.pending = threading.BoundedSemaphore(maxPending)
+        self.futures: set[Future] = set()
+        self.errors: list[tuple[str, Exception]] = []
+        self.lock = threading.Lock()
+        self.executor: Union[ThreadPoolExecutor, None] = None
+
+    def read(self, key: str) -> bytes:
+        """
+        Reads the bytes stored under a key, raises FileNotFoundError when there are none
+        """
+        raise NotImplementedError("This method is meant to be implemented by the child")
+
+    def write(self, key: str, data: bytes) -> None:
+        """
+        Stores bytes under a key, replacing what was there
+        """
+        raise NotImplementedError("This method is meant to be implemented by the child")
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError("This method is meant to be implemented by the child")
+
+    def keys(self, prefix: str = "") -> list[str]:
+        """
+        Lists the keys starting with prefix
+        """
+        raise NotImplementedError("This method is meant to be implemented by the child")
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError("This method is meant to be implemented by the child")
+
+    def load(self, key: str) -> Union[ndarray, None]:
+        """
+        Decodes an image, the storage counterpart of cv2.imread
+
+        Keyword arguments:
+
+        key (str) -- Key of the image
+
+        Return: The image or None if the key is missing or can't be decoded
+        """
+
+        try:
+            data = self.read(key)
+        except OSError:
+            return None
+
+        return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+    def getExecutor(self) -> ThreadPoolExecutor:
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(self.concurrency, thread_name_prefix="storage")
+            return self.executor
+
+    def put(self, key: str, data: bytes) -> None:
+        """
+        Writes bytes in the background, errors are raised by the next flush()
+
+        Keyword arguments:
+
+        key (str) -- The key
+
+        data (bytes) -- The bytes
+        """
+
+        self.pending.acquire()
+        future = self.getExecutor().submit(self.write, key, data)
+        with self.lock:
+            self.futures.add(future)
+
+        def done(future: Future):
+            with self.lock:
+                self.futures.discard(future)
+                if future.exception() is not None:
+                    self.errors.append((key, future.exception()))
+            self.pending.release()
+
+        future.add_done_callback(done)
+
+    def putMany(self, items: Iterable[tuple[str, bytes]]) -> None:
+        """
+        Writes many (key, bytes) pairs in parallel and waits for them
+
+        Keyword arguments:
+
+        items (Iterable[tuple[str, bytes]]) -- The pairs to write
+        """
+
+        for key, data in items:
+            self.put(key, data)
+        self.flush()
+
+    def flush(self) -> None:
+        """
+        Waits for every pending write, raises the first error of the failed ones
+        """
+
+        with self.lock:
+            futures = list(self.futures)
+        wait(futures)
+
+        with self.lock:
+            errors, self.errors = self.errors, []
+
+        if errors:
+            key, error = errors[0]
+            raise OSError(f"{len(errors)} writes failed, the first one was {key}") from error
+
+    def close(self) -> None:
+        """
+        Flushes and stops the write pool
+        """
+
+        try:
+            self.flush()
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
+
+    def __enter__(self) -> "Storage":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+
+class LocalStorage(Storage):
+    """
+    Storage in a local directory, keys are paths relative to it and folders are created as needed
+    """
+
+    def __init__(self, root: str = "", concurrency: int = 8, maxPending: int = 64) -> None:
+        """
+        Initializes the storage
+
+        Keyword arguments:
+
+        root (str) -- Directory the keys are relative to, keys are used as they are when empty
+
+        concurrency (int) -- Number of writes running at once
+
+        maxPending (int) -- Number of writes put() lets wait before blocking
+
+        Return: None
+        """
+
+        super().__init__(concurrency, maxPending)
+        self.root = root
+        self.createdFolders: set[str] = set()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key) if self.root else key
+
+    def read(self, key: str) -> bytes:
+        with open(self.path(key), 'rb') as f:
+            return f.read()
+
+    def write(self, key: str, data: bytes) -> None:
+        path = self.path(key)
+        folder = os.path.dirname(path)
+        if folder and folder not in self.createdFolders:
+            os.makedirs(folder, exist_ok=True)
+            self.createdFolders.add(folder)
+
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self.path(key))
+
+    def keys(self, prefix: str = "") -> list[str]:
+        keys = []
+        base = self.root or "."
+        for directory, _, fileNames in os.walk(base):
+            for fileName in fileNames:
+                key = os.path.relpath(os.path.join(directory, fileName), base).replace(os.sep, '/')
+                if key.startswith(prefix):
+                    keys.append(key)
+
+        return sorted(keys)
+
+    def delete(self, key: str) -> None:
+        os.remove(self.path(key))
+
+
+class MemoryStorage(Storage):
+    """
+    Storage in a dictionary, meant for tests
+    """
+
+    def __init__(self, concurrency: int = 8, maxPending: int = 64) -> None:
+        super().__init__(concurrency, maxPending)
+        self.objects: dict[str, bytes] = {}
+
+    def read(self, key: str) -> bytes:
+        try:
+            return self.objects[key]
+        except KeyError:
+            raise FileNotFoundError(key) from None
+
+    def write(self, key: str, data: bytes) -> None:
+        self.objects[key] = bytes(data)
+
+    def exists(self, key: str) -> bool:
+        return key in self.objects
+
+    def keys(self, prefix: str = "") -> list[str]:
+        return sorted(x for x in list(self.objects) if x.startswith(prefix))
+
+    def delete(self, key: str) -> None:
+        self.objects.pop(key, None)
+
+
+class ObjectStorage(Storage):
+    """
+    Storage in a bucket of an HTTP object store, objects are written with PUT, read with GET and listed with GET ?prefix=
+
+    Every request goes through a pool of kept-alive connections, one per write thread. Requests are unsigned, stores that need authentication need a subclass that adds it in request().
+    """
+
+    def __init__(self, url: str, concurrency: int = 8, maxPending: int = 64, timeout: float = 30) -> None:
+        """
+        Initializes the storage
+
+        Keyword arguments:
+
+        url (str) -- Url of the bucket, e.g. http://localhost:9000/bucket
+
+        concurrency (int) -- Number of writes running at once, and of pooled connections
+
+        maxPending (int) -- Number of writes put() lets wait before blocking
+
+        timeout (float) -- Seconds a request may take
+
+        Return: None
+        """
+
+        super().__init__(concurrency, maxPending)
+
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise ValueError("The url should start with http:// or https://")
+
+        self.scheme = parts.scheme
+        self.host = parts.netloc
+        self.bucket = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.connections: queue.LifoQueue = queue.LifoQueue()
+
+    @contextmanager
+    def connection(self) -> Iterator[http.client.HTTPConnection]:
+        """
+        Takes a connection from the pool, connections that fail are closed instead of being returned
+        """
+
+        try:
+            connection = self.connections.get_nowait()
+        except queue.Empty:
+            kind = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+            connection = kind(self.host, timeout=self.timeout)
+
+        try:
+            yield connection
+        except BaseException:
+            connection.close()
+            raise
+        else:
+            self.connections.put(connection)
+
+    def request(self, method: str, key: str, body: Union[bytes, None] = None, query: str = "") -> tuple[int, bytes]:
+        """
+        Sends a request about a key
+
+        Return: (status, body) of the response
+        """
+
+        path = f"{self.bucket}/{quote(key)}" + (f"?{query}" if query else "")
+        with self.connection() as connection:
+            connection.request(method, path, body=body, headers={'Content-Length': str(len(body or b''))})
+            response = connection.getresponse()
+            return response.status, response.read()
+
+    def read(self, key: str) -> bytes:
+        status, body = self.request('GET', key)
+        if status == 404:
+            raise FileNotFoundError(key)
+        if status != 200:
+            raise OSError(f"GET {key} failed with status {status}")
+
+        return body
+
+    def write(self, key: str, data: bytes) -> None:
+        status, _ = self.request('PUT', key, bytes(data))
+        if status not in (200, 201, 204):
+            raise OSError(f"PUT {key} failed with status {status}")
+
+    def exists(self, key: str) -> bool:
+        return self.request('HEAD', key)[0] == 200
+
+    def keys(self, prefix: str = "") -> list[str]:
+        status, body = self.request('GET', "", query=f"prefix={quote(prefix)}")
+        if status != 200:
+            raise OSError(f"Listing {prefix} failed with status {status}")
+
+        return [x for x in body.decode('utf-8').split("\n") if x]
+
+    def delete(self, key: str) -> None:
+        self.request('DELETE', key)
+
+    def close(self) -> None:
+        try:
+            super().close()
+        finally:
+            while not self.connections.empty():
+                self.connections.get_nowait().close()
+
+
+class FakeObjectStore:
+    """
+    In-process HTTP object store speaking the protocol of ObjectStorage, meant for tests
+
+    Objects of every bucket live in one dictionary keyed by their path. The server runs in a background thread on a free port, use it as a context manager or call start() and stop().
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        """
+        Initializes the store
+
+        Keyword arguments:
+
+        host (str) -- Address to listen on
+
+        port (int) -- Port to listen on, 0 picks a free one
+
+        Return: None
+        """
+
+        self.objects: dict[str, bytes] = {}
+        self.requests = 0
+        self.putStatus = 200
+        # status PUT requests are answered with, tests set an error status to simulate a failing store
+        store = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # keeps the connections alive so the client pool reuses them
+
+            def reply(self, status: int, body: bytes = b"") -> None:
+                self.send_response(status)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(body)
+
+            def key(self) -> str:
+                return unquote(self.path.split('?', 1)[0])
+
+            def do_PUT(self):
+                store.requests += 1
+                data = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if store.putStatus < 300:
+                    store.objects[self.key()] = data
+                self.reply(store.putStatus)
+
+            def do_GET(self):
+                store.requests += 1
+                if '?prefix=' in self.path:
+                    bucket, query = self.path.split('?', 1)
+                    prefix = unquote(bucket.rstrip('/')) + "/" + unquote(query[len('prefix='):])
+                    keys = sorted(x[len(unquote(bucket.rstrip('/'))) + 1:] for x in list(store.objects) if x.startswith(prefix))
+                    self.reply(200, "\n".join(keys).encode('utf-8'))
+                    return
+
+                data = store.objects.get(self.key())
+                self.reply(404) if data is None else self.reply(200, data)
+
+            def do_HEAD(self):
+                store.requests += 1
+                self.reply(200 if self.key() in store.objects else 404)
+
+            def do_DELETE(self):
+                store.requests += 1
+                store.objects.pop(self.key(), None)
+                self.reply(204)
+
+            def log_message(self, *_):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread: Union[threading.Thread, None] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def bucketUrl(self, bucket: str) -> str:
+        return f"{self.url}/{bucket}"
+
+    def start(self) -> "FakeObjectStore":
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "FakeObjectStore":
+        return self.start()
+
+    def __exit__(self, *_) -> None:
+        self.stop()
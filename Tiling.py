@@ -0,0 +1,246 @@
+import os
+from LazyImport import LazyModule
+import numpy as np
+from numpy import ndarray
+from typing import Union
+from COCO import COCO
+
+cv2 = LazyModule("cv2")
+
+
+class Tiler:
+    """
+    Splits large images into fixed size tiles which are augmented as separate samples
+
+    Tiles are numpy views of the source, so the filters only ever touch tile sized arrays. Neighborhood filters get a halo of real pixels around every tile (reflected at the image border, the same way cv2 pads) which is cropped away after filtering, so tile seams match the result of filtering the full image.
+    cv2 can only decode a whole image, so the source itself is still held in memory, except for uncompressed sources (.npy and binary .ppm) which are memory mapped and read one tile at a time. Compressed sources over maxSourcePixels are rejected instead of decoded.
+    """
+
+    def __init__(self, tileSize: tuple[int, int] = (1024, 1024), overlap: int = 0, minBoxVisibility: float = 0.0, maxSourcePixels: Union[int, None] = 100_000_000) -> None:
+        """
+        Initializes the tiler
+
+        Keyword arguments:
+
+        tileSize (tuple[int, int]) -- Size of every tile in (width, height) format
+
+        overlap (int) -- Number of pixels neighboring tiles share
+
+        minBoxVisibility (float) -- Boxes keeping less than this fraction of their area inside a tile are dropped from it, boxes with no area left are always dropped
+
+        maxSourcePixels (int) -- Largest width * height of a source that is decoded whole, larger sources are only tiled when they can be memory mapped. None decodes any source
+
+        Return: None
+        """
+
+        if tileSize[0] <= overlap or tileSize[1] <= overlap:
+            raise ValueError("The overlap should be smaller than the tile size")
+
+        if overlap < 0:
+            raise ValueError("The overlap should not be negative")
+
+        self.tileSize = tileSize
+        self.overlap = overlap
+        self.minBoxVisibility = minBoxVisibility
+        self.maxSourcePixels = maxSourcePixels
+
+    @staticmethod
+    def openWindowed(path: str) -> Union[ndarray, None]:
+        """
+        Memory maps an uncompressed source so its tiles can be read one at a time
+
+        Keyword arguments:
+
+        path (str) -- Path to the source, an 8 bit .npy array in BGR order or a binary (P6) .ppm file
+
+        Return: Read only memory mapped image in BGR order, None when the source can't be memory mapped
+        """
+
+        extension = os.path.splitext(path)[1].lower()
+
+        try:
+            if extension == '.npy':
+                image = np.load(path, mmap_mode='r')
+                if image.dtype != np.uint8 or image.ndim not in (2, 3):
+                    return None
+                return image
+
+            if extension == '.ppm':
+                with open(path, 'rb') as f:
+                    header = f.read(512)
+
+                fields = []
+                i = 0
+                while len(fields) < 4 and i < len(header):
+                    if header[i:i + 1] == b'#':
+                        i = header.index(b'\n', i) + 1
+                        # skipping comments
+                    elif header[i:i + 1].isspace():
+                        i += 1
+                    else:
+                        start = i
+                        while i < len(header) and not header[i:i + 1].isspace():
+                            i += 1
+                        fields.append(header[start:i])
+
+                if len(fields) < 4 or fields[0] != b'P6' or int(fields[3]) > 255:
+                    return None
+
+                width, height = int(fields[1]), int(fields[2])
+                image = np.memmap(path, np.uint8, 'r', i + 1, (height, width, 3))
+
+                return image[..., ::-1]
+                # ppm stores RGB, the view reverses it without reading any pixel
+        except (OSError, ValueError):
+            return None
+
+        return None
+
+    def allowsSource(self, size: Union[tuple[int, int], None]) -> bool:
+        """
+        Checks if a source of the given (width, height) may be decoded whole, unknown sizes pass
+        """
+
+        return self.maxSourcePixels is None or size is None or size[0] * size[1] <= self.maxSourcePixels
+
+    @staticmethod
+    def starts(length: int, tile: int, stride: int) -> list[int]:
+        """
+        Start offsets of the tiles along one axis, the last tile is aligned to the end of the image
+        """
+
+        if length <= tile:
+            return [0]
+
+        starts = list(range(0, length - tile, stride))
+        starts.append(length - tile)
+
+        return starts
+
+    def windows(self, shape: tuple) -> list[tuple[int, int, int, int]]:
+        """
+        Gets the windows of all the tiles of an image
+
+        Keyword arguments:
+
+        shape (tuple) -- Shape of the image in (height, width) format
+
+        Return: List of windows in (x, y, width, height) format
+        """
+
+        height, width = shape[:2]
+        tileWidth, tileHeight = self.tileSize
+
+        xs = self.starts(width, tileWidth, tileWidth - self.overlap)
+        ys = self.starts(height, tileHeight, tileHeight - self.overlap)
+
+        return [(x, y, min(tileWidth, width), min(tileHeight, height)) for y in ys for x in xs]
+
+    @staticmethod
+    def padded(image: ndarray, window: tuple[int, int, int, int], halo: int) -> ndarray:
+        """
+        Gets a tile together with a halo of surrounding pixels
+
+        Keyword arguments:
+
+        image (ndarray) -- The source image
+
+        window (tuple) -- Window of the tile in (x, y, width, height) format
+
+        halo (int) -- Number of pixels added on every side
+
+        Return: A view of the tile when there is no halo, otherwise an array of shape (height + 2 * halo, width + 2 * halo)
+        """
+
+        x, y, width, height = window
+        if halo == 0:
+            tile = image[y:y + height, x:x + width]
+            return np.ascontiguousarray(tile) if isinstance(tile, np.memmap) else tile
+            # tiles of a memory mapped source are read into memory one at a time
+
+        imageHeight, imageWidth = image.shape[:2]
+        top, left = max(0, y - halo), max(0, x - halo)
+        bottom, right = min(imageHeight, y + height + halo), min(imageWidth, x + width + halo)
+
+        region = image[top:bottom, left:right]
+        if isinstance(region, np.memmap):
+            region = np.ascontiguousarray(region)
+
+        return cv2.copyMakeBorder(region, halo - (y - top), halo - (bottom - y - height), halo - (x - left), halo - (right - x - width), cv2.BORDER_REFLECT_101)
+
+    @staticmethod
+    def margins(shape: tuple, sourceShape: tuple, halo: int) -> tuple[int, int]:
+        """
+        Gets the halo left on the sides of a filtered tile, scaled with the tile when a filter changed its size
+
+        Keyword arguments:
+
+        shape (tuple) -- Shape of the filtered tile
+
+        sourceShape (tuple) -- Shape of the tile with its halo before filtering
+
+        halo (int) -- Number of pixels on every side before filtering
+
+        Return: Pixels to remove from the left and right, and from the top and bottom
+        """
+
+        if halo == 0:
+            return 0, 0
+
+        return round(halo * shape[1] / sourceShape[1]), round(halo * shape[0] / sourceShape[0])
+
+    @staticmethod
+    def crop(image: ndarray, halo: int, sourceShape: Union[tuple, None] = None) -> ndarray:
+        """
+        Removes the halo from a filtered tile, the halo of tiles resized by a filter is scaled with them
+
+        Keyword arguments:
+
+        image (ndarray) -- The filtered tile with its halo
+
+        halo (int) -- Number of pixels on every side before filtering
+
+        sourceShape (tuple) -- Shape of the tile with its halo before filtering, defaults to the shape of the image
+
+        Return: View of the tile without the halo
+        """
+
+        x, y = Tiler.margins(image.shape, sourceShape or image.shape, halo)
+        if (x == 0 and y == 0) or image.shape[0] <= 2 * y or image.shape[1] <= 2 * x:
+            return image
+
+        return image[y:image.shape[0] - y, x:image.shape[1] - x]
+
+    def shiftBoxes(self, bBoxes: list[tuple[COCO, Union[int, str]]], dx: float, dy: float, width: int, height: int) -> list[tuple[COCO, Union[int, str]]]:
+        """
+        Moves boxes into the coordinates of a tile, clipping them to it and dropping the ones that are no longer visible enough
+
+        Keyword arguments:
+
+        bBoxes (list[tuple[COCO, Union[int, str]]]) -- Boxes with their category ids
+
+        dx (float) -- Offset added to every x coordinate
+
+        dy (float) -- Offset added to every y coordinate
+
+        width (int) -- Width of the tile
+
+        height (int) -- Height of the tile
+
+        Return: Boxes in the coordinates of the tile with their category ids
+        """
+
+        if len(bBoxes) == 0:
+            return []
+
+        boxes = np.array([bBox.iterablePascalVOCFormat for bBox, _ in bBoxes], dtype=np.float64)
+        boxes += (dx, dy, dx, dy)
+
+        areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        np.clip(boxes, 0, (width, height, width, height), out=boxes)
+        clippedAreas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+        visible = clippedAreas > 0
+        visible &= clippedAreas >= self.minBoxVisibility * areas
+
+        return [(COCO.fromPascalVOCIterable(box), bBoxes[i][1]) for i, box in zip(np.flatnonzero(visible).tolist(), boxes[visible].tolist())]
@@ -0,0 +1,206 @@
+import threading
+from typing import Iterable, Union
+from numpy import ndarray
+from LazyImport import LazyModule
+
+cv2 = LazyModule("cv2")
+
+VIDEO_EXTENSIONS = ('.mp4', '.m4v', '.mov', '.avi', '.mkv', '.webm', '.mpg', '.mpeg', '.wmv', '.flv', '.ts')
+# extensions cv2.VideoCapture usually opens through ffmpeg
+
+
+class VideoSource:
+    """
+    Image source streaming sampled frames out of videos with cv2.VideoCapture, so the frames never have to be dumped to disk first
+
+    Every sampled frame is a member named "<video path>@<frame index>", batches take them in place of image paths. Every thread decodes through its own capture of each video and keeps track of the frame it is at: a frame a little ahead is reached by grabbing the frames in between, which only demuxes them, and anything else seeks. Reading the members of a range in order therefore decodes every video once from start to end.
+    """
+
+    def __init__(self, videos: Union[str, Iterable[str]], stride: int = 1, timeRanges: Union[list[tuple[float, float]], None] = None, seekThreshold: int = 64) -> None:
+        """
+        Opens the videos and lists the sampled frames
+
+        Keyword arguments:
+
+        videos (Union[str, Iterable[str]]) -- Path to a video or paths to several videos
+
+        stride (int) -- Every stride-th frame is sampled
+
+        timeRanges (list[tuple[float, float]]) -- (start, end) ranges in seconds the frames are sampled from, every frame is sampled from when None
+
+        seekThreshold (int) -- Frames further ahead than this are seeked to instead of grabbed through
+
+        Return: None
+        """
+
+        if stride < 1:
+            raise ValueError("stride should be at least 1")
+
+        self.videos = [videos] if isinstance(videos, str) else list(videos)
+        self.stride = stride
+        self.timeRanges = timeRanges
+        self.seekThreshold = seekThreshold
+        self.local = threading.local()
+
+        self.members: list[str] = []
+        self.fps: dict[str, float] = {}
+        for video in self.videos:
+            frames = self.sampledFrames(video)
+            self.members += [self.memberName(video, x) for x in frames]
+        # members in video order then frame order
+
+        self.positions = {name: i for i, name in enumerate(self.members)}
+
+    @staticmethod
+    def memberName(video: str, frame: int) -> str:
+        return f"{video}@{frame}"
+
+    @staticmethod
+    def parseMember(name: str) -> tuple[str, int]:
+        """
+        Splits a member name into the path of its video and the index of its frame
+        """
+
+        video, frame = name.rsplit('@', 1)
+        return video, int(frame)
+
+    def sampledFrames(self, video: str) -> list[int]:
+        """
+        Lists the indices of the frames sampled from a video
+
+        Keyword arguments:
+
+        video (str) -- Path to the video
+
+        Return: Frame indices in increasing order
+        """
+
+        capture = cv2.VideoCapture(video)
+        if not capture.isOpened():
+            raise ValueError(f"{video} can't be opened as a video")
+
+        try:
+            count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+            fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+
+            if count <= 0:
+                count = 0
+                while capture.grab():
+                    count += 1
+                # some containers don't store the frame count
+        finally:
+            capture.release()
+
+        self.fps[video] = fps
+
+        if self.timeRanges is None:
+            return list(range(0, count, self.stride))
+
+        if fps <= 0:
+            raise ValueError(f"{video} has no frame rate, time ranges can't be used with it")
+
+        frames = set()
+        for start, end in self.timeRanges:
+            first = max(0, round(start * fps))
+            last = min(count, round(end * fps))
+            frames.update(range(first, last, self.stride))
+
+        return sorted(frames)
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.positions
+
+    def capture(self, video: str) -> list:
+        """
+        Gets the capture of a video for the current thread, opening it on first use
+
+        Return: [capture, index of the next frame it will read]
+        """
+
+        captures = getattr(self.local, 'captures', None)
+        if captures is None:
+            captures = self.local.captures = {}
+
+        if video not in captures:
+            captures[video] = [cv2.VideoCapture(video), 0]
+
+        return captures[video]
+
+    def close(self) -> None:
+        """
+        Releases the captures of the current thread
+        """
+
+        for capture, _ in getattr(self.local, 'captures', {}).values():
+            capture.release()
+        self.local.captures = {}
+
+    def position(self, name: str) -> int:
+        """
+        Gets the position of a member in video and frame order, sorting by it makes the reads sequential
+        """
+
+        return self.positions[name]
+
+    def load(self, name: str) -> Union[ndarray, None]:
+        """
+        Decodes a sampled frame, the video counterpart of cv2.imread
+
+        Keyword arguments:
+
+        name (str) -- Name of the member
+
+        Return: The frame or None if it can't be decoded
+        """
+
+        try:
+            video, frame = self.parseMember(name)
+        except ValueError:
+            return None
+
+        state = self.capture(video)
+        capture, nextFrame = state
+        if not capture.isOpened():
+            return None
+
+        if frame < nextFrame or frame - nextFrame > self.seekThreshold:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, frame)
+        else:
+            for _ in range(frame - nextFrame):
+                if not capture.grab():
+                    state[1] = frame
+                    return None
+        # grabbing skips the colour conversion of the frames in between, short gaps are cheaper to grab through than to seek
+
+        ok, image = capture.read()
+        state[1] = frame + 1
+
+        return image if ok else None
+
+    def ranges(self, parts: int, members: Union[list[str], None] = None) -> list[list[str]]:
+        """
+        Splits members into contiguous ranges in video and frame order, one per worker, so every worker decodes sequentially
+
+        Keyword arguments:
+
+        parts (int) -- Number of ranges
+
+        members (list[str]) -- Members to split, defaults to every member
+
+        Return: List of ranges, their sizes differ by at most one
+        """
+
+        members = sorted(self.members if members is None else members, key=self.position)
+        size, extra = divmod(len(members), parts)
+
+        ranges = []
+        start = 0
+        for i in range(parts):
+            end = start + size + (1 if i < extra else 0)
+            ranges.append(members[start:end])
+            start = end
+
+        return ranges
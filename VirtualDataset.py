@@ -0,0 +1,202 @@
+import json
+from collections import OrderedDict
+from typing import Any, Callable, Iterable, Union
+import numpy as np
+from numpy import ndarray
+from COCO import COCO
+from Catalog import probeImageSize
+from Composite import Composite
+from LazyImport import LazyModule
+
+cv2 = LazyModule("cv2")
+
+
+def writeRecords(recordsPath: str, paths: Iterable[str], transforms: Composite, variations: int = 15, getBBoxes: Union[Callable[[str], list[tuple[COCO, Union[int, str]]]], None] = None, log: Callable[[str], None] = print) -> int:
+    """
+    Writes a virtual augmented dataset, every variation is recorded as its source, the index of its filter and the sampled parameters instead of pixels
+
+    Records are json lines of {"source", "filter", "parameters", "bBox"}, "filter" is None for the original image. Images without boxes are never decoded, the parameters only need the shape which is read from the header.
+
+    Keyword arguments:
+
+    recordsPath (str) -- Path of the records file
+
+    paths (Iterable[str]) -- Paths to the source images
+
+    transforms (Composite) -- Composition of filters, the reader needs the same filters in the same order
+
+    variations (int) -- The Number of variations of every image
+
+    getBBoxes (Callable) -- Gets the (box, category) pairs of an image from its path, the transformed boxes are recorded when it is given
+
+    log (Callable) -- A Function which takes in a string, this is used to log errors
+
+    Return: Number of records written
+    """
+
+    written = 0
+    with open(recordsPath, 'w') as f:
+        for path in paths:
+            size = probeImageSize(path) if getBBoxes is None else None
+            image = None
+
+            if size is None:
+                image = cv2.imread(path)
+                if image is None:
+                    log(f"[NOT OPENABLE] {path} can't be loaded, image may be corrupted or the path is invalid")
+                    continue
+                shape = image.shape
+            else:
+                shape = (size[1], size[0], 3)
+
+            bBoxes = getBBoxes(path) if getBBoxes is not None else None
+            records = [{'source': path, 'filter': None, 'parameters': None, 'bBox': recordBoxes(bBoxes)}]
+
+            for _ in range(variations):
+                index, parameters = transforms.sample(shape)
+                record = {'source': path, 'filter': index, 'parameters': parameters, 'bBox': None}
+
+                if bBoxes is not None:
+                    transformed = transforms.transformWithParameters(image, index, parameters, [x[0] for x in bBoxes])
+                    record['bBox'] = recordBoxes(list(zip(transformed['bBox'], [x[1] for x in bBoxes])))
+                    # the pixels are thrown away, only the boxes are kept
+
+                records.append(record)
+
+            for record in records:
+                f.write(json.dumps(record, separators=(',', ':')) + "\n")
+            written += len(records)
+
+    return written
+
+
+def recordBoxes(bBoxes: Union[list[tuple[COCO, Union[int, str]]], None]) -> Union[list[list], None]:
+    """
+    Converts (box, category) pairs to the [x, y, width, height, category] lists of a record, dropping the boxes that are no longer visible
+    """
+
+    if bBoxes is None:
+        return None
+
+    return [[*bBox.iterableFormat, categoryID] for bBox, categoryID in bBoxes if bBox.points['width'] > 0 and bBox.points['height'] > 0]
+
+
+class VirtualDataset:
+    """
+    Reader of the records written by writeRecords, every sample is rendered from its source on access
+
+    A sample is rendered by decoding its source and applying the recorded filter with the recorded parameters, so any variation can be read in any order and is the same every time. Recent renders and decoded sources are kept in small LRU caches, reading the variations of a source one after the other decodes it once.
+    """
+
+    def __init__(self, recordsPath: str, transforms: Composite, imageDim: Union[tuple[int, int], None] = None, cacheSize: int = 64, sourceCacheSize: int = 4) -> None:
+        """
+        Opens the records
+
+        Keyword arguments:
+
+        recordsPath (str) -- Path of the records file
+
+        transforms (Composite) -- The same filters, in the same order, the records were written with
+
+        imageDim (tuple[int, int]) -- Dimension the samples are resized to, None keeps the size the filters return
+
+        cacheSize (int) -- Number of recent renders kept, 0 disables the cache
+
+        sourceCacheSize (int) -- Number of recently decoded sources kept
+
+        Return: None
+        """
+
+        with open(recordsPath, 'r') as f:
+            self.records = [line for line in f if line.strip()]
+        # records stay as json text until they are read, they take a few dozen bytes each
+
+        self.transforms = transforms
+        self.imageDim = imageDim
+        self.cacheSize = cacheSize
+        self.sourceCacheSize = sourceCacheSize
+        self.renders: OrderedDict = OrderedDict()
+        self.sources: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __getitem__(self, index: int) -> dict[str, Any]:
+        return self.render(index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.render(i)
+
+    def record(self, index: int) -> dict[str, Any]:
+        """
+        Gets a record without rendering it
+        """
+
+        return json.loads(self.records[index])
+
+    @staticmethod
+    def cached(cache: OrderedDict, key: Any, size: int, compute: Callable[[], Any]) -> Any:
+        """
+        Gets a value from an LRU cache, computing and inserting it if it is missing
+        """
+
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+
+        value = compute()
+        if size > 0:
+            cache[key] = value
+            while len(cache) > size:
+                cache.popitem(last=False)
+
+        return value
+
+    def loadSource(self, path: str) -> ndarray:
+        """
+        Decodes a source image
+        """
+
+        image = cv2.imread(path)
+        if image is None:
+            raise ValueError(f"{path} can't be loaded, image may be corrupted or the path is invalid")
+
+        return image
+
+    def render(self, index: int) -> dict[str, Any]:
+        """
+        Renders a sample
+
+        Keyword arguments:
+
+        index (int) -- Index of the record
+
+        Return: dictionary with the 'image', the 'source' and, for records with boxes, 'bBox' as (box, category) pairs. The image is shared with the caches, copy it before writing to it
+        """
+
+        def compute():
+            record = self.record(index)
+            source = self.cached(self.sources, record['source'], self.sourceCacheSize, lambda: self.loadSource(record['source']))
+
+            if record['filter'] is None:
+                image = source
+            else:
+                image = self.transforms.filters[record['filter']].forwardWithParameters(source, record['parameters'])
+
+            sample: dict[str, Any] = {'source': record['source']}
+            bBoxes = [(COCO.fromIterable(x[:4]), x[4]) for x in record['bBox']] if record['bBox'] is not None else None
+
+            if self.imageDim is not None:
+                if bBoxes is not None:
+                    ratio = np.array(self.imageDim * 2) / np.array(image.shape[1::-1] * 2)
+                    bBoxes = [(COCO.fromPascalVOCIterable((np.array(bBox.iterablePascalVOCFormat) * ratio).tolist()), categoryID) for bBox, categoryID in bBoxes]
+                image = cv2.resize(image, self.imageDim)
+
+            sample['image'] = image
+            if bBoxes is not None:
+                sample['bBox'] = bBoxes
+
+            return sample
+
+        return self.cached(self.renders, index, self.cacheSize, compute)
@@ -0,0 +1,261 @@
+import os
+import time
+import threading
+from typing import Callable, Union
+from Scheduler import Scheduler
+
+
+class Watcher:
+    """
+    Base class of the long running ingestion modes, new entries are augmented in micro batches as they arrive
+
+    The source is polled with a cheap stat pass every interval seconds. A poll that finds nothing sleeps until the next one, so an idle watcher uses no cpu, and a poll that finds something is followed at once by the next one as more entries usually land together. Every micro batch goes through the scheduler, outputs and annotations are appended next to the ones of earlier batches.
+    When the augmentor splits, entries are assigned with its hash splitter, a shuffled split can't grow one entry at a time.
+    """
+
+    def __init__(self, augmentor, variations: int = 15, interval: float = 1.0, settle: float = 1.0, microBatch: int = 32, workers: Union[int, None] = None, log: Callable[[str], None] = print) -> None:
+        """
+        Initializes the watcher
+
+        Keyword arguments:
+
+        augmentor (Union[SimpleAugmentor, BoundingBoxAugmentor]) -- The augmentor whose source is watched and whose settings the entries are augmented with
+
+        variations (int) -- Total Variations to every new image
+
+        interval (float) -- Seconds between two polls while nothing changes
+
+        settle (float) -- Seconds an entry has to stay unmodified before it is picked up, so files still being copied are left alone
+
+        microBatch (int) -- Largest number of images augmented together
+
+        workers (int) -- Number of worker threads of every micro batch, defaults to the number of cpus
+
+        log (Callable) -- A Function which takes in a string, this is used to log errors
+
+        Return: None
+        """
+
+        if interval <= 0 or microBatch < 1:
+            raise ValueError("interval and microBatch should be positive")
+
+        self.augmentor = augmentor
+        self.variations = variations
+        self.interval = interval
+        self.settle = settle
+        self.microBatch = microBatch
+        self.scheduler = Scheduler(workers)
+        self.log = log
+        self.pending: set[str] = set()
+        self.processed = 0
+        self.stopEvent = threading.Event()
+        self.thread: Union[threading.Thread, None] = None
+
+    def poll(self) -> list[str]:
+        """
+        Finds the entries that arrived or changed since the last poll and have settled
+
+        Return: The entries to augment
+        """
+        raise NotImplementedError("This method is meant to be implemented by the child")
+
+    def process(self, images: list[str]) -> int:
+        """
+        Augments entries in micro batches
+
+        Keyword arguments:
+
+        images (list[str]) -- The entries
+
+        Return: Number of entries augmented
+        """
+
+        self.augmentor.createTargetFolder()
+
+        for i in range(0, len(images), self.microBatch):
+            for batch in self.augmentor.batchesFor(images[i:i + self.microBatch]):
+                self.scheduler.run([batch], self.variations, self.log)
+            # partitions run one after the other, the batches of a partition append to the same annotations
+
+        self.processed += len(images)
+        self.onProcessed(images)
+
+        return len(images)
+
+    def onProcessed(self, images: list[str]) -> None:
+        """
+        Called once images are augmented, e.g. to persist the state of the watcher
+        """
+
+    def run(self, maxPolls: Union[int, None] = None) -> None:
+        """
+        Polls and augments until stop() is called
+
+        Keyword arguments:
+
+        maxPolls (int) -- Returns after this many polls, None runs until stopped
+        """
+
+        polls = 0
+        while not self.stopEvent.is_set() and (maxPolls is None or polls < maxPolls):
+            polls += 1
+            try:
+                images = self.poll()
+                if images:
+                    self.process(images)
+                    continue
+                    # more entries usually land together, polling again at once
+            except Exception as e:
+                self.log(f"[WATCH ERROR] Poll {polls} failed due to [ [ {type(e).__name__}: {e} ] ]")
+                # an unreadable source or a failing store must not end the watcher, the next poll tries again
+
+            self.stopEvent.wait(self.interval)
+
+    def start(self) -> "Watcher":
+        """
+        Runs the watcher in a background thread
+        """
+
+        self.stopEvent.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+        return self
+
+    def stop(self, wait: bool = True) -> None:
+        """
+        Stops the watcher after the micro batch it is on
+
+        Keyword arguments:
+
+        wait (bool) -- Waits for the background thread to finish
+        """
+
+        self.stopEvent.set()
+        if wait and self.thread is not None:
+            self.thread.join()
+
+
+class FolderWatcher(Watcher):
+    """
+    Watches the images directory of a SimpleAugmentor, new or changed files are found by comparing the size and modification time of every file to the catalog
+
+    Changed files are only augmented again when the augmentor has an OutputLayout, whose deterministic names make the new outputs replace the earlier ones. Without a layout every run writes new random names, so a changed file is logged and skipped instead of leaving the outputs of both versions behind.
+    """
+
+    def __init__(self, augmentor, processExisting: bool = False, **kwargs) -> None:
+        """
+        Initializes the watcher, the keyword arguments are the ones of Watcher
+
+        Keyword arguments:
+
+        augmentor (SimpleAugmentor) -- The augmentor
+
+        processExisting (bool) -- Augments the files the catalog has not seen before on the first poll, e.g. every file when the catalog has no index. Only files arriving afterwards are augmented otherwise
+
+        Return: None
+        """
+
+        super().__init__(augmentor, **kwargs)
+
+        if augmentor.archive is not None:
+            raise ValueError("Only folders can be watched, not archives or videos")
+
+        self.catalog = augmentor.catalog
+        self.known = set(self.catalog.entries)
+        # files whose outputs exist, augmenting them again needs a layout
+        if processExisting:
+            self.pending.update(self.catalog.changed)
+            self.known.difference_update(self.catalog.changed)
+        elif self.catalog.indexPath is not None:
+            self.catalog.save()
+
+    def poll(self) -> list[str]:
+        self.catalog.refresh(save=False)
+        self.pending.update(self.catalog.changed)
+
+        now = time.time_ns()
+        ready = []
+        for path in list(self.pending):
+            entry = self.catalog.entries.get(path)
+            if entry is None:
+                self.pending.discard(path)
+                # removed before it settled
+            elif now - entry.mtimeNs >= self.settle * 1e9:
+                self.pending.discard(path)
+                if path in self.known and self.augmentor.layout is None:
+                    self.log(f"[WATCH SKIPPED] {path} changed but its earlier outputs can't be replaced without an OutputLayout")
+                else:
+                    ready.append(path)
+
+        return sorted(ready)
+
+    def onProcessed(self, images: list[str]) -> None:
+        self.known.update(images)
+
+        if self.catalog.indexPath is not None and not self.pending:
+            self.catalog.save()
+        # the index only moves forward once every file it lists was augmented, a restart picks up the rest
+
+
+class AnnotationWatcher(Watcher):
+    """
+    Watches the annotations file of a BoundingBoxAugmentor, the images it lists that were not augmented yet are picked up whenever the file changes
+    """
+
+    def __init__(self, augmentor, processExisting: bool = False, **kwargs) -> None:
+        """
+        Initializes the watcher, the keyword arguments are the ones of Watcher
+
+        Keyword arguments:
+
+        augmentor (BoundingBoxAugmentor) -- The augmentor
+
+        processExisting (bool) -- Augments the images the annotations file lists now on the first poll, only images added afterwards are augmented otherwise
+
+        Return: None
+        """
+
+        super().__init__(augmentor, **kwargs)
+
+        self.signature = None
+        self.seen: set[str] = set()
+        if not processExisting:
+            self.signature = self.stat()
+            self.seen.update(augmentor.targetImages)
+
+    def stat(self) -> Union[tuple[int, int], None]:
+        """
+        Size and modification time of the annotations file, None when it is missing
+        """
+
+        try:
+            stat = os.stat(self.augmentor.annotationsJsonPath)
+        except OSError:
+            return None
+
+        return stat.st_size, stat.st_mtime_ns
+
+    def poll(self) -> list[str]:
+        signature = self.stat()
+        if signature is not None and signature != self.signature and time.time_ns() - signature[1] >= self.settle * 1e9:
+            self.augmentor.__dict__.pop('annotationStore', None)
+            self.augmentor.__dict__.pop('data', None)
+            # the cached annotations are reopened, the store is rebuilt as the file changed
+
+            try:
+                images = self.augmentor.targetImages
+            except (OSError, ValueError) as e:
+                self.log(f"[WATCH ERROR] {self.augmentor.annotationsJsonPath} can't be read due to [ [ {e} ] ]")
+                return []
+                # a file that is still being written is read again at the next poll
+
+            self.signature = signature
+            self.pending.update(x for x in images if x not in self.seen)
+
+        ready = [x for x in self.pending if self.augmentor.archive is not None or os.path.isfile(x)]
+        # annotations may land before their images, those wait for them
+        self.pending.difference_update(ready)
+        self.seen.update(ready)
+
+        return sorted(ready)
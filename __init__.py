@@ -1,4 +1,6 @@
 import Filters
 from COCO import COCO
 from Composite import Composite
-from Batch import Batch, BoundingBoxBatch
\ No newline at end of file
+from Batch import Batch, BoundingBoxBatch
+from Catalog import Catalog
+from AsyncAugmentor import AsyncAugmentor
\ No newline at end of file
@@ -0,0 +1,133 @@
+import json
+import numpy as np
+import pytest
+from AnnotationStore import AnnotationStore
+
+
+def writeAnnotations(path, images, annotations, categories):
+    with open(path, 'w') as f:
+        json.dump({'images': images, 'annotations': annotations, 'categories': categories}, f)
+
+
+def test_integer_ids_round_trip(tmp_path):
+    path = tmp_path / "ann.json"
+    writeAnnotations(path, [
+        {'id': 7, 'file_name': 'images\\b.jpg', 'width': 10, 'height': 20},
+        {'id': 3, 'file_name': 'images/a.jpg', 'width': 30, 'height': 40},
+    ], [
+        {'id': 1, 'image_id': 3, 'category_id': 2, 'bbox': [1, 2, 3, 4]},
+        {'id': 2, 'image_id': 7, 'category_id': 1, 'bbox': [5, 6, 7, 8]},
+        {'id': 3, 'image_id': 3, 'category_id': 1, 'bbox': [9, 10, 11, 12]},
+        {'id': 4, 'image_id': 99, 'category_id': 1, 'bbox': [0, 0, 1, 1]},
+    ], [{'id': 1, 'name': 'x'}, {'id': 2, 'name': 'y'}])
+
+    store = AnnotationStore.open(str(path))
+    row = store.findRow('elsewhere/a.jpg')
+
+    assert store.imageId(row) == 3
+    boxes, categoryIds = store.boxes(row)
+    assert boxes.tolist() == [[1, 2, 3, 4], [9, 10, 11, 12]]
+    assert categoryIds == [2, 1]
+    assert store.imageId(store.findRow('b.jpg')) == 7
+    assert len(store) == 2
+
+
+def test_string_ids_round_trip(tmp_path):
+    path = tmp_path / "ann.json"
+    writeAnnotations(path, [
+        {'id': 'f3c2-0', 'file_name': 'out/f3c2-0.jpg', 'width': 8, 'height': 8},
+        {'id': 5, 'file_name': 'out/five.jpg', 'width': 8, 'height': 8},
+    ], [
+        {'id': 'f3c2-0_0', 'image_id': 'f3c2-0', 'category_id': 'cat', 'bbox': [1, 1, 2, 2]},
+        {'id': 'f3c2-0_1', 'image_id': 'f3c2-0', 'category_id': 4, 'bbox': [2, 2, 3, 3]},
+        {'id': 'x', 'image_id': 5, 'category_id': 'unlisted', 'bbox': [0, 0, 1, 1]},
+    ], [{'id': 'cat', 'name': 'cat'}, {'id': 4, 'name': 'dog'}])
+
+    store = AnnotationStore.open(str(path))
+
+    row = store.findRow('f3c2-0.jpg')
+    assert store.imageId(row) == 'f3c2-0'
+    assert store.boxes(row)[1] == ['cat', 4]
+    assert store.imageId(store.findRow('five.jpg')) == 5
+    assert store.boxes(store.findRow('five.jpg'))[1] == ['unlisted']
+    assert store.categories == [{'id': 'cat', 'name': 'cat'}, {'id': 4, 'name': 'dog'}]
+
+
+def test_store_is_reused_until_the_file_changes(tmp_path):
+    path = tmp_path / "ann.json"
+    writeAnnotations(path, [{'id': 1, 'file_name': 'a.jpg'}], [], [])
+
+    first = AnnotationStore.open(str(path))
+    assert AnnotationStore.open(str(path)).meta == first.meta
+
+    writeAnnotations(path, [{'id': 1, 'file_name': 'a.jpg'}, {'id': 2, 'file_name': 'b.jpg'}], [], [])
+    assert len(AnnotationStore.open(str(path))) == 2
+
+
+def test_augmented_output_loads_back(tmp_path):
+    import cv2
+    from Batch import BoundingBoxBatch
+    from Composite import Composite
+    from Filters.Flip import HorizontalFlip
+
+    imagePath = tmp_path / "a.jpg"
+    cv2.imwrite(str(imagePath), np.zeros((16, 16, 3), np.uint8))
+    source = tmp_path / "ann.json"
+    writeAnnotations(source, [{'id': 1, 'file_name': str(imagePath), 'width': 16, 'height': 16}], [
+        {'id': 1, 'image_id': 1, 'category_id': 1, 'bbox': [2, 2, 8, 8]},
+    ], [{'id': 1, 'name': 'x'}])
+
+    target = tmp_path / "out.json"
+    (tmp_path / "out").mkdir()
+    batch = BoundingBoxBatch([str(imagePath)], str(tmp_path / "out"), str(source), str(target), Composite([HorizontalFlip()], shouldApplyBBox=True, seed=0), (16, 16))
+    batch.augmentItem(str(imagePath), 2, print)
+    batch.flush(print)
+
+    store = AnnotationStore.open(str(target))
+    assert len(store) == 3
+    for row in range(len(store)):
+        assert isinstance(store.imageId(row), str)
+        assert store.boxes(row)[1] == [1]
+
+
+def test_same_file_names_in_different_folders(tmp_path):
+    path = tmp_path / "ann.json"
+    writeAnnotations(path, [
+        {'id': 1, 'file_name': 'train/a.jpg'},
+        {'id': 2, 'file_name': 'valid/a.jpg'},
+        {'id': 3, 'file_name': '.\\test\\b.jpg'},
+    ], [
+        {'id': 1, 'image_id': 1, 'category_id': 1, 'bbox': [1, 1, 1, 1]},
+        {'id': 2, 'image_id': 2, 'category_id': 1, 'bbox': [2, 2, 2, 2]},
+    ], [{'id': 1, 'name': 'x'}])
+
+    store = AnnotationStore.open(str(path))
+
+    assert store.imageId(store.findRow('train/a.jpg')) == 1
+    assert store.imageId(store.findRow('./valid/a.jpg')) == 2
+    assert store.boxes(store.findRow('valid\\a.jpg'))[0].tolist() == [[2, 2, 2, 2]]
+    assert store.imageId(store.findRow('test/b.jpg')) == 3
+    assert store.imageId(store.findRow('/data/b.jpg')) == 3
+
+    with pytest.raises(KeyError, match="several images"):
+        store.findRow('/data/a.jpg')
+    with pytest.raises(KeyError):
+        store.findRow('c.jpg')
+
+
+def test_file_is_parsed_once_without_ijson(tmp_path, monkeypatch):
+    import AnnotationStore as module
+
+    path = tmp_path / "ann.json"
+    writeAnnotations(path, [{'id': 1, 'file_name': 'a.jpg'}], [{'id': 1, 'image_id': 1, 'category_id': 1, 'bbox': [1, 2, 3, 4]}], [{'id': 1, 'name': 'x'}])
+
+    loads = []
+    load = json.load
+    monkeypatch.setattr(module, 'ijson', None)
+    monkeypatch.setattr(module.json, 'load', lambda f: loads.append(f.name) or load(f))
+
+    store = AnnotationStore.build(str(path), str(tmp_path / "store"))
+
+    assert loads.count(str(path)) == 1
+    assert store.boxes(store.findRow('a.jpg'))[0].tolist() == [[1, 2, 3, 4]]
+    assert store.categories == [{'id': 1, 'name': 'x'}]
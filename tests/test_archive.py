@@ -0,0 +1,78 @@
+import io
+import tarfile
+import zipfile
+import numpy as np
+import cv2
+import pytest
+from Archive import Archive
+
+
+def encode(value: int) -> bytes:
+    return cv2.imencode('.png', np.full((4, 4, 3), value, np.uint8))[1].tobytes()
+
+
+MEMBERS = {'images/a.png': 10, 'images/sub/b.png': 20, 'c.png': 30, 'other/a.png': 40}
+
+
+def makeZip(path) -> str:
+    with zipfile.ZipFile(path, 'w') as archive:
+        for name, value in MEMBERS.items():
+            archive.writestr(name, encode(value))
+        archive.writestr('notes.txt', b'not an image')
+
+    return str(path)
+
+
+def makeTar(path, mode: str) -> str:
+    with tarfile.open(path, mode) as archive:
+        for name, value in MEMBERS.items():
+            data = encode(value)
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+
+    return str(path)
+
+
+@pytest.fixture(params=['zip', 'tar', 'tar.gz'])
+def archive(request, tmp_path):
+    if request.param == 'zip':
+        return Archive(makeZip(tmp_path / "images.zip"))
+
+    return Archive(makeTar(tmp_path / f"images.{request.param}", 'w' if request.param == 'tar' else 'w:gz'))
+
+
+def test_members_in_archive_order(archive):
+    assert archive.members == list(MEMBERS)
+    assert 'notes.txt' not in archive
+
+
+def test_resolve_by_path(archive):
+    assert archive.resolve('images/sub/b.png') == 'images/sub/b.png'
+    assert archive.resolve('./images/sub/b.png') == 'images/sub/b.png'
+    assert archive.resolve('images\\sub\\b.png') == 'images/sub/b.png'
+
+
+def test_resolve_by_file_name(archive):
+    assert archive.resolve('somewhere/else/b.png') == 'images/sub/b.png'
+    assert archive.resolve('C:\\data\\c.png') == 'c.png'
+    # the first member in archive order wins when file names collide
+    assert archive.resolve('a.png') == 'images/a.png'
+    assert archive.resolve('other/a.png') == 'other/a.png'
+    assert archive.resolve('missing.png') is None
+
+
+def test_load_resolved_members(archive):
+    for fileName, value in (('images/a.png', 10), ('x/b.png', 20), ('other/a.png', 40)):
+        image = archive.load(archive.resolve(fileName))
+        assert image.shape == (4, 4, 3)
+        assert (image == value).all()
+
+    assert archive.load('missing.png') is None
+
+
+def test_ranges_are_contiguous(archive):
+    ranges = archive.ranges(3, ['c.png', 'images/a.png', 'other/a.png'])
+
+    assert ranges == [['images/a.png'], ['c.png'], ['other/a.png']]
+    assert sum(archive.ranges(3), []) == list(MEMBERS)
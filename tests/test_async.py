@@ -0,0 +1,90 @@
+import asyncio
+import os
+import numpy as np
+import cv2
+import pytest
+from AsyncAugmentor import AsyncAugmentor
+from Batch import Batch
+from Composite import Composite
+from Filters.Filter import Filter
+from Filters.Flip import HorizontalFlip, VerticalFlip
+from Filters.Rotate import Rotate
+
+
+class Broken(Filter):
+    """
+    A filter failing on every call
+    """
+
+    def forward(self, image):
+        raise KeyError("broken")
+
+
+def writeImages(folder, count: int) -> list[str]:
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = str(folder / f"{i}.png")
+        cv2.imwrite(path, np.random.default_rng(i).integers(0, 256, (16, 24, 3), dtype=np.uint8))
+        paths.append(path)
+
+    return paths
+
+
+def test_transform_round_trip():
+    image = np.random.default_rng(0).integers(0, 256, (16, 24, 3), dtype=np.uint8)
+    expected = Composite([HorizontalFlip(), Rotate()], seed=5).transform(image)['image']
+
+    async def main():
+        async with AsyncAugmentor(Composite([HorizontalFlip(), Rotate()], seed=5), maxConcurrency=1) as augmentor:
+            return await augmentor.transform(image)
+
+    assert np.array_equal(asyncio.run(main())['image'], expected)
+
+
+def test_samples_round_trip(tmp_path):
+    paths = writeImages(tmp_path, 3)
+
+    async def main():
+        async with AsyncAugmentor(Composite([HorizontalFlip(), VerticalFlip()]), maxConcurrency=2) as augmentor:
+            return [item async for item in augmentor.samples(paths, 4)]
+
+    samples = asyncio.run(main())
+
+    assert sorted(path for path, _ in samples) == sorted(paths * 4)
+    assert all(transformed['image'].shape == (16, 24, 3) for _, transformed in samples)
+
+
+def test_augment_batch_round_trip(tmp_path):
+    paths = writeImages(tmp_path / "src", 3)
+    os.makedirs(tmp_path / "out")
+    batch = Batch(paths, str(tmp_path / "out"), Composite([HorizontalFlip(), VerticalFlip()]), (8, 8))
+    errors = []
+
+    async def main():
+        async with AsyncAugmentor(maxConcurrency=2) as augmentor:
+            await augmentor.augmentBatch(batch, 2, errors.append)
+
+    asyncio.run(main())
+
+    assert errors == []
+    assert len(os.listdir(tmp_path / "out")) == 3 * (2 + 1)
+
+
+def test_failures_reach_the_caller(tmp_path):
+    paths = writeImages(tmp_path, 2)
+
+    async def transform():
+        async with AsyncAugmentor(Composite([Broken()])) as augmentor:
+            await augmentor.transform(np.zeros((4, 4, 3), np.uint8))
+
+    async def samples():
+        async with AsyncAugmentor(Composite([Broken()]), maxConcurrency=2) as augmentor:
+            async for _ in augmentor.samples(paths, 3):
+                pass
+
+    with pytest.raises(KeyError):
+        asyncio.run(transform())
+
+    with pytest.raises(KeyError):
+        asyncio.run(samples())
@@ -0,0 +1,83 @@
+import os
+import numpy as np
+import cv2
+from AutoTune import AutoTuner
+from Augmentors.MultiClassAugmentor import MultiClassAugmentor
+from Augmentors.SimpleAugmentor import SimpleAugmentor
+from Batch import Batch
+from Composite import Composite
+from DryRun import CostEstimator
+from Filters.Blur import Blur
+from Filters.Noise import Noise
+from Filters.Rotate import Rotate
+
+
+def makeComposite() -> Composite:
+    return Composite([Rotate(), Blur(), Noise()], seed=7)
+
+
+def makeImages() -> list[np.ndarray]:
+    return [np.random.default_rng(i).integers(0, 256, (32, 32, 3), dtype=np.uint8) for i in range(4)]
+
+
+def run(composite: Composite, images: list[np.ndarray]) -> list[np.ndarray]:
+    return [composite.transform(image)['image'].copy() for image in images for _ in range(3)]
+
+
+def writeImages(folder, count: int) -> list[str]:
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for i, image in enumerate(makeImages()[:1] * count):
+        path = str(folder / f"{i}.png")
+        cv2.imwrite(path, image)
+        paths.append(path)
+
+    return paths
+
+
+def test_benchmark_leaves_seeded_transforms_alone():
+    images = makeImages()
+    expected = run(makeComposite(), images)
+
+    composite = makeComposite()
+    AutoTuner(composite, (32, 32), cachePath=None).benchmark(images, 2, 1)
+
+    assert all(np.array_equal(a, b) for a, b in zip(run(composite, images), expected))
+
+
+def test_measure_leaves_seeded_transforms_alone(tmp_path):
+    images = makeImages()
+    expected = run(makeComposite(), images)
+
+    composite = makeComposite()
+    paths = writeImages(tmp_path / "src", 2)
+    CostEstimator().measure(paths, lambda folder, batch: Batch(batch, folder, composite, (32, 32)), 3, lambda _: None)
+
+    assert all(np.array_equal(a, b) for a, b in zip(run(composite, images), expected))
+
+
+def test_batch_size_for_groups():
+    assert AutoTuner.batchSizeFor([100], 4) == 25
+    assert AutoTuner.batchSizeFor([75, 10, 15], 4) == 38
+    assert AutoTuner.batchSizeFor([75, 10, 15], 2) == 75
+    # more groups than workers, every group is a single batch
+    assert AutoTuner.batchSizeFor([0, 8], 4) == 2
+
+
+def test_apply_divides_per_partition(tmp_path):
+    writeImages(tmp_path / "src", 100)
+    augmentor = SimpleAugmentor(str(tmp_path / "src"), str(tmp_path / "out"), makeComposite(), split=True, ratio=(0.75, 0.1, 0.15), seed=0)
+
+    AutoTuner.apply(augmentor, {'workers': 4, 'cvThreads': 1})
+
+    assert augmentor.batchSize == 38
+
+
+def test_apply_divides_per_class(tmp_path):
+    writeImages(tmp_path / "src" / "a", 60)
+    writeImages(tmp_path / "src" / "b", 20)
+    augmentor = MultiClassAugmentor(str(tmp_path / "src"), str(tmp_path / "out"), makeComposite(), split=False, seed=0)
+
+    AutoTuner.apply(augmentor, {'workers': 4, 'cvThreads': 1})
+
+    assert augmentor.batchSize == 20
@@ -0,0 +1,84 @@
+import json
+import os
+import numpy as np
+import cv2
+import pytest
+import Catalog as module
+from Catalog import Catalog, probeImageSize
+
+
+def writeImage(path, width: int, height: int, params: list = None) -> str:
+    image = np.random.default_rng(width * height).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    assert cv2.imwrite(str(path), image, params or [])
+    return str(path)
+
+
+@pytest.mark.parametrize("name, params", [
+    ("image.jpg", []),
+    ("image.png", []),
+    ("lossy.webp", [cv2.IMWRITE_WEBP_QUALITY, 80]),
+    ("lossless.webp", [cv2.IMWRITE_WEBP_QUALITY, 101]),
+])
+def test_dimensions_are_read_from_the_header(tmp_path, monkeypatch, name, params):
+    path = writeImage(tmp_path / name, 37, 21, params)
+
+    def decode(*_):
+        raise AssertionError("the image was decoded")
+
+    monkeypatch.setattr(cv2, 'imread', decode)
+    monkeypatch.setattr(cv2, 'imdecode', decode)
+
+    assert tuple(probeImageSize(path)) == (37, 21)
+
+
+def test_unknown_formats_are_not_probed(tmp_path):
+    path = tmp_path / "notes.jpg"
+    path.write_bytes(b"not an image")
+
+    assert probeImageSize(str(path)) is None
+    assert probeImageSize(str(tmp_path / "missing.png")) is None
+
+
+def test_index_is_persisted(tmp_path):
+    writeImage(tmp_path / "a.png", 10, 20)
+    writeImage(tmp_path / "b.jpg", 30, 40)
+    os.makedirs(tmp_path / "sub")
+    writeImage(tmp_path / "sub" / "c.png", 5, 5)
+    (tmp_path / "readme.txt").write_text("skipped")
+    indexPath = str(tmp_path / "index.json")
+
+    catalog = Catalog(str(tmp_path), recursive=True, indexPath=indexPath).refresh()
+
+    assert catalog.images == ['a.png', 'b.jpg', os.path.join('sub', 'c.png')]
+    assert catalog.totalPixels == 10 * 20 + 30 * 40 + 5 * 5
+    with open(indexPath) as f:
+        assert len(json.load(f)['entries']) == 3
+
+    loaded = Catalog(str(tmp_path), recursive=True, indexPath=indexPath)
+    assert loaded.entries == catalog.entries
+    assert loaded.pixels('b.jpg') == 30 * 40
+
+
+def test_refresh_only_probes_changes(tmp_path, monkeypatch):
+    writeImage(tmp_path / "a.png", 10, 20)
+    writeImage(tmp_path / "b.png", 30, 40)
+    indexPath = str(tmp_path / "index.json")
+    Catalog(str(tmp_path), indexPath=indexPath).refresh()
+
+    probed = []
+    probe = module.probeImageSize
+    monkeypatch.setattr(module, 'probeImageSize', lambda path: probed.append(os.path.basename(path)) or probe(path))
+
+    catalog = Catalog(str(tmp_path), indexPath=indexPath).refresh()
+    assert probed == []
+    assert catalog.changed == []
+
+    writeImage(tmp_path / "c.webp", 8, 6)
+    os.remove(tmp_path / "a.png")
+    catalog.refresh()
+
+    assert probed == ['c.webp']
+    assert catalog.changed == ['c.webp']
+    assert catalog.images == ['b.png', 'c.webp']
+    assert catalog.pixels('c.webp') == 48
+    assert Catalog(str(tmp_path), indexPath=indexPath).images == ['b.png', 'c.webp']
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from COCO import COCO
+from Composite import Composite
+from Filters.Blur import Blur
+from Filters.Flip import HorizontalFlip, VerticalFlip
+from Filters.Noise import Noise
+from Filters.Rotate import Rotate
+from Filters.Stack import Stack
+
+
+def makeFilters(shouldApplyBBox: bool) -> list:
+    if shouldApplyBBox:
+        return [HorizontalFlip(), VerticalFlip(), Rotate()]
+
+    return [HorizontalFlip(), Rotate(), Blur(), Noise(), Stack([Blur(), VerticalFlip()])]
+
+
+@pytest.mark.parametrize("shouldApplyBBox", [False, True])
+def test_compiled_matches_transform(shouldApplyBBox):
+    image = np.random.default_rng(0).integers(0, 256, (24, 32, 3), dtype=np.uint8)
+    bBoxes = [COCO.fromIterable([2, 3, 10, 8])] if shouldApplyBBox else None
+
+    composite = Composite(makeFilters(shouldApplyBBox), shouldApplyBBox, seed=11, avoidPreviousFilter=True)
+    expected = [composite.transform(image, bBoxes) for _ in range(40)]
+
+    compiled = Composite(makeFilters(shouldApplyBBox), shouldApplyBBox, seed=11, avoidPreviousFilter=True).compile()
+    for transformed in expected:
+        result, resultBoxes = compiled(image, bBoxes)
+
+        assert np.array_equal(result, transformed['image'])
+        if shouldApplyBBox:
+            assert [x.iterableFormat for x in resultBoxes] == [x.iterableFormat for x in transformed['bBox']]
+        else:
+            assert resultBoxes is None
+
+
+def test_compile_needs_filters():
+    with pytest.raises(ValueError):
+        Composite([]).compile()
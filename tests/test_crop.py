@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from COCO import COCO
+from Filters.Crop import RandomCrop, RandomResizedCrop
+
+
+def makeImage(width: int = 40, height: int = 30) -> np.ndarray:
+    return np.random.default_rng(0).integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+
+def boxes(*iterables) -> list[COCO]:
+    return [COCO.fromIterable(x) for x in iterables]
+
+
+def test_random_crop_output_size():
+    image = makeImage()
+    crop = RandomCrop((16, 12))
+    crop.setSeed(1)
+
+    for _ in range(20):
+        parameters = crop.sampleParameters(image.shape)
+        result = crop.forwardWithParameters(image, parameters)
+        x, y, width, height = parameters
+
+        assert result.shape == (12, 16, 3) == crop.outputShape(image.shape, parameters)
+        assert np.array_equal(result, image[y:y + height, x:x + width])
+
+
+def test_random_crop_is_clamped_to_small_images():
+    assert RandomCrop((64, 64)).forward(makeImage(20, 10)).shape == (10, 20, 3)
+
+
+def test_random_crop_clips_boxes():
+    image = makeImage()
+    crop = RandomCrop((16, 12))
+
+    result, resultBoxes = crop.forwardWithBBoxParameters(image, boxes([5, 5, 10, 10], [12, 8, 4, 4], [30, 25, 5, 5]), (10, 6, 16, 12))
+
+    assert result.shape == (12, 16, 3)
+    assert [x.iterableFormat for x in resultBoxes] == [(0, 0, 5, 9), (2, 2, 4, 4), (0, 0, 0, 0)]
+    # the last box is outside the crop, it keeps its place in the list
+
+
+def test_min_box_visibility_empties_boxes():
+    crop = RandomCrop((16, 12), minBoxVisibility=0.5)
+
+    _, resultBoxes = crop.forwardWithBBoxParameters(makeImage(), boxes([5, 5, 10, 10], [12, 8, 4, 4]), (10, 6, 16, 12))
+
+    assert [x.iterableFormat for x in resultBoxes] == [(0, 0, 0, 0), (2, 2, 4, 4)]
+    # 45 of the 100 pixels of the first box are left
+
+
+@pytest.mark.parametrize("size", [(16, 16), (24, 8)])
+def test_random_resized_crop_output_size(size):
+    image = makeImage()
+    crop = RandomResizedCrop(size, scale=(0.2, 0.9))
+    crop.setSeed(2)
+
+    for _ in range(20):
+        parameters = crop.sampleParameters(image.shape)
+        x, y, width, height = parameters
+
+        assert 0 <= x and x + width <= 40 and 0 <= y and y + height <= 30
+        assert crop.forwardWithParameters(image, parameters).shape == (size[1], size[0], 3) == crop.outputShape(image.shape, parameters)
+
+
+def test_random_resized_crop_scales_boxes():
+    crop = RandomResizedCrop((40, 24))
+
+    result, resultBoxes = crop.forwardWithBBoxParameters(makeImage(), boxes([12, 8, 4, 4], [5, 5, 10, 10], [0, 0, 5, 5]), (10, 6, 20, 12))
+
+    assert result.shape == (24, 40, 3)
+    assert [x.iterableFormat for x in resultBoxes] == [(4, 4, 8, 8), (0, 0, 10, 18), (0, 0, 0, 0)]
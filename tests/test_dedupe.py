@@ -0,0 +1,105 @@
+import json
+import os
+import numpy as np
+import cv2
+from Augmentors.BoundingBoxAugmentor import BoundingBoxAugmentor
+from Augmentors.SimpleAugmentor import SimpleAugmentor
+from Batch import Batch
+from Composite import Composite
+from Filters.Flip import HorizontalFlip, VerticalFlip
+
+
+def makeBatch(tmp_path, **kwargs) -> tuple[Batch, str]:
+    image = str(tmp_path / "image.png")
+    cv2.imwrite(image, np.arange(48, dtype=np.uint8).reshape(4, 4, 3))
+    os.makedirs(tmp_path / "out")
+
+    return Batch([image], str(tmp_path / "out"), Composite([HorizontalFlip(), VerticalFlip()], seed=1), (4, 4), **kwargs), image
+
+
+def outputs(tmp_path) -> int:
+    return len(os.listdir(tmp_path / "out"))
+
+
+def test_no_dedupe_by_default(tmp_path):
+    batch, image = makeBatch(tmp_path)
+    batch.augmentItem(image, 5, original=False)
+
+    assert not batch.dedupe
+    assert outputs(tmp_path) == 5
+
+
+def test_dedupe_logs_dropped_variations(tmp_path):
+    batch, image = makeBatch(tmp_path, dedupe=True)
+    logs = []
+    batch.augmentItem(image, 5, logs.append, original=False)
+
+    assert outputs(tmp_path) == 2
+    assert any(x.startswith("[DEDUPE] Dropped 3 of 5") for x in logs)
+
+
+def test_dedupe_spans_work_items(tmp_path):
+    batch, image = makeBatch(tmp_path, dedupe=True)
+    logs = []
+    for first in range(4):
+        batch.augmentItem(image, 1, logs.append, first, original=first == 0)
+
+    assert outputs(tmp_path) == 3
+    # the original and the two flips
+    assert sum(x.startswith("[DEDUPE]") for x in logs) == 2
+
+    batch.flush()
+    assert batch.seen == {}
+
+
+def writeImages(folder, count: int) -> list[str]:
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for i in range(count):
+        paths.append(str(folder / f"{i}.png"))
+        cv2.imwrite(paths[-1], np.full((4, 4, 3), i * 10, np.uint8))
+
+    return paths
+
+
+def countFiles(folder) -> int:
+    return sum(len(files) for _, _, files in os.walk(folder))
+
+
+def test_simple_augmentor_forwards_dedupe(tmp_path):
+    writeImages(tmp_path / "src", 3)
+    augmentor = SimpleAugmentor(str(tmp_path / "src"), str(tmp_path / "out"), Composite([HorizontalFlip(), VerticalFlip()], seed=1), split=False, seed=0, dedupe=True)
+
+    augmentor.scheduledAugment(5, workers=2, variationsPerItem=2)
+
+    assert countFiles(tmp_path / "out") == 3 * 3
+    # two flips and the original of every image, however the variations were split over the workers
+
+    for thread in augmentor.threadAugment(5):
+        thread.join()
+
+    assert countFiles(tmp_path / "out") == 2 * 3 * 3
+
+
+def test_bounding_box_augmentor_forwards_dedupe(tmp_path):
+    images = writeImages(tmp_path / "src", 2)
+    source = tmp_path / "ann.json"
+    with open(source, 'w') as f:
+        json.dump({'images': [{'id': i, 'file_name': x, 'width': 4, 'height': 4} for i, x in enumerate(images)], 'annotations': [
+            {'id': i, 'image_id': i, 'category_id': 1, 'bbox': [0, 0, 2, 1]} for i in range(2)
+        ], 'categories': [{'id': 1, 'name': 'x'}]}, f)
+
+    os.makedirs(tmp_path / "json")
+    target = tmp_path / "json" / "out.json"
+    # unifyTemps merges every json next to the target
+    augmentor = BoundingBoxAugmentor(str(source), str(tmp_path / "out"), str(target), Composite([HorizontalFlip(), VerticalFlip()], shouldApplyBBox=True, seed=1), split=False, seed=0, imageDim=(4, 4), dedupe=True)
+
+    augmentor.scheduledAugment(5, workers=2)
+    augmentor.unifyTemps()
+
+    with open(target) as f:
+        data = json.load(f)
+
+    assert countFiles(tmp_path / "out") == 2 * 3
+    assert len(data['images']) == 2 * 3
+    assert sorted(tuple(x['bbox']) for x in data['annotations']) == sorted([(0, 0, 2, 1)] * 2 + [(0, 3, 2, 1)] * 2 + [(2, 0, 2, 1)] * 2)
@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+import numpy as np
+import cv2
+import pytest
+from Batch import Batch
+from Composite import Composite
+from Filters.Filter import Filter
+from Guardrails import Guardrails
+from MemoryBudget import MemoryBudget
+from Scheduler import Scheduler
+
+
+class Hang(Filter):
+    """
+    A filter stuck in a single call
+    """
+
+    def __init__(self, seconds: float, release: threading.Event) -> None:
+        super().__init__()
+        self.seconds = seconds
+        self.release = release
+        self.threads = []
+
+    def forward(self, image):
+        self.threads.append(threading.current_thread())
+        self.release.wait(self.seconds)
+        return image
+
+
+def makeBatch(tmp_path, filters, guardrails) -> tuple[Batch, str]:
+    image = str(tmp_path / "image.png")
+    cv2.imwrite(image, np.zeros((4, 4, 3), np.uint8))
+    os.makedirs(tmp_path / "out", exist_ok=True)
+
+    return Batch([image], str(tmp_path / "out"), Composite(filters), (4, 4), guardrails=guardrails), image
+
+
+def test_watchdog_abandons_a_stuck_item(tmp_path):
+    release = threading.Event()
+    guardrails = Guardrails(deadline=0.2)
+    hang = Hang(30, release)
+    batch, image = makeBatch(tmp_path, [hang], guardrails)
+
+    start = time.perf_counter()
+    stats = Scheduler(1).run([batch], 3, lambda _: None)
+    seconds = time.perf_counter() - start
+
+    try:
+        assert seconds < 5
+        assert stats['items'] == 1
+        assert guardrails.summary()['reasons'] == {'deadline': 1}
+        assert guardrails.summary()['images'][0]['detail']['abandoned']
+    finally:
+        release.set()
+
+    for thread in hang.threads:
+        thread.join(5)
+
+    assert guardrails.summary()['quarantined'] == 1
+    # the abandoned item stops at its next check without quarantining the image again
+    assert len(os.listdir(tmp_path / "out")) <= 1
+
+
+def test_items_within_the_deadline_finish(tmp_path):
+    guardrails = Guardrails(deadline=5)
+    batch, image = makeBatch(tmp_path, [Hang(0, threading.Event())], guardrails)
+
+    assert guardrails.watch(image, lambda: batch.augmentItem(image, 3, lambda _: None))
+    assert guardrails.summary()['quarantined'] == 0
+    assert len(os.listdir(tmp_path / "out")) == 4
+
+
+def test_watch_raises_errors_of_the_work():
+    def fail():
+        raise KeyError("broken")
+
+    with pytest.raises(KeyError):
+        Guardrails(deadline=5).watch("image.png", fail)
+
+
+def test_watch_runs_inline_without_deadline():
+    threads = []
+    assert Guardrails(maxPixels=10).watch("image.png", lambda: threads.append(threading.current_thread()))
+
+    assert threads == [threading.current_thread()]
+
+
+def test_items_of_a_worker_share_one_thread():
+    guardrails = Guardrails(deadline=5)
+    threads = []
+
+    for _ in range(3):
+        assert guardrails.watch("image.png", lambda: threads.append(threading.current_thread()))
+
+    assert len(set(threads)) == 1
+    assert threads[0] is not threading.current_thread()
+
+
+def test_abandoned_item_releases_its_budget(tmp_path):
+    release = threading.Event()
+    guardrails = Guardrails(deadline=0.2)
+    hang = Hang(30, release)
+    batch, image = makeBatch(tmp_path, [hang], guardrails)
+    batch.memoryBudget = MemoryBudget(10 ** 9)
+
+    try:
+        assert not guardrails.watch(image, lambda: batch.augmentItem(image, 3, lambda _: None))
+        assert batch.memoryBudget.inUse == 0
+
+        threads = []
+        assert guardrails.watch(image, lambda: threads.append(threading.current_thread()))
+        assert hang.threads[0].is_alive()
+        assert threads[0] is not hang.threads[0]
+        # the worker got a new thread while the abandoned one is still stuck
+    finally:
+        release.set()
+
+    hang.threads[0].join(5)
+    assert not hang.threads[0].is_alive()
+    assert batch.memoryBudget.inUse == 0
@@ -0,0 +1,28 @@
+import os
+import subprocess
+import sys
+from LazyImport import importTime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BUDGETS = {
+    'Filters': 0.05,
+    'Composite': 0.5,
+}
+# seconds, Composite pays for numpy, neither may pay for cv2
+
+
+def test_filters_and_composite_do_not_import_cv2():
+    code = "import sys, Filters, Composite; from Filters import HorizontalFlip, Rotate; print(sorted(x for x in ('cv2', 'progress') if x in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == "[]"
+
+
+def test_import_time_stays_under_budget(monkeypatch):
+    monkeypatch.chdir(ROOT)
+
+    for module, budget in BUDGETS.items():
+        seconds = min(importTime(module) for _ in range(3))
+        # the best of a few runs, the first one may be slowed down by a cold disk cache
+        assert seconds < budget, f"importing {module} took {seconds:.3f}s, the budget is {budget}s"
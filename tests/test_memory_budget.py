@@ -0,0 +1,104 @@
+import threading
+import pytest
+from MemoryBudget import MemoryBudget, estimateMemory
+
+
+def admitInThread(budget: MemoryBudget, cost: int, admitted: threading.Event, leave: threading.Event) -> threading.Thread:
+    def hold():
+        with budget.admit(cost):
+            admitted.set()
+            leave.wait(5)
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    return thread
+
+
+def test_admission_blocks_over_budget():
+    budget = MemoryBudget(100)
+    firstIn, firstOut = threading.Event(), threading.Event()
+    secondIn, secondOut = threading.Event(), threading.Event()
+
+    first = admitInThread(budget, 70, firstIn, firstOut)
+    assert firstIn.wait(5)
+
+    second = admitInThread(budget, 50, secondIn, secondOut)
+    assert not secondIn.wait(0.2)
+    # 70 + 50 is over the budget
+
+    firstOut.set()
+    assert secondIn.wait(5)
+    secondOut.set()
+    first.join(5)
+    second.join(5)
+
+    report = budget.report()
+    assert report['admitted'] == 2
+    assert report['throttled'] == 1
+    assert report['peakEstimated'] == 70
+    assert budget.inUse == 0
+
+
+def test_items_that_fit_are_admitted_together():
+    budget = MemoryBudget(100)
+    events = [(threading.Event(), threading.Event()) for _ in range(2)]
+    threads = [admitInThread(budget, 40, admitted, leave) for admitted, leave in events]
+
+    assert all(admitted.wait(5) for admitted, _ in events)
+    assert budget.inUse == 80
+
+    for thread, (_, leave) in zip(threads, events):
+        leave.set()
+        thread.join(5)
+
+    assert budget.report()['throttled'] == 0
+
+
+def test_oversized_item_is_admitted_alone():
+    budget = MemoryBudget(100)
+    smallIn, smallOut = threading.Event(), threading.Event()
+    largeIn, largeOut = threading.Event(), threading.Event()
+    afterIn, afterOut = threading.Event(), threading.Event()
+
+    small = admitInThread(budget, 10, smallIn, smallOut)
+    assert smallIn.wait(5)
+
+    large = admitInThread(budget, 500, largeIn, largeOut)
+    assert not largeIn.wait(0.2)
+    # waits for the budget to empty
+
+    smallOut.set()
+    assert largeIn.wait(5)
+    assert budget.inUse == 500
+
+    after = admitInThread(budget, 10, afterIn, afterOut)
+    assert not afterIn.wait(0.2)
+    # nothing joins the oversized item
+
+    largeOut.set()
+    assert afterIn.wait(5)
+    afterOut.set()
+    for thread in (small, large, after):
+        thread.join(5)
+
+    assert budget.report()['peakEstimated'] == 500
+    assert budget.inUse == 0
+
+
+def test_release_is_idempotent():
+    budget = MemoryBudget(100)
+
+    with budget.admit(60) as release:
+        release()
+        release()
+        assert budget.inUse == 0
+
+    assert budget.inUse == 0
+
+
+def test_estimate():
+    assert estimateMemory((10, 10), 1.0, (4, 4)) == 300 * 2 + 2 * 48
+    assert MemoryBudget(100).estimate((10, 10), 0.5) == int(300 * 1.5 + 2 * 300)
+
+    with pytest.raises(ValueError):
+        MemoryBudget(0)
@@ -0,0 +1,67 @@
+import os
+import numpy as np
+import cv2
+import pytest
+from Augmentors.MultiClassAugmentor import MultiClassAugmentor
+from Composite import Composite
+from Filters.Flip import HorizontalFlip
+
+
+def makeAugmentor(root, counts: dict[str, int], **kwargs) -> MultiClassAugmentor:
+    image = np.zeros((4, 4, 3), dtype=np.uint8)
+    os.makedirs(root, exist_ok=True)
+    for _cls, count in counts.items():
+        os.makedirs(root / _cls, exist_ok=True)
+        for i in range(count):
+            cv2.imwrite(str(root / _cls / f"{i}.png"), image)
+
+    return MultiClassAugmentor(str(root), str(root.parent / "out"), Composite([HorizontalFlip()]), seed=0, **kwargs)
+
+
+def test_deficits_fill_up_to_target(tmp_path):
+    augmentor = makeAugmentor(tmp_path / "src", {}, targetPerClass=10)
+
+    assert augmentor.classDeficits({'a': 3, 'b': 10, 'c': 12}) == {'a': 7, 'b': 0, 'c': 0}
+
+
+def test_budget_levels_smallest_classes_first(tmp_path):
+    augmentor = makeAugmentor(tmp_path / "src", {}, budget=5)
+
+    assert augmentor.classDeficits({'a': 1, 'b': 4, 'c': 10}) == {'a': 4, 'b': 1, 'c': 0}
+
+
+def test_budget_remainder_goes_to_smallest_class(tmp_path):
+    augmentor = makeAugmentor(tmp_path / "src", {}, budget=4)
+
+    deficits = augmentor.classDeficits({'a': 1, 'b': 4})
+
+    assert deficits == {'a': 4, 'b': 0}
+    assert sum(deficits.values()) == 4
+
+
+def test_budget_never_pushes_past_target(tmp_path):
+    augmentor = makeAugmentor(tmp_path / "src", {}, targetPerClass=3, budget=100)
+
+    assert augmentor.classDeficits({'a': 1, 'b': 5}) == {'a': 2, 'b': 0}
+
+
+def test_variation_plan_spreads_deficit_over_images(tmp_path):
+    augmentor = makeAugmentor(tmp_path / "src", {'a': 3, 'b': 8}, targetPerClass=10)
+
+    plan = augmentor.variationPlan()
+    classA = [v for k, v in plan.items() if os.path.basename(os.path.dirname(k)) == 'a']
+    classB = [v for k, v in plan.items() if os.path.basename(os.path.dirname(k)) == 'b']
+
+    assert (sum(classA), sum(classB)) == (7, 2)
+    assert max(classA) - min(classA) <= 1
+
+
+def test_max_variations_caps_every_image(tmp_path):
+    augmentor = makeAugmentor(tmp_path / "src", {'a': 1, 'b': 8}, targetPerClass=10, maxVariations=4)
+
+    assert max(augmentor.variationPlan().values()) == 4
+
+
+def test_negative_budget_raises(tmp_path):
+    with pytest.raises(ValueError):
+        makeAugmentor(tmp_path / "src", {}, budget=-1)
@@ -0,0 +1,43 @@
+import json
+import os
+import numpy as np
+import cv2
+from OutputLayout import OutputLayout
+from Batch import BoundingBoxBatch
+from Composite import Composite
+from Filters.Flip import HorizontalFlip
+
+
+def test_ids_and_paths_are_deterministic(tmp_path):
+    layout = OutputLayout(levels=2, width=2)
+
+    imageID, path = layout.path(str(tmp_path), "a.jpg#3")
+
+    assert layout.path(str(tmp_path), "a.jpg#3") == (imageID, path)
+    assert layout.imageID("a.jpg#3", True) == f"original_{imageID}"
+    assert path == os.path.join(str(tmp_path), imageID[:2], imageID[2:4], imageID + ".jpg")
+    assert os.path.isdir(os.path.dirname(path))
+
+
+def test_rerun_replaces_annotation_entries(tmp_path):
+    imagePath = str(tmp_path / "a.jpg")
+    cv2.imwrite(imagePath, np.zeros((16, 16, 3), np.uint8))
+    source = tmp_path / "ann.json"
+    with open(source, 'w') as f:
+        json.dump({'images': [{'id': 1, 'file_name': imagePath, 'width': 16, 'height': 16}], 'annotations': [
+            {'id': 1, 'image_id': 1, 'category_id': 1, 'bbox': [2, 2, 8, 8]},
+            {'id': 2, 'image_id': 1, 'category_id': 1, 'bbox': [1, 1, 4, 4]},
+        ], 'categories': [{'id': 1, 'name': 'x'}]}, f)
+
+    target = tmp_path / "out.json"
+    for _ in range(2):
+        batch = BoundingBoxBatch([imagePath], str(tmp_path / "out"), str(source), str(target), Composite([HorizontalFlip()], shouldApplyBBox=True, seed=0), (16, 16), layout=OutputLayout())
+        batch.augment(3, print)
+
+    with open(target) as f:
+        data = json.load(f)
+
+    assert len(data['images']) == 4
+    assert len({x['id'] for x in data['images']}) == 4
+    assert len(data['annotations']) == 8
+    assert sum(len(files) for _, _, files in os.walk(tmp_path / "out")) == 4
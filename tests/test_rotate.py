@@ -0,0 +1,43 @@
+import numpy as np
+from Filters.Rotate import RemapCache, Rotate
+
+
+def mapBytes(width: int, height: int) -> int:
+    maps = RemapCache.buildMaps(np.eye(2, 3, dtype=np.float64), (width, height))
+    return maps[0].nbytes + maps[1].nbytes
+
+
+def test_cache_evicts_least_recently_used():
+    size = mapBytes(8, 8)
+    cache = RemapCache(size * 2)
+    M = np.eye(2, 3, dtype=np.float64)
+
+    cache.get('a', M, (8, 8))
+    cache.get('b', M, (8, 8))
+    cache.get('a', M, (8, 8))
+    cache.get('c', M, (8, 8))
+
+    assert list(cache.maps) == ['a', 'c']
+    assert cache.currentBytes == size * 2
+
+
+def test_map_over_budget_is_not_stored():
+    cache = RemapCache(mapBytes(8, 8) - 1)
+
+    cache.get('a', np.eye(2, 3, dtype=np.float64), (8, 8))
+
+    assert len(cache.maps) == 0
+    assert cache.currentBytes == 0
+
+
+def test_cached_rotation_matches_warp_affine():
+    ys, xs = np.mgrid[0:32, 0:48]
+    image = np.dstack([xs * 5, ys * 7, xs + ys]).astype(np.uint8)
+    # a smooth image, the fixed point maps round sub pixel positions slightly differently than warpAffine
+    cached = Rotate(cacheBytes=1 << 20)
+    uncached = Rotate(cacheBytes=0)
+
+    for angle in (-20, 0, 13):
+        a = cached.rotateImage(image, angle)
+        b = uncached.rotateImage(image, angle)
+        assert np.abs(a.astype(int) - b.astype(int)).mean() < 0.5
@@ -0,0 +1,87 @@
+import threading
+import numpy as np
+import cv2
+import pytest
+from Scheduler import Scheduler
+
+
+class RecordingBatch:
+    """
+    Stands in for a Batch, records the work items it is given
+    """
+
+    def __init__(self, targetImages: list[str]) -> None:
+        self.targetImages = targetImages
+        self.calls: list[tuple[str, int, int, bool]] = []
+        self.flushed = 0
+        self.lock = threading.Lock()
+
+    def augmentItem(self, image, variations, log, first, original):
+        with self.lock:
+            self.calls.append((image, variations, first, original))
+
+    def watchItem(self, image, variations, log, first, original):
+        self.augmentItem(image, variations, log, first, original)
+
+    def flush(self, log):
+        self.flushed += 1
+
+
+def writeImage(path, width: int, height: int) -> str:
+    cv2.imwrite(str(path), np.zeros((height, width, 3), np.uint8))
+    return str(path)
+
+
+def test_items_split_variations(tmp_path):
+    image = writeImage(tmp_path / "a.png", 4, 4)
+    items = Scheduler(2, variationsPerItem=4).items([RecordingBatch([image])], 10)
+
+    assert sorted((x.first, x.count, x.original) for x in items) == [(0, 4, True), (4, 4, False), (8, 2, False)]
+    assert sorted(x.cost for x in items) == [2 * 16, 4 * 16, 5 * 16]
+    # the first item also saves the original
+
+
+def test_items_keep_images_whole_by_default(tmp_path):
+    image = writeImage(tmp_path / "a.png", 4, 4)
+    items = Scheduler(2).items([RecordingBatch([image])], {image: 7})
+
+    assert [(x.first, x.count, x.original) for x in items] == [(0, 7, True)]
+
+
+def test_images_without_variations_still_save_the_original(tmp_path):
+    image = writeImage(tmp_path / "a.png", 4, 4)
+    items = Scheduler(2, variationsPerItem=3).items([RecordingBatch([image])], {})
+
+    assert [(x.first, x.count, x.original) for x in items] == [(0, 0, True)]
+
+
+def test_items_are_ordered_largest_first(tmp_path):
+    small = writeImage(tmp_path / "small.png", 4, 4)
+    large = writeImage(tmp_path / "large.png", 32, 32)
+    medium = writeImage(tmp_path / "medium.png", 16, 8)
+    batches = [RecordingBatch([small, medium]), RecordingBatch([large, "missing.png"])]
+
+    items = Scheduler(2).items(batches, {small: 3, medium: 1, large: 1, "missing.png": 5})
+
+    assert [x.image for x in items] == [large, medium, small, "missing.png"]
+    assert [x.cost for x in items] == [2 * 1024, 2 * 128, 4 * 16, 6]
+
+
+def test_run_covers_every_variation_once(tmp_path):
+    images = [writeImage(tmp_path / f"{i}.png", 4 * (i + 1), 4) for i in range(5)]
+    batches = [RecordingBatch(images[:3]), RecordingBatch(images[3:])]
+
+    stats = Scheduler(3, variationsPerItem=2).run(batches, 5, lambda _: None)
+
+    assert stats['items'] == 15
+    for batch in batches:
+        assert batch.flushed == 1
+        for image in batch.targetImages:
+            calls = [x for x in batch.calls if x[0] == image]
+            assert sorted(v for _, count, first, _ in calls for v in range(first, first + count)) == list(range(5))
+            assert sum(original for *_, original in calls) == 1
+
+
+def test_variations_per_item_is_validated():
+    with pytest.raises(ValueError):
+        Scheduler(2, variationsPerItem=0)
@@ -0,0 +1,84 @@
+import os
+import subprocess
+import sys
+import numpy as np
+import cv2
+import pytest
+from multiprocessing import AuthenticationError
+from Service import AugmentationServer, AugmentationClient
+from Composite import Composite
+from Filters.Flip import HorizontalFlip
+from COCO import COCO
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def server():
+    with AugmentationServer({'flip': Composite([HorizontalFlip()], seed=0), 'flipBoxes': Composite([HorizontalFlip()], shouldApplyBBox=True, seed=0)}, maxLatency=0.001) as server:
+        yield server
+
+
+def test_server_generates_an_authkey(server):
+    assert isinstance(server.authkey, bytes) and len(server.authkey) == 32
+
+    with pytest.raises(AuthenticationError):
+        AugmentationClient(server.address, b"wrong")
+
+
+def test_loopback_client_transforms_arrays_and_paths(server, tmp_path):
+    image = np.random.default_rng(0).integers(0, 255, (12, 20, 3), dtype=np.uint8)
+    path = str(tmp_path / "a.png")
+    cv2.imwrite(path, image)
+
+    with AugmentationClient(server.address, server.authkey) as client:
+        assert np.array_equal(client.transform('flip', image)['image'], image[::-1])
+        assert np.array_equal(client.transform('flip', path)['image'], image[::-1])
+
+        out = str(tmp_path / "out.png")
+        assert 'image' not in client.transform('flip', path, outPath=out)
+        assert np.array_equal(cv2.imread(out), image[::-1])
+
+        result = client.transform('flipBoxes', image, [COCO.fromIterable([2, 3, 4, 5])])
+        assert [x.iterableFormat for x in result['bBox']] == [(2, 4, 4, 5)]
+
+        stats = client.stats()
+        assert stats['completed'] == 4
+
+
+def test_errors_are_raised_on_the_client(server):
+    with AugmentationClient(server.address, server.authkey) as client:
+        with pytest.raises(RuntimeError, match="No pipeline"):
+            client.transform('missing', np.zeros((2, 2, 3), np.uint8))
+
+
+def test_images_pass_through_the_client_ring(server):
+    with AugmentationClient(server.address, server.authkey) as client:
+        small = np.ones((4, 4, 3), np.uint8)
+        assert np.array_equal(client.transform('flip', small)['image'], small)
+        firstRing = client.ring.name
+
+        large = np.random.default_rng(1).integers(0, 255, (64, 64, 3), dtype=np.uint8)
+        assert np.array_equal(client.transform('flip', large)['image'], large[::-1])
+        assert client.ring.name != firstRing
+        assert client.ring.slotBytes >= large.nbytes
+
+        frame = client.ring.put([large])
+        client.ring.release(frame)
+        # the slot was given back after every request
+
+
+def test_client_in_another_process(server, tmp_path):
+    code = f"""
+import sys
+sys.path.insert(0, {ROOT!r})
+import numpy as np
+from Service import AugmentationClient
+with AugmentationClient({server.address!r}, bytes.fromhex({server.authkey.hex()!r})) as client:
+    image = np.arange(6 * 5 * 3, dtype=np.uint8).reshape(6, 5, 3)
+    print(np.array_equal(client.transform('flip', image)['image'], image[::-1]))
+"""
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, timeout=60)
+
+    assert result.stdout.strip() == "True", result.stderr
+    assert "leaked" not in result.stderr
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from SharedRing import SharedRing, RingFrame, boxArray, boxesFromArray
+from COCO import COCO
+
+
+def test_put_get_release_round_trip():
+    image = np.arange(2 * 3 * 3, dtype=np.uint8).reshape(2, 3, 3)
+    boxes = boxArray([COCO.fromIterable([1, 2, 3, 4])])
+
+    with SharedRing(2, 1024) as ring:
+        frame = ring.put([image, boxes])
+        viewImage, viewBoxes = ring.get(frame)
+
+        assert np.array_equal(viewImage, image)
+        assert [x.iterableFormat for x in boxesFromArray(viewBoxes)] == [(1, 2, 3, 4)]
+        assert all(offset % 64 == 0 for _, _, offset in frame.arrays)
+
+        ring.release(frame)
+        with pytest.raises(ValueError):
+            ring.release(frame)
+
+
+def test_full_ring_times_out():
+    with SharedRing(1, 64) as ring:
+        ring.put([np.zeros(8, np.uint8)])
+
+        with pytest.raises(TimeoutError):
+            ring.put([np.zeros(8, np.uint8)], timeout=0.01)
+
+
+def test_oversized_frame_is_rejected_before_taking_a_slot():
+    with SharedRing(1, 64) as ring:
+        with pytest.raises(ValueError):
+            ring.put([np.zeros(65, np.uint8)])
+
+        ring.release(ring.put([np.zeros(64, np.uint8)], timeout=0.01))
+
+
+def test_attached_ring_answers_in_the_same_slot():
+    with SharedRing(2, 256) as ring:
+        frame = ring.put([np.ones((4, 4), np.uint8)])
+
+        attached = SharedRing.attach(ring.name, ring.slots, ring.slotBytes, ring.ownerPid)
+        request = attached.get(RingFrame(*tuple(frame)))[0]
+        answer = attached.write(frame.slot, [request.T * 3])
+        attached.close()
+
+        assert np.array_equal(ring.get(answer)[0], np.full((4, 4), 3, np.uint8))
+        ring.release(answer)
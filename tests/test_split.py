@@ -0,0 +1,66 @@
+import os
+import numpy as np
+import cv2
+import pytest
+from Augmentors.SimpleAugmentor import SimpleAugmentor
+from Composite import Composite
+from Filters.Flip import HorizontalFlip
+from Split import HashSplitter
+
+
+def names(count: int, start: int = 0) -> list[str]:
+    return [f"images/{i:05d}.png" for i in range(start, count)]
+
+
+def test_assignment_is_stable_as_the_dataset_grows():
+    splitter = HashSplitter((0.75, 0.1, 0.15), salt=3)
+    small = splitter.partition(names(1000))
+    large = splitter.partition(reversed(names(5000)))
+
+    for name in splitter.partitions:
+        assert set(small[name]) <= set(large[name])
+    # the new images never move the old ones, whatever order they come in
+
+    assert HashSplitter((0.75, 0.1, 0.15), salt=3).partition(names(1000)) == small
+
+
+def test_ratios_are_approximated():
+    partitions = HashSplitter((0.75, 0.1, 0.15)).partition(names(20000))
+
+    assert list(partitions) == ['train', 'valid', 'test']
+    for name, ratio in (('train', 0.75), ('valid', 0.15), ('test', 0.1)):
+        assert len(partitions[name]) / 20000 == pytest.approx(ratio, abs=0.02)
+
+
+def test_salt_changes_the_split():
+    images = names(1000)
+
+    assert HashSplitter((0.5, 0.5), salt=1).partition(images) != HashSplitter((0.5, 0.5), salt=2).partition(images)
+
+
+def test_groups_match_the_partition():
+    splitter = HashSplitter((0.75, 0.25))
+    images = names(103)
+    groups = list(splitter.groups(iter(images), 10))
+
+    assert all(len(group) <= 10 for _, group in groups)
+    for name, members in splitter.partition(images).items():
+        assert sum((group for partition, group in groups if partition == name), []) == members
+
+
+def test_augmentor_split_is_stable_as_images_are_added(tmp_path):
+    source = tmp_path / "src"
+    os.makedirs(source)
+    image = np.zeros((4, 4, 3), np.uint8)
+
+    def write(start: int, end: int) -> dict[str, list[str]]:
+        for i in range(start, end):
+            cv2.imwrite(str(source / f"{i:03d}.png"), image)
+        augmentor = SimpleAugmentor(str(source), str(tmp_path / "out"), Composite([HorizontalFlip()]), ratio=(0.75, 0.1, 0.15), seed=5, hashSplit=True)
+        return {name: {os.path.basename(x) for x in images} for name, images in augmentor.partition().items()}
+
+    before = write(0, 40)
+    after = write(40, 120)
+
+    for name, images in before.items():
+        assert images <= after[name]
@@ -0,0 +1,73 @@
+import threading
+import numpy as np
+from COCO import COCO
+from Filters.Blur import Blur
+from Filters.BrightnessContrast import Brightness, Contrast
+from Filters.BufferPool import BufferPool
+from Filters.Flip import HorizontalFlip, VerticalFlip
+from Filters.Noise import Noise
+from Filters.Rotate import Rotate
+from Filters.Stack import Stack
+
+
+def makeStack(inPlace: bool, pool: BufferPool = None) -> Stack:
+    stack = Stack([HorizontalFlip(), Brightness(), Blur(), Noise(), Rotate(), Contrast(), VerticalFlip()], inPlace, pool)
+    stack.setSeed(3)
+    return stack
+
+
+def makeImage() -> np.ndarray:
+    return np.random.default_rng(0).integers(0, 256, (24, 32, 3), dtype=np.uint8)
+
+
+def test_in_place_matches_allocating():
+    image = makeImage()
+    allocating = makeStack(False)
+    inPlace = makeStack(True, BufferPool())
+
+    for _ in range(10):
+        assert np.array_equal(inPlace.forward(image), allocating.forward(image))
+
+    assert np.array_equal(image, makeImage())
+    # the source image is never written to
+
+
+def test_in_place_matches_allocating_with_boxes():
+    image = makeImage()
+    bBoxes = [COCO.fromIterable([2, 3, 10, 8])]
+    allocating = makeStack(False)
+    inPlace = makeStack(True, BufferPool())
+
+    for _ in range(10):
+        result, resultBoxes = inPlace.forwardWithBBox(image, bBoxes)
+        expected, expectedBoxes = allocating.forwardWithBBox(image, bBoxes)
+
+        assert np.array_equal(result, expected)
+        assert [x.iterableFormat for x in resultBoxes] == [x.iterableFormat for x in expectedBoxes]
+
+
+def test_buffers_are_reused_across_calls():
+    image = makeImage()
+    pool = BufferPool()
+    stack = Stack([HorizontalFlip(), Brightness(), VerticalFlip()], True, pool)
+
+    first = stack.forward(image)
+    buffers = pool.pair(image.shape, image.dtype)
+    size = pool.currentBytes
+    second = stack.forward(image)
+
+    assert any(second is x for x in buffers)
+    assert any(first is x for x in buffers)
+    assert all(a is b for a, b in zip(pool.pair(image.shape, image.dtype), buffers))
+    assert len(pool.pairs) == 1
+    assert pool.currentBytes == size
+
+
+def test_local_pool_belongs_to_the_thread():
+    pools = []
+    thread = threading.Thread(target=lambda: pools.append(BufferPool.local()))
+    thread.start()
+    thread.join()
+
+    assert BufferPool.local() is BufferPool.local()
+    assert pools[0] is not BufferPool.local()
@@ -0,0 +1,131 @@
+import json
+import numpy as np
+import cv2
+import pytest
+from Batch import BoundingBoxBatch
+from Composite import Composite
+from Filters.Flip import HorizontalFlip
+from Storage import FakeObjectStore, MemoryStorage, ObjectStorage
+
+
+@pytest.fixture
+def store():
+    with FakeObjectStore() as store:
+        yield store
+
+
+@pytest.fixture(params=['memory', 'object'])
+def storage(request, store):
+    storage = MemoryStorage() if request.param == 'memory' else ObjectStorage(store.bucketUrl("bucket"))
+    yield storage
+    storage.close()
+
+
+def encode(value: int) -> bytes:
+    return cv2.imencode('.png', np.full((4, 4, 3), value, np.uint8))[1].tobytes()
+
+
+def test_round_trip(storage):
+    for i in range(10):
+        storage.put(f"out/{i % 2}/{i}.png", encode(i))
+    storage.put("other/x.png", encode(99))
+    storage.flush()
+
+    assert storage.keys("out/1/") == [f"out/1/{i}.png" for i in (1, 3, 5, 7, 9)]
+    assert len(storage.keys()) == 11
+    assert storage.exists("out/0/4.png")
+    assert (storage.load("out/0/4.png") == 4).all()
+    assert storage.load("missing.png") is None
+
+    storage.delete("out/0/4.png")
+    assert not storage.exists("out/0/4.png")
+
+
+def test_put_many_overwrites(storage):
+    storage.putMany([("a.bin", b"1"), ("b.bin", b"2")])
+    storage.putMany([("a.bin", b"3")])
+
+    assert storage.read("a.bin") == b"3"
+    assert storage.read("b.bin") == b"2"
+    with pytest.raises(FileNotFoundError):
+        storage.read("c.bin")
+
+
+def test_failed_put_raises_on_flush(store):
+    store.putStatus = 500
+    with ObjectStorage(store.bucketUrl("bucket")) as storage:
+        storage.put("a.bin", b"1")
+        storage.put("b.bin", b"2")
+
+        with pytest.raises(OSError, match="2 writes failed"):
+            storage.flush()
+
+        store.putStatus = 200
+        storage.put("a.bin", b"1")
+        storage.flush()
+        # the errors are only raised once
+
+    assert store.objects == {"/bucket/a.bin": b"1"}
+
+
+class CountingStorage(MemoryStorage):
+    def __init__(self) -> None:
+        super().__init__()
+        self.writes: dict[str, int] = {}
+
+    def write(self, key: str, data: bytes) -> None:
+        self.writes[key] = self.writes.get(key, 0) + 1
+        super().write(key, data)
+
+
+def writeSource(tmp_path) -> tuple[list[str], str]:
+    images = []
+    for i in range(3):
+        images.append(str(tmp_path / f"{i}.png"))
+        cv2.imwrite(images[-1], np.zeros((16, 16, 3), np.uint8))
+
+    source = tmp_path / "ann.json"
+    with open(source, 'w') as f:
+        json.dump({'images': [{'id': i, 'file_name': x, 'width': 16, 'height': 16} for i, x in enumerate(images)], 'annotations': [
+            {'id': i, 'image_id': i, 'category_id': 1, 'bbox': [2, 2, 8, 8]} for i in range(3)
+        ], 'categories': [{'id': 1, 'name': 'x'}]}, f)
+
+    return images, str(source)
+
+
+def test_annotations_are_written_once_per_batch(tmp_path):
+    images, source = writeSource(tmp_path)
+
+    storage = CountingStorage()
+    for batchImages in (images[:2], images[2:]):
+        batch = BoundingBoxBatch(batchImages, "out", source, "out/annotations.json", Composite([HorizontalFlip()], shouldApplyBBox=True, seed=0), (16, 16), storage=storage)
+        batch.augment(2, print)
+
+    data = json.loads(storage.read("out/annotations.json"))
+
+    assert storage.writes["out/annotations.json"] == 2
+    assert len(data['images']) == 9
+    assert len(data['annotations']) == 9
+    assert {x['file_name'] for x in data['images']} == set(storage.keys("out/")) - {"out/annotations.json"}
+
+
+def test_annotations_are_written_once_per_batch_on_disk(tmp_path, monkeypatch):
+    images, source = writeSource(tmp_path)
+    target = tmp_path / "annotations.json"
+    writes = []
+    writeAnnotations = BoundingBoxBatch.writeAnnotations
+
+    def counted(self, data):
+        writes.append(len(data['images']))
+        writeAnnotations(self, data)
+
+    monkeypatch.setattr(BoundingBoxBatch, "writeAnnotations", counted)
+
+    batch = BoundingBoxBatch(images, str(tmp_path / "out"), source, str(target), Composite([HorizontalFlip()], shouldApplyBBox=True, seed=0), (16, 16))
+    batch.augment(2, print)
+
+    with open(target) as f:
+        data = json.load(f)
+
+    assert writes == [9]
+    assert len(data['annotations']) == 9
@@ -0,0 +1,84 @@
+import os
+import numpy as np
+import cv2
+from Tiling import Tiler
+from Batch import Batch
+from Composite import Composite
+from Filters.Flip import HorizontalFlip
+from Guardrails import Guardrails
+
+
+def gradient(height: int, width: int) -> np.ndarray:
+    ys, xs = np.mgrid[0:height, 0:width]
+    return np.dstack([xs % 256, ys % 256, (xs + ys) % 256]).astype(np.uint8)
+
+
+def test_windows_cover_the_image():
+    tiler = Tiler((4, 3), overlap=1)
+
+    windows = tiler.windows((7, 10))
+    covered = np.zeros((7, 10), bool)
+    for x, y, width, height in windows:
+        covered[y:y + height, x:x + width] = True
+
+    assert covered.all()
+    assert all(x + width <= 10 and y + height <= 7 for x, y, width, height in windows)
+
+
+def test_padded_tile_matches_padded_image():
+    image = gradient(12, 16)
+    halo = 2
+
+    tile = Tiler.padded(image, (4, 0, 8, 6), halo)
+    full = cv2.copyMakeBorder(image, halo, halo, halo, halo, cv2.BORDER_REFLECT_101)
+
+    assert np.array_equal(tile, full[0:6 + 2 * halo, 4:8 + 4 + halo + halo])
+
+
+def test_crop_removes_the_halo():
+    tile = gradient(14, 14)
+
+    assert Tiler.crop(tile, 2).shape[:2] == (10, 10)
+    assert Tiler.crop(tile, 0) is tile
+
+
+def test_crop_scales_the_halo_of_resized_tiles():
+    source = gradient(14, 14)
+    resized = cv2.resize(source, (28, 42))
+
+    assert Tiler.margins(resized.shape, source.shape, 2) == (4, 6)
+    assert Tiler.crop(resized, 2, source.shape).shape[:2] == (30, 20)
+
+
+def test_ppm_and_npy_are_memory_mapped(tmp_path):
+    image = gradient(9, 13)
+    cv2.imwrite(str(tmp_path / "a.ppm"), image)
+    np.save(tmp_path / "a.npy", image)
+
+    for name in ("a.ppm", "a.npy"):
+        windowed = Tiler.openWindowed(str(tmp_path / name))
+        assert isinstance(windowed, np.memmap)
+        assert np.array_equal(np.asarray(windowed), image)
+
+    cv2.imwrite(str(tmp_path / "a.png"), image)
+    assert Tiler.openWindowed(str(tmp_path / "a.png")) is None
+
+
+def test_large_compressed_sources_are_rejected(tmp_path):
+    image = gradient(40, 40)
+    cv2.imwrite(str(tmp_path / "large.png"), image)
+    cv2.imwrite(str(tmp_path / "large.ppm"), image)
+    out = tmp_path / "out"
+    out.mkdir()
+
+    guardrails = Guardrails()
+    logs = []
+    batch = Batch([], str(out), Composite([HorizontalFlip()], seed=0), (8, 8), tiler=Tiler((20, 20), maxSourcePixels=1000), guardrails=guardrails)
+
+    batch.augmentItem(str(tmp_path / "large.png"), 1, logs.append)
+    assert os.listdir(out) == []
+    assert guardrails.summary()['reasons'] == {'pixels': 1}
+
+    batch.augmentItem(str(tmp_path / "large.ppm"), 1, logs.append)
+    assert len(os.listdir(out)) == 4 * 2
+    # every tile of the mapped source gets its variation and its original
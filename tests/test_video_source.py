@@ -0,0 +1,64 @@
+import numpy as np
+import cv2
+import pytest
+from VideoSource import VideoSource
+
+
+def writeClip(path, frames: int = 12, fps: float = 10.0) -> str:
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'MJPG'), fps, (32, 24))
+    if not writer.isOpened():
+        pytest.skip("cv2 was built without a video writer")
+
+    for i in range(frames):
+        writer.write(np.full((24, 32, 3), i * 20, np.uint8))
+        # every frame has its own shade so it can be told apart after decoding
+    writer.release()
+
+    return str(path)
+
+
+def frameIndex(image: np.ndarray) -> int:
+    return round(float(image.mean()) / 20)
+
+
+def test_frame_count_and_stride(tmp_path):
+    clip = writeClip(tmp_path / "clip.avi")
+
+    assert len(VideoSource(clip)) == 12
+
+    source = VideoSource(clip, stride=5)
+    assert source.members == [f"{clip}@0", f"{clip}@5", f"{clip}@10"]
+    assert [frameIndex(source.load(x)) for x in source.members] == [0, 5, 10]
+
+
+def test_time_ranges(tmp_path):
+    clip = writeClip(tmp_path / "clip.avi")
+
+    source = VideoSource(clip, stride=2, timeRanges=[(0.0, 0.4), (0.8, 5.0)])
+
+    assert [VideoSource.parseMember(x)[1] for x in source.members] == [0, 2, 8, 10]
+
+
+def test_frames_are_read_in_any_order(tmp_path):
+    clip = writeClip(tmp_path / "clip.avi")
+    source = VideoSource(clip, seekThreshold=2)
+
+    for frame in [3, 4, 11, 1, 6]:
+        assert frameIndex(source.load(VideoSource.memberName(clip, frame))) == frame
+    # short gaps are grabbed through, long gaps and going back seek
+
+    assert source.load(VideoSource.memberName(clip, 40)) is None
+    assert source.load("not a member") is None
+    source.close()
+
+
+def test_ranges_follow_video_order(tmp_path):
+    first = writeClip(tmp_path / "a.avi", 5)
+    second = writeClip(tmp_path / "b.avi", 4)
+    source = VideoSource([first, second])
+
+    ranges = source.ranges(2, list(reversed(source.members)))
+
+    assert [len(x) for x in ranges] == [5, 4]
+    assert ranges[0] == [VideoSource.memberName(first, i) for i in range(5)]
+    assert ranges[1] == [VideoSource.memberName(second, i) for i in range(4)]
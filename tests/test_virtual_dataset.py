@@ -0,0 +1,73 @@
+import os
+import numpy as np
+import cv2
+from COCO import COCO
+from Composite import Composite
+from Filters.Blur import Blur
+from Filters.BrightnessContrast import Brightness
+from Filters.Crop import RandomCrop
+from Filters.Flip import HorizontalFlip
+from Filters.Noise import Noise
+from Filters.Rotate import Rotate
+from VirtualDataset import VirtualDataset, writeRecords
+
+
+def makeFilters() -> list:
+    return [HorizontalFlip(), Rotate(), Blur(), Noise(), Brightness(), RandomCrop((12, 10))]
+
+
+def writeImages(folder, count: int) -> list[str]:
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = str(folder / f"{i}.png")
+        cv2.imwrite(path, np.random.default_rng(i).integers(0, 256, (20, 24, 3), dtype=np.uint8))
+        paths.append(path)
+
+    return paths
+
+
+def test_render_reproduces_the_eager_output(tmp_path):
+    paths = writeImages(tmp_path, 3)
+    recordsPath = str(tmp_path / "records.jsonl")
+
+    eager = Composite(makeFilters(), seed=4)
+    expected = []
+    for path in paths:
+        image = cv2.imread(path)
+        expected.append(image)
+        expected.extend(eager.transform(image)['image'] for _ in range(8))
+
+    assert writeRecords(recordsPath, paths, Composite(makeFilters(), seed=4), 8) == len(expected)
+
+    dataset = VirtualDataset(recordsPath, Composite(makeFilters()), cacheSize=0)
+    assert len(dataset) == len(expected)
+    assert {dataset.record(i)['filter'] for i in range(len(dataset))} - {None} == set(range(len(makeFilters())))
+
+    for i in reversed(range(len(dataset))):
+        assert np.array_equal(dataset[i]['image'], expected[i])
+    # any order renders the same samples
+
+
+def test_render_reproduces_the_eager_boxes(tmp_path):
+    paths = writeImages(tmp_path, 2)
+    recordsPath = str(tmp_path / "records.jsonl")
+    boxes = [(COCO.fromIterable([2, 3, 8, 6]), 1), (COCO.fromIterable([10, 8, 10, 9]), 2)]
+
+    filters = lambda: [HorizontalFlip(), Rotate(), RandomCrop((12, 10))]
+    eager = Composite(filters(), True, seed=4)
+    expected = []
+    for path in paths:
+        image = cv2.imread(path)
+        expected.append((image, [x[0] for x in boxes]))
+        for _ in range(4):
+            transformed = eager.transform(image, [x[0] for x in boxes])
+            expected.append((transformed['image'], transformed['bBox']))
+
+    writeRecords(recordsPath, paths, Composite(filters(), True, seed=4), 4, lambda _: boxes)
+    dataset = VirtualDataset(recordsPath, Composite(filters(), True))
+
+    for sample, (image, bBoxes) in zip(dataset, expected):
+        assert np.array_equal(sample['image'], image)
+        visible = [(x.iterableFormat, category) for x, (_, category) in zip(bBoxes, boxes) if x.points['width'] > 0 and x.points['height'] > 0]
+        assert [(x.iterableFormat, category) for x, category in sample['bBox']] == visible
@@ -0,0 +1,90 @@
+import os
+import time
+import numpy as np
+import cv2
+from Augmentors.SimpleAugmentor import SimpleAugmentor
+from Composite import Composite
+from Filters.Flip import HorizontalFlip
+from OutputLayout import OutputLayout
+from Watcher import Watcher
+
+
+def makeAugmentor(tmp_path, **kwargs) -> SimpleAugmentor:
+    os.makedirs(tmp_path / "src", exist_ok=True)
+    return SimpleAugmentor(str(tmp_path / "src"), str(tmp_path / "out"), Composite([HorizontalFlip()]), split=False, seed=0, **kwargs)
+
+
+def writeImage(tmp_path, name: str, value: int) -> None:
+    path = tmp_path / "src" / name
+    cv2.imwrite(str(path), np.full((4, 4, 3), value, np.uint8))
+    mtime = time.time_ns() - (10 - value) * 1_000_000_000
+    os.utime(path, ns=(mtime, mtime))
+    # a distinct modification time in the past, so a rewrite within the same tick is still a change and has settled
+
+
+def outputs(tmp_path) -> int:
+    return sum(len(files) for _, _, files in os.walk(tmp_path / "out"))
+
+
+class FlakyWatcher(Watcher):
+    def __init__(self, augmentor, failures: int, **kwargs) -> None:
+        super().__init__(augmentor, **kwargs)
+        self.failures = failures
+        self.polls = 0
+
+    def poll(self) -> list[str]:
+        self.polls += 1
+        if self.polls <= self.failures:
+            raise OSError("source unavailable")
+        return []
+
+
+def test_run_survives_failing_polls(tmp_path):
+    logs = []
+    watcher = FlakyWatcher(makeAugmentor(tmp_path), 2, interval=0.01, log=logs.append)
+
+    watcher.run(maxPolls=4)
+
+    assert watcher.polls == 4
+    assert len(logs) == 2
+    assert all(x.startswith("[WATCH ERROR]") and "source unavailable" in x for x in logs)
+
+
+def test_new_files_are_augmented(tmp_path):
+    augmentor = makeAugmentor(tmp_path)
+    watcher = augmentor.watch(2, interval=0.01, settle=0)
+    writeImage(tmp_path, "a.png", 1)
+
+    watcher.run(maxPolls=2)
+
+    assert watcher.processed == 1
+    assert outputs(tmp_path) == 3
+
+
+def test_changed_files_need_a_layout(tmp_path):
+    logs = []
+    augmentor = makeAugmentor(tmp_path)
+    watcher = augmentor.watch(2, interval=0.01, settle=0)
+    watcher.log = logs.append
+    writeImage(tmp_path, "a.png", 1)
+    watcher.run(maxPolls=2)
+
+    writeImage(tmp_path, "a.png", 2)
+    watcher.run(maxPolls=2)
+
+    assert watcher.processed == 1
+    assert outputs(tmp_path) == 3
+    assert any(x.startswith("[WATCH SKIPPED]") for x in logs)
+
+
+def test_changed_files_replace_their_outputs_with_a_layout(tmp_path):
+    augmentor = makeAugmentor(tmp_path, layout=OutputLayout())
+    watcher = augmentor.watch(2, interval=0.01, settle=0)
+    writeImage(tmp_path, "a.png", 1)
+    watcher.run(maxPolls=2)
+
+    writeImage(tmp_path, "a.png", 2)
+    watcher.run(maxPolls=2)
+
+    assert watcher.processed == 2
+    assert outputs(tmp_path) == 3